@@ -3,16 +3,18 @@ from dotenv import load_dotenv
 import logging
 import threading
 import os
-import requests
 import json
 
 # Import controllers
 from controllers.campaign_controller import campaign_bp
 from controllers.call_controller import call_bp
 from controllers.voice_controller import voice_bp
-from flask import Flask, request, jsonify, send_file
 # Import services initialization
 from services import init_services
+from services.call_registry import get_call_registry
+from services.sip_client import get_sip_client
+from config.settings import TTS_SPEAKER, TTS_STREAMING, TTS_PRELOAD, TTS_FORK_SHARED, API_FAST_JSON
+from templates.script_templates import get_campaign_engine_mode
 
 # Load environment variables
 load_dotenv()
@@ -23,24 +25,21 @@ logger = logging.getLogger(__name__)
 PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', 'http://localhost:5001')
 logger.info(f"Using PUBLIC_BASE_URL: {PUBLIC_BASE_URL}")
 
-# Dictionary to store active calls and their associated campaign IDs
-active_calls = {}
+# Calls in progress and their campaign, status and stage
+call_registry = get_call_registry()
 
 def initiate_call(phone_number, campaign_id):
     """
     Initiates a call through the SIP Integration Service
     """
     try:
-        # URL for the SIP integration service
-        sip_service_url = os.environ.get('SIP_SERVICE_URL', 'http://localhost:5002')
-        
         # Construct the callback URL that SIP service should use to notify this service
         callback_url = os.environ.get('CALLBACK_URL', 'http://localhost:5001/call-webhook')
         
         # Make the call through the SIP integration service
-        response = requests.post(
-            f"{sip_service_url}/make-call",
-            json={
+        response = get_sip_client().post(
+            "/make-call",
+            {
                 "phone_number": phone_number,
                 "campaign_id": campaign_id,
                 "callback_url": callback_url
@@ -53,11 +52,12 @@ def initiate_call(phone_number, campaign_id):
             
             # Store the call information for later reference
             if call_control_id:
-                active_calls[call_control_id] = {
-                    'phone_number': phone_number,
-                    'campaign_id': campaign_id,
-                    'status': 'initiated'
-                }
+                call_registry.update(
+                    call_control_id,
+                    phone_number=phone_number,
+                    campaign_id=campaign_id,
+                    status='initiated'
+                )
                 
             return response_data
         else:
@@ -67,9 +67,42 @@ def initiate_call(phone_number, campaign_id):
         logger.error(f"Exception initiating call: {e}")
         return None
 
+def start_background_tasks(prerender=True):
+    """
+    Start the TTS warm-up and cache maintenance threads
+    
+    Args:
+        prerender (bool): Load the TTS model and pre-render every campaign prompt
+    """
+    # Load the TTS model and pre-render every campaign prompt in the background
+    # so callers never wait on synthesis of a static message. Workers that
+    # don't place calls can skip this and never import torch.
+    if prerender:
+        from services.prerender_service import get_prompt_prerenderer
+        get_prompt_prerenderer().warm_all()
+    
+    # Schedule maintenance to keep the audio cache within its size budget
+    def run_maintenance():
+        from time import sleep
+        while True:
+            try:
+                from services.tts_service import get_tts_service
+                tts_service = get_tts_service(load_model=False)
+                tts_service.clear_old_files()
+            except Exception as e:
+                logger.error(f"Maintenance error: {e}")
+            sleep(3600)  # Run hourly
+    
+    maintenance_thread = threading.Thread(target=run_maintenance)
+    maintenance_thread.daemon = True
+    maintenance_thread.start()
+
 def create_app():
     """Initialize and configure the Flask application"""
     app = Flask(__name__)
+    if API_FAST_JSON:
+        from utils.flask_json import FastJSONProvider
+        app.json = FastJSONProvider(app)
     
     # Initialize services
     init_services(app)
@@ -129,26 +162,27 @@ def create_app():
                 # Changed generate_speech to generate_audio
                 audio_file = tts_service.generate_audio(
                     text=greeting_message,
-                    speaker="p273"  # Changed voice_id to speaker
+                    speaker=TTS_SPEAKER,
+                    stream=TTS_STREAMING,
+                    engine_mode=get_campaign_engine_mode(campaign_id),
+                    call_id=call_control_id
                 )
                 
                 # Get public URL for the audio file
                 audio_url = f"{PUBLIC_BASE_URL}/audio/{os.path.basename(audio_file)}"
+                
+                # Every answered call fetches the greeting, keep it in memory
+                from services.audio_server import preload_audio
+                preload_audio(os.path.basename(audio_file))
 
                 
-                # Store the call in active calls if not already there
-                if call_control_id not in active_calls:
-                    active_calls[call_control_id] = {
-                        'campaign_id': campaign_id,
-                        'status': 'greeting',
-                        'conversation_stage': 'greeting'
-                    }
-                else:
-                    active_calls[call_control_id].update({
-                        'campaign_id': campaign_id,
-                        'status': 'greeting',
-                        'conversation_stage': 'greeting'
-                    })
+                # Track the call, it may not have been initiated by us
+                call_registry.update(
+                    call_control_id,
+                    campaign_id=campaign_id,
+                    status='greeting',
+                    conversation_stage='greeting'
+                )
                 
                 # Return the greeting
                 return jsonify({
@@ -190,13 +224,7 @@ def create_app():
                 return jsonify({'error': 'call_control_id is required'}), 400
                 
             # Update our tracking of the call
-            if call_control_id not in active_calls:
-                active_calls[call_control_id] = {
-                    'campaign_id': campaign_id,
-                    'status': event_type
-                }
-            else:
-                active_calls[call_control_id]['status'] = event_type
+            call_registry.update(call_control_id, campaign_id=campaign_id, status=event_type)
             
             # Process different event types
             if event_type == 'call.answered':
@@ -234,7 +262,7 @@ def create_app():
                     current_stage = result.get('current_stage', 'unknown')
                     
                     # Update call state in our active calls
-                    active_calls[call_control_id]['conversation_stage'] = current_stage
+                    call_registry.update(call_control_id, conversation_stage=current_stage)
                     
                     # Generate audio for the response
                     from services.tts_service import get_tts_service
@@ -243,7 +271,12 @@ def create_app():
                     # Changed generate_speech to generate_audio
                     audio_file = tts_service.generate_audio(
                         text=message,
-                        speaker="p273"  # Changed voice_id to speaker
+                        speaker=TTS_SPEAKER,
+                        stream=TTS_STREAMING,
+                        template=result.get('message_template'),
+                        variables=result.get('message_variables'),
+                        engine_mode=get_campaign_engine_mode(campaign_id),
+                        call_id=call_control_id
                     )
                     
                     # Get public URL for the audio file
@@ -270,22 +303,14 @@ def create_app():
                 # Call has ended
                 duration = data.get('duration', 0)
                 
-                # Clean up resources
-                if call_control_id in active_calls:
-                    # Mark as ended
-                    active_calls[call_control_id]['status'] = 'ended'
-                    active_calls[call_control_id]['duration'] = duration
-                    
-                    # Schedule removal after a delay
-                    def cleanup_call():
-                        import time
-                        time.sleep(30)  # Wait 30 seconds before cleanup
-                        if call_control_id in active_calls:
-                            del active_calls[call_control_id]
-                    
-                    cleanup_thread = threading.Thread(target=cleanup_call)
-                    cleanup_thread.daemon = True
-                    cleanup_thread.start()
+                # Its audio can be evicted again
+                from services.tts_service import get_tts_service
+                from services.storage_service import finish_call_state
+                get_tts_service(load_model=False).release_call(call_control_id)
+                finish_call_state(call_control_id)
+                
+                # Mark as ended, the registry drops it CALL_REGISTRY_ENDED_TTL seconds later
+                call_registry.end(call_control_id, duration=duration)
             
             # Return 200 OK to acknowledge receipt
             return jsonify({'status': 'ok'}), 200
@@ -300,13 +325,11 @@ def create_app():
         Serve audio files generated by TTS
         """
         try:
-            from services.tts_service import get_tts_service
-            tts_service = get_tts_service()
-            
-            audio_path = os.path.join(tts_service.cache_dir, filename)
+            from services.audio_server import serve_audio as serve_cached_audio
             
-            if os.path.exists(audio_path):
-                return send_file(audio_path, mimetype='audio/wav')
+            response = serve_cached_audio(filename)
+            if response is not None:
+                return response
             else:
                 logger.error(f"Audio file not found: {filename}")
                 return "File not found", 404
@@ -314,36 +337,14 @@ def create_app():
             logger.error(f"Error serving audio file: {e}")
             return "Error serving file", 500
     
-    def init_tts():
-        try:
-            from services.tts_service import get_tts_service
-            tts_service = get_tts_service()
-            # Download models if needed
-            tts_service.download_voice_models()
-            logger.info("TTS service initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing TTS service: {e}")
-
-    # Start in a separate thread to avoid blocking app startup
-    tts_thread = threading.Thread(target=init_tts)
-    tts_thread.daemon = True
-    tts_thread.start()
-    
-    # Schedule maintenance to remove old audio files
-    def run_maintenance():
-        from time import sleep
-        while True:
-            try:
-                from services.tts_service import get_tts_service
-                tts_service = get_tts_service()
-                tts_service.clear_old_files(max_age_hours=6)
-            except Exception as e:
-                logger.error(f"Maintenance error: {e}")
-            sleep(3600)  # Run hourly
-    
-    maintenance_thread = threading.Thread(target=run_maintenance)
-    maintenance_thread.daemon = True
-    maintenance_thread.start()
+    if TTS_FORK_SHARED:
+        # Prefork server: load the model here, in the master, so every worker
+        # inherits it. Background threads are started per worker after the
+        # fork (see gunicorn.conf.py), threads don't survive a fork.
+        from services.tts_service import get_tts_service
+        get_tts_service(load_model=False).load_for_fork()
+    else:
+        start_background_tasks(prerender=TTS_PRELOAD)
     
     # Register blueprints
     app.register_blueprint(campaign_bp)
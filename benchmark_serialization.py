@@ -0,0 +1,69 @@
+"""
+Compare the cost of encoding and decoding a call state with each codec.
+
+Builds a typical mid-call state (a few stages, collected answers and a
+message history) and reports per-state encode and decode time and encoded
+size for the indented JSON the app used to write and for every installed
+codec of utils.serialization.
+
+Usage:
+    python benchmark_serialization.py [--number 20000] [--turns 10]
+"""
+import sys
+import json
+import timeit
+import argparse
+
+from services.call_state import CallState
+from utils.serialization import FORMATS, is_available, get_codec
+
+STAGES = ['greeting', 'interest', 'timeframe', 'budget', 'contact', 'closing']
+
+def build_state(turns):
+    """Build a call state as it looks after a number of conversation turns"""
+    state = CallState(
+        campaign_id='demo-campaign',
+        status='active',
+        start_time='2026-10-17T10:00:00.000000',
+        last_updated='2026-10-17T10:03:12.000000',
+        conversation_stage=STAGES[min(turns, len(STAGES) - 1)],
+        conversation_data={'interest': 'yes', 'timeframe': 'next month', 'budget': '5000'},
+        messages=[]
+    )
+    for turn in range(turns):
+        state.push_stage(STAGES[turn % len(STAGES)])
+        state['messages'].append({'role': 'assistant', 'text': "Are you still looking at options this quarter?"})
+        state['messages'].append({'role': 'user', 'text': "yeah maybe next month if the price is right"})
+    return state
+
+def measure(name, encode, decode, state, number):
+    """Time encode and decode of the state, returning a result row"""
+    encoded = encode(state)
+    encode_us = timeit.timeit(lambda: encode(state), number=number) / number * 1e6
+    decode_us = timeit.timeit(lambda: decode(encoded), number=number) / number * 1e6
+    return name, encode_us, decode_us, len(encoded)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare call state serialization codecs")
+    parser.add_argument('--number', type=int, default=20000, help="Encodes and decodes timed per codec")
+    parser.add_argument('--turns', type=int, default=10, help="Conversation turns in the call state")
+    args = parser.parse_args(argv)
+
+    state = build_state(args.turns)
+    rows = [measure('json indent=2 (previous)', lambda s: json.dumps(s.to_dict(), indent=2), json.loads,
+                    state, args.number)]
+    for name in FORMATS:
+        if not is_available(name):
+            print(f"{name}: not installed, skipped")
+            continue
+        codec = get_codec(name)
+        rows.append(measure(name, codec.encode, codec.decode, state, args.number))
+
+    print(f"Call state with {args.turns} turns, {args.number} runs per codec:")
+    print(f"  {'codec':<26}{'encode us':>11}{'decode us':>11}{'bytes':>8}")
+    for name, encode_us, decode_us, size in rows:
+        print(f"  {name:<26}{encode_us:>11.1f}{decode_us:>11.1f}{size:>8}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
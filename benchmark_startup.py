@@ -0,0 +1,72 @@
+"""
+Measure cold boot of the Flask app.
+
+Each run starts a fresh interpreter, imports app and calls create_app(), and
+reports the time taken, peak memory and whether torch or TTS were imported.
+Exits non-zero if the median boot time is over the target.
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--target 2.0] [--preload]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BOOT_SNIPPET = """
+import json, resource, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'torch_imported': 'torch' in sys.modules,
+    'tts_imported': 'TTS' in sys.modules
+}))
+"""
+
+def boot_once(preload):
+    """Boot the app in a fresh interpreter and return its measurements"""
+    env = dict(os.environ, TTS_PRELOAD='True' if preload else 'False')
+    result = subprocess.run(
+        [sys.executable, '-c', BOOT_SNIPPET],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"App failed to boot:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold boot time of the Flask app")
+    parser.add_argument('--runs', type=int, default=5, help="Number of cold boots")
+    parser.add_argument('--target', type=float, default=2.0, help="Maximum median boot time in seconds")
+    parser.add_argument('--preload', action='store_true', help="Boot with TTS_PRELOAD enabled")
+    args = parser.parse_args()
+
+    runs = [boot_once(args.preload) for _ in range(args.runs)]
+    seconds = [run['seconds'] for run in runs]
+    median = statistics.median(seconds)
+
+    print(f"Cold boot over {args.runs} runs (TTS_PRELOAD={args.preload}):")
+    print(f"  median {median:.3f}s, min {min(seconds):.3f}s, max {max(seconds):.3f}s")
+    print(f"  peak RSS {max(run['max_rss_mb'] for run in runs):.1f} MB")
+    print(f"  torch imported: {any(run['torch_imported'] for run in runs)}, "
+          f"TTS imported: {any(run['tts_imported'] for run in runs)}")
+
+    if median > args.target:
+        print(f"FAIL: median boot time {median:.3f}s is over the {args.target:.1f}s target")
+        return 1
+
+    print(f"OK: under the {args.target:.1f}s target")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,4 +22,94 @@ VOICE_PITCH = os.environ.get('VOICE_PITCH', '0%')
 
 # Call settings
 SPEECH_TIMEOUT = int(os.environ.get('SPEECH_TIMEOUT', 3))
-GATHER_TIMEOUT = int(os.environ.get('GATHER_TIMEOUT', 5))
\ No newline at end of file
+GATHER_TIMEOUT = int(os.environ.get('GATHER_TIMEOUT', 5))
+
+# TTS audio cache settings
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', os.path.join(os.getcwd(), 'temp_audio'))
+TTS_CACHE_MAX_MB = int(os.environ.get('TTS_CACHE_MAX_MB', 2048))
+TTS_CACHE_POLICY = os.environ.get('TTS_CACHE_POLICY', 'lru')  # lru or lfu
+# Audio handed to a call stays pinned until hangup, or this long if the hangup never arrives
+TTS_CALL_PIN_HOURS = float(os.environ.get('TTS_CALL_PIN_HOURS', 4))
+TTS_SPEAKER = os.environ.get('TTS_SPEAKER', 'p273')
+
+# TTS worker pool settings (0 workers keeps synthesis in the web process)
+TTS_WORKERS = int(os.environ.get('TTS_WORKERS', 0))
+TTS_TORCH_THREADS = int(os.environ.get('TTS_TORCH_THREADS', max(1, (os.cpu_count() or 1) // max(1, TTS_WORKERS))))
+TTS_QUEUE_SIZE = int(os.environ.get('TTS_QUEUE_SIZE', 256))
+# Seconds a request waits for room in a full queue, and for its audio once queued
+TTS_QUEUE_TIMEOUT = float(os.environ.get('TTS_QUEUE_TIMEOUT', 1.0))
+TTS_SYNTHESIS_TIMEOUT = float(os.environ.get('TTS_SYNTHESIS_TIMEOUT', 60))
+
+# Streaming synthesis: long messages are returned as a playlist of sentence segments
+TTS_STREAMING = os.environ.get('TTS_STREAMING', 'False').lower() == 'true'
+TTS_STREAM_THREADS = int(os.environ.get('TTS_STREAM_THREADS', 2))
+TTS_SEGMENT_WAIT_SECONDS = float(os.environ.get('TTS_SEGMENT_WAIT_SECONDS', 30))
+
+# Output audio profile: native (model rate WAV), pcm16k (16 kHz PCM) or ulaw8k (8 kHz G.711 mu-law)
+TTS_OUTPUT_PROFILE = os.environ.get('TTS_OUTPUT_PROFILE', 'native')
+
+# In-memory tier for the most played audio clips
+AUDIO_HOT_TIER_MB = int(os.environ.get('AUDIO_HOT_TIER_MB', 64))
+AUDIO_HOT_PROMOTE_AFTER = int(os.environ.get('AUDIO_HOT_PROMOTE_AFTER', 2))
+# Seconds clients and CDNs may reuse a clip before revalidating its ETag
+AUDIO_CACHE_MAX_AGE = int(os.environ.get('AUDIO_CACHE_MAX_AGE', 86400))
+
+# XTTS voices: language, reference audio for custom voices and persisted conditioning latents
+TTS_LANGUAGE = os.environ.get('TTS_LANGUAGE', 'en')
+TTS_VOICES_DIR = os.environ.get('TTS_VOICES_DIR', os.path.join(os.getcwd(), 'voices'))
+TTS_SPEAKER_CACHE_DIR = os.environ.get('TTS_SPEAKER_CACHE_DIR', os.path.join(os.getcwd(), 'speaker_latents'))
+
+# CPU inference mode: standard, quantized (int8 dynamic quantization) or onnx (VITS only)
+TTS_ENGINE_MODES = ('standard', 'quantized', 'onnx')
+TTS_ENGINE_MODE = os.environ.get('TTS_ENGINE_MODE', 'standard')
+TTS_ONNX_DIR = os.environ.get('TTS_ONNX_DIR', os.path.join(os.getcwd(), 'onnx_models'))
+TTS_REPORT_RTF = os.environ.get('TTS_REPORT_RTF', 'True').lower() == 'true'
+
+# Seconds synthesis waits for the TTS model to finish loading
+TTS_READY_TIMEOUT = float(os.environ.get('TTS_READY_TIMEOUT', 300))
+
+# Load the model and pre-render campaign prompts when the app starts
+TTS_PRELOAD = os.environ.get('TTS_PRELOAD', 'True').lower() == 'true'
+
+# Load the model once in the gunicorn master and share it with forked workers (see gunicorn.conf.py)
+TTS_FORK_SHARED = os.environ.get('TTS_FORK_SHARED', 'False').lower() == 'true'
+
+# Micro-batching of concurrent VITS requests, a window of 0 disables it
+TTS_BATCH_WINDOW_MS = float(os.environ.get('TTS_BATCH_WINDOW_MS', 5))
+TTS_BATCH_MAX_SIZE = int(os.environ.get('TTS_BATCH_MAX_SIZE', 8))
+
+# Fallback intent classifier for input no script pattern matches
+INTENT_CLASSIFIER_ENABLED = os.environ.get('INTENT_CLASSIFIER_ENABLED', 'False').lower() == 'true'
+INTENT_CLASSIFIER_THRESHOLD = float(os.environ.get('INTENT_CLASSIFIER_THRESHOLD', 0.5))
+INTENT_CLASSIFIER_DIMS = int(os.environ.get('INTENT_CLASSIFIER_DIMS', 4096))
+
+# Call state persistence: directory and seconds between write-behind flushes
+STATE_DIR = os.environ.get('STATE_DIR', os.path.join(os.getcwd(), 'conversation_states'))
+STATE_FLUSH_INTERVAL = float(os.environ.get('STATE_FLUSH_INTERVAL', 1.0))
+
+# State backend: json (one file per call), journal (append-only segments, single process only)
+# or sqlite (WAL database, queryable by campaign, status and stage)
+STATE_BACKENDS = ('json', 'journal', 'sqlite')
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'json')
+STATE_JOURNAL_SEGMENT_MB = int(os.environ.get('STATE_JOURNAL_SEGMENT_MB', 16))
+# Hours an ended call stays in the journal before compaction drops it
+STATE_JOURNAL_RETENTION_HOURS = float(os.environ.get('STATE_JOURNAL_RETENTION_HOURS', 24))
+
+# Calls tracked in memory, and seconds an idle call and an ended call are kept
+CALL_REGISTRY_MAX_CALLS = int(os.environ.get('CALL_REGISTRY_MAX_CALLS', 10000))
+CALL_REGISTRY_TTL = float(os.environ.get('CALL_REGISTRY_TTL', 4 * 3600))
+CALL_REGISTRY_ENDED_TTL = float(os.environ.get('CALL_REGISTRY_ENDED_TTL', 30))
+
+# Serialization: format of state files (json, orjson or msgpack, json if the library isn't installed),
+# and whether API responses use orjson, or msgpack for clients that ask for it, when installed
+STATE_FORMAT = os.environ.get('STATE_FORMAT', 'json')
+API_FAST_JSON = os.environ.get('API_FAST_JSON', 'True').lower() == 'true'
+
+# SIP integration service: URL, keep-alive connections per host, connect/read timeouts in seconds,
+# and retries with their base backoff delay in seconds
+SIP_SERVICE_URL = os.environ.get('SIP_SERVICE_URL', 'http://localhost:5002')
+SIP_POOL_SIZE = int(os.environ.get('SIP_POOL_SIZE', 32))
+SIP_CONNECT_TIMEOUT = float(os.environ.get('SIP_CONNECT_TIMEOUT', 2.0))
+SIP_READ_TIMEOUT = float(os.environ.get('SIP_READ_TIMEOUT', 10.0))
+SIP_RETRIES = int(os.environ.get('SIP_RETRIES', 2))
+SIP_RETRY_BACKOFF = float(os.environ.get('SIP_RETRY_BACKOFF', 0.1))
@@ -4,11 +4,13 @@ from flask import Blueprint, request, jsonify
 import logging
 import os
 from services.call_bridge_service import get_call_bridge_service
+from services.sip_client import get_sip_client
 from services.tts_service import get_tts_service
+from services.audio_server import preload_audio
 from services.conversation_manager import ConversationManager
-from services.storage_service import get_call_state
-from templates.script_templates import get_script
-from config.settings import SERVER_BASE_URL
+from services.storage_service import get_call_state, finish_call_state
+from templates.script_templates import get_script, get_campaign_engine_mode
+from config.settings import SERVER_BASE_URL, TTS_SPEAKER, TTS_STREAMING
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -108,7 +110,15 @@ def call_webhook():
             tts_service = get_tts_service()
             audio_url = None
             if tts_service and result.get('message'):
-                response_filename = tts_service.generate_audio(result['message'], speaker="p273")
+                response_filename = tts_service.generate_audio(
+                    result['message'],
+                    speaker=TTS_SPEAKER,
+                    stream=TTS_STREAMING,
+                    template=result.get('message_template'),
+                    variables=result.get('message_variables'),
+                    engine_mode=get_campaign_engine_mode(campaign_id),
+                    call_id=call_control_id
+                )
                 if response_filename:
                     # We need a full URL that the SIP service can access
                     server_base_url = SERVER_BASE_URL
@@ -128,6 +138,10 @@ def call_webhook():
             duration = data.get('duration', 0)
             logger.info(f"Call {call_control_id} ended, duration: {duration}s")
             
+            # Its audio can be evicted again
+            get_tts_service(load_model=False).release_call(call_control_id)
+            finish_call_state(call_control_id)
+            
             # You can add code here to update your database or analytics
             
             return jsonify({
@@ -176,10 +190,17 @@ def get_greeting():
         tts_service = get_tts_service()
         audio_url = None
         if tts_service:
-            greeting_filename = tts_service.generate_audio(greeting, speaker="p273")
+            greeting_filename = tts_service.generate_audio(
+                greeting,
+                speaker=TTS_SPEAKER,
+                stream=TTS_STREAMING,
+                engine_mode=get_campaign_engine_mode(campaign_id),
+                call_id=call_control_id
+            )
             if greeting_filename:
                 server_base_url = SERVER_BASE_URL
                 audio_url = f"{server_base_url}/audio/{greeting_filename}"
+                preload_audio(greeting_filename)
         
         # Return greeting with audio URL
         return jsonify({
@@ -193,4 +214,13 @@ def get_greeting():
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@call_bp.route('/sip/status', methods=['GET'])
+def sip_status():
+    """Report SIP command counts and round-trip latency percentiles"""
+    try:
+        return jsonify(get_sip_client().stats()), 200
+    except Exception as e:
+        logger.error(f"Error getting SIP client stats: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -6,6 +6,10 @@ import logging
 import uuid
 
 from services.campaign_service import get_campaign_manager
+from services.prerender_service import get_prompt_prerenderer
+from services.state_store import get_state_store, UnsupportedQueryError
+from templates.script_templates import get_campaign_engine_mode
+from config.settings import TTS_ENGINE_MODES
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -13,6 +17,9 @@ logger = logging.getLogger(__name__)
 # Create a Blueprint for campaign-related routes
 campaign_bp = Blueprint('campaign', __name__)
 
+# Most call states one /campaigns/<id>/calls request returns
+MAX_CALLS_LIMIT = 1000
+
 @campaign_bp.route('/campaigns', methods=['GET'])
 def get_campaigns():
     """Get all available campaigns"""
@@ -69,11 +76,15 @@ def create_campaign():
         name = data.get('name')
         industry = data.get('industry')
         template_variables = data.get('template_variables', {})
+        tts_engine = data.get('tts_engine')
         
         # Validate data
         if not name or not industry:
             return jsonify({'error': 'Name and industry are required'}), 400
         
+        if tts_engine and tts_engine not in TTS_ENGINE_MODES:
+            return jsonify({'error': f"tts_engine must be one of {', '.join(TTS_ENGINE_MODES)}"}), 400
+        
         # Generate a campaign ID if not provided
         campaign_id = data.get('campaign_id', f"campaign_{str(uuid.uuid4())[:8]}")
         
@@ -83,7 +94,8 @@ def create_campaign():
             campaign_id=campaign_id,
             name=name,
             industry=industry,
-            template_variables=template_variables
+            template_variables=template_variables,
+            tts_engine=tts_engine
         )
         
         if not success:
@@ -118,18 +130,27 @@ def update_campaign(campaign_id):
         name = data.get('name')
         industry = data.get('industry')
         template_variables = data.get('template_variables', {})
+        tts_engine = data.get('tts_engine')
         
         # Validate data
         if not name or not industry:
             return jsonify({'error': 'Name and industry are required'}), 400
         
+        if tts_engine and tts_engine not in TTS_ENGINE_MODES:
+            return jsonify({'error': f"tts_engine must be one of {', '.join(TTS_ENGINE_MODES)}"}), 400
+        
+        # Recreating the campaign would reset an engine mode the update doesn't mention
+        if not tts_engine:
+            tts_engine = get_campaign_engine_mode(campaign_id)
+        
         # Update the campaign (for now, just recreate it)
         campaign_manager = get_campaign_manager()
         success = campaign_manager.create_campaign(
             campaign_id=campaign_id,
             name=name,
             industry=industry,
-            template_variables=template_variables
+            template_variables=template_variables,
+            tts_engine=tts_engine
         )
         
         if not success:
@@ -152,6 +173,108 @@ def update_campaign(campaign_id):
         logger.error(f"Error updating campaign {campaign_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@campaign_bp.route('/campaigns/prerender', methods=['GET'])
+def get_prerender_progress():
+    """Get prompt pre-rendering progress for all campaigns"""
+    try:
+        prerenderer = get_prompt_prerenderer()
+        
+        return jsonify({
+            'success': True,
+            'progress': prerenderer.get_progress()
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Error retrieving pre-render progress: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/campaigns/<campaign_id>/prerender', methods=['GET'])
+def get_campaign_prerender_progress(campaign_id):
+    """Get prompt pre-rendering progress for a campaign"""
+    try:
+        prerenderer = get_prompt_prerenderer()
+        progress = prerenderer.get_progress(campaign_id)
+        
+        if not progress:
+            return jsonify({'error': 'Campaign has not been queued for pre-rendering'}), 404
+        
+        return jsonify({
+            'success': True,
+            'campaign_id': campaign_id,
+            'ready': prerenderer.is_ready(campaign_id),
+            'progress': progress
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Error retrieving pre-render progress for {campaign_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/campaigns/<campaign_id>/prerender', methods=['POST'])
+def prerender_campaign(campaign_id):
+    """Queue a campaign's prompts for pre-rendering"""
+    try:
+        campaign_manager = get_campaign_manager()
+        if not campaign_manager.get_script(campaign_id):
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        prerenderer = get_prompt_prerenderer()
+        prerenderer.warm_campaign(campaign_id)
+        
+        return jsonify({
+            'success': True,
+            'campaign_id': campaign_id,
+            'progress': prerenderer.get_progress(campaign_id)
+        }), 202
+    
+    except Exception as e:
+        logger.error(f"Error queuing pre-render for {campaign_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/campaigns/<campaign_id>/calls', methods=['GET'])
+def get_campaign_calls(campaign_id):
+    """Get the call states of a campaign, optionally by status and stage"""
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        if limit < 1:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+
+        calls = get_state_store().query(
+            campaign_id=campaign_id,
+            status=request.args.get('status'),
+            conversation_stage=request.args.get('stage'),
+            limit=min(limit, MAX_CALLS_LIMIT)
+        )
+
+        return jsonify({
+            'success': True,
+            'campaign_id': campaign_id,
+            'calls': [dict(state, call_sid=call_sid) for call_sid, state in calls]
+        }), 200
+
+    except UnsupportedQueryError as e:
+        return jsonify({'error': f"{e}, set STATE_BACKEND=sqlite"}), 501
+    except Exception as e:
+        logger.error(f"Error retrieving calls for {campaign_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@campaign_bp.route('/campaigns/<campaign_id>/calls/stages', methods=['GET'])
+def get_campaign_call_stages(campaign_id):
+    """Count a campaign's calls per conversation stage"""
+    try:
+        stages = get_state_store().count_by_stage(campaign_id=campaign_id, status=request.args.get('status'))
+
+        return jsonify({
+            'success': True,
+            'campaign_id': campaign_id,
+            'stages': stages
+        }), 200
+
+    except UnsupportedQueryError as e:
+        return jsonify({'error': f"{e}, set STATE_BACKEND=sqlite"}), 501
+    except Exception as e:
+        logger.error(f"Error counting calls for {campaign_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @campaign_bp.route('/industries', methods=['GET'])
 def get_industries():
     """Get all available industry templates"""
@@ -217,7 +340,8 @@ def preview_campaign(campaign_id):
             campaign_id=temp_id,
             name=f"Preview of {script['name']}",
             industry=script.get('industry', 'real_estate'),
-            template_variables=template_variables
+            template_variables=template_variables,
+            prerender=False
         )
         
         if not success:
@@ -1,5 +1,5 @@
 # Modified voice_controller.py with Dialogflow dependencies removed
-from flask import Blueprint, request, Response, jsonify, send_file
+from flask import Blueprint, request, Response, jsonify
 import logging
 import os
 import re
@@ -12,8 +12,10 @@ from services.storage_service import get_call_state, save_call_state
 from services.db_helper import get_db_service
 from datetime import datetime
 from utils.helpers import parse_speech_intent, log_call_event
+from utils.phrase_matcher import PhraseMatcher
 from config.settings import VOICE_NAME, VOICE_RATE, VOICE_PITCH, SPEECH_TIMEOUT, GATHER_TIMEOUT
 from services.tts_service import get_tts_service
+from services.audio_server import serve_audio as serve_cached_audio, get_hot_audio_tier
 from services.conversation_manager import ConversationManager
 
 # Set up logging
@@ -22,6 +24,17 @@ logger = logging.getLogger(__name__)
 # Create a Blueprint for voice-related routes
 voice_bp = Blueprint('voice', __name__)
 
+# Keywords of simple_intent_detection, interest checked first
+SIMPLE_INTENT_MATCHER = PhraseMatcher([
+    ('RealEstateInterest', ['yes', 'yeah', 'sure', 'okay', 'interested', 'tell me']),
+    ('RealEstateDecline', ['no', 'not', 'don\'t', 'isn\'t', 'not interested'])
+])
+
+# Words that accept the follow-up offer
+FOLLOWUP_ACCEPT_MATCHER = PhraseMatcher([
+    ('accept', ['yes', 'would', 'like', 'sure', 'send'])
+])
+
 # Simple helper function to replace detect_intent
 def simple_intent_detection(speech_result, call_sid=None):
     """Simple function to replace Dialogflow's detect_intent"""
@@ -34,14 +47,9 @@ def simple_intent_detection(speech_result, call_sid=None):
             "parameters": {}
         }
     
-    speech_lower = speech_result.lower()
-    
     # Simple keyword detection
-    if any(word in speech_lower for word in ['yes', 'yeah', 'sure', 'okay', 'interested', 'tell me']):
-        intent = "RealEstateInterest"
-        confidence = 0.8
-    elif any(word in speech_lower for word in ['no', 'not', 'don\'t', 'isn\'t', 'not interested']):
-        intent = "RealEstateDecline"
+    intent = SIMPLE_INTENT_MATCHER.match(speech_result)
+    if intent:
         confidence = 0.8
     else:
         intent = "fallback"
@@ -169,7 +177,7 @@ def process_followup():
                 # Fallback to basic intent detection
                 intent = "RealEstateFollowUp" if parse_speech_intent(speech_result) == 'positive' else "RealEstateDecline"
             
-            if intent == "RealEstateFollowUp" or intent == "RealEstateInterest" or any(word in speech_result.lower() for word in ['yes', 'would', 'like', 'sure', 'send']):
+            if intent == "RealEstateFollowUp" or intent == "RealEstateInterest" or FOLLOWUP_ACCEPT_MATCHER.match(speech_result):
                 response.say(script['closing'], 
                              voice=VOICE_NAME, 
                              rate=VOICE_RATE)
@@ -207,11 +215,9 @@ def process_followup():
 def serve_audio(filename):
     """Serve generated audio files"""
     try:
-        tts_service = get_tts_service()
-        file_path = tts_service.get_audio_path(filename)
-        
-        if os.path.exists(file_path):
-            return send_file(file_path, mimetype='audio/wav')
+        response = serve_cached_audio(filename)
+        if response is not None:
+            return response
         else:
             logger.error(f"Audio file not found: {filename}")
             return "File not found", 404
@@ -219,5 +225,17 @@ def serve_audio(filename):
         logger.error(f"Error serving audio file {filename}: {e}")
         return "Error serving file", 500
 
+@voice_bp.route('/tts/status', methods=['GET'])
+def tts_status():
+    """Report whether the TTS model has loaded, 503 until it has; probing never starts the load"""
+    try:
+        tts_service = get_tts_service(load_model=False)
+        status = tts_service.get_status()
+        status['hot_tier'] = get_hot_audio_tier().stats()
+        return jsonify(status), 200 if tts_service.is_ready() else 503
+    except Exception as e:
+        logger.error(f"Error getting TTS status: {e}")
+        return jsonify({'error': str(e)}), 500
+
 # Add other routes from voice_controller.py but make sure to replace any dialogflow.detect_intent calls
 # with the simple_intent_detection function
\ No newline at end of file
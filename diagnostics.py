@@ -33,6 +33,7 @@ def diagnostic():
     try:
         from services.tts_service import get_tts_service
         tts_service = get_tts_service()
+        tts_service.wait_ready()
         results["tests"].append({
             "name": "TTS Service",
             "status": "success",
@@ -0,0 +1,77 @@
+# gunicorn.conf.py
+#
+# Prefork serving with one TTS model per host instead of one per worker:
+#
+#     gunicorn -c gunicorn.conf.py
+#
+# The app, and with it the model, is loaded once in the master. Workers are
+# forked from it and share the weights, which sit in shared memory and are
+# never written to. gc.freeze() keeps the collector from touching the headers
+# of objects created before the fork, so those pages stay shared as well.
+import gc
+import os
+import fcntl
+import multiprocessing
+
+# Must be set before the app module reads its settings
+os.environ.setdefault('TTS_FORK_SHARED', 'True')
+
+wsgi_app = "app:create_app()"
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+def on_starting(server):
+    # Workers forked from the master share its lock on the journal directory, so the journal's
+    # own single-writer check can't tell them apart
+    from config.settings import STATE_BACKEND
+    if STATE_BACKEND == 'journal' and server.cfg.workers > 1:
+        raise RuntimeError(f"STATE_BACKEND=journal supports a single writer, run with 1 worker "
+                           f"(GUNICORN_WORKERS=1) or use the sqlite backend, not {server.cfg.workers}")
+
+def when_ready(server):
+    # Everything allocated so far is shared with the workers, move it out of
+    # the collector's reach so collections in a worker don't copy its pages
+    gc.collect()
+    gc.freeze()
+
+# Held by the worker that pre-renders prompts, released by the kernel when it exits
+_prerender_lock = None
+
+def _claim_prerender():
+    """Take the pre-render lock on the shared cache directory, False if another worker holds it"""
+    global _prerender_lock
+    from config.settings import TTS_CACHE_DIR
+
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    lock_file = open(os.path.join(TTS_CACHE_DIR, '.prerender.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _prerender_lock = lock_file
+    return True
+
+def post_fork(server, worker):
+    from app import start_background_tasks
+    from services.tts_service import get_tts_service
+    from services.state_store import get_state_store
+    from services.call_registry import get_call_registry
+    from services.sip_client import get_sip_client
+
+    # The master's store has no flush thread, give the worker its own locks and connection
+    get_call_registry().after_fork()
+    get_state_store().after_fork()
+    # Pooled SIP connections opened in the master can't be shared with the workers
+    get_sip_client().after_fork()
+
+    # Split the cores between the workers rather than oversubscribing them
+    torch_threads = max(1, multiprocessing.cpu_count() // server.num_workers)
+    get_tts_service(load_model=False).after_fork(torch_threads=torch_threads)
+
+    # Prompts only need pre-rendering by one worker. Whichever holds the lock does it, and
+    # when that worker is recycled the lock is freed for its replacement.
+    start_background_tasks(prerender=_claim_prerender())
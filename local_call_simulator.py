@@ -5,7 +5,7 @@ from flask import Flask, render_template, request, jsonify
 import json
 import uuid
 import time 
-from config.settings import SERVER_BASE_URL
+from config.settings import SERVER_BASE_URL, TTS_SPEAKER
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
@@ -19,12 +19,13 @@ sys.path.insert(0, current_dir)
 # Import our services
 from services.tts_service import get_tts_service
 from services.conversation_manager import ConversationManager
-from templates.script_templates import get_script
+from services.call_registry import CallRegistry
+from templates.script_templates import get_script, get_campaign_engine_mode
 
 app = Flask(__name__)
 
-# Create a dictionary to store active calls
-active_calls = {}
+# Calls of this simulator, ended ones stay listed in the call history for a day
+active_calls = CallRegistry(ended_ttl=24 * 3600)
 
 @app.route('/')
 def index():
@@ -266,14 +267,19 @@ def start_call():
         save_call_state(call_id, call_state)
         
         # Store in our active calls
-        active_calls[call_id] = call_state
+        active_calls.update(call_id, campaign_id=campaign_id, status='active', conversation_stage='greeting')
         
         # Get initial greeting
         greeting = script['conversation_flow']['greeting']['message']
         
         # Generate audio for greeting
         tts_service = get_tts_service()
-        greeting_filename = tts_service.generate_audio(greeting, speaker="p273")
+        greeting_filename = tts_service.generate_audio(
+            greeting,
+            speaker=TTS_SPEAKER,
+            engine_mode=get_campaign_engine_mode(campaign_id),
+            call_id=call_id
+        )
         
         # Get server base URL
         server_base_url = request.url_root.rstrip('/')
@@ -326,7 +332,14 @@ def process_response():
         
         # Generate audio for response
         tts_service = get_tts_service()
-        response_file = tts_service.generate_audio(result['message'], speaker="p273")
+        response_file = tts_service.generate_audio(
+            result['message'],
+            speaker=TTS_SPEAKER,
+            template=result.get('message_template'),
+            variables=result.get('message_variables'),
+            engine_mode=get_campaign_engine_mode(campaign_id),
+            call_id=call_id
+        )
         
         # Get server base URL
         server_base_url = request.url_root.rstrip('/')
@@ -336,6 +349,7 @@ def process_response():
         logger.info(f"Response message: {result['message']}")
         logger.info(f"Next stage: {result['current_stage']}")
         logger.info(f"End call: {result.get('end_call', False)}")
+        active_calls.update(call_id, conversation_stage=result['current_stage'])
         
         return jsonify({
             'success': True,
@@ -361,13 +375,18 @@ def hangup_call():
         
         if call_id in active_calls:
             # Update call state
-            active_calls[call_id]['status'] = 'completed'
-            active_calls[call_id]['end_time'] = time.time()
-            active_calls[call_id]['duration'] = active_calls[call_id]['end_time'] - active_calls[call_id]['start_time']
+            record = active_calls.end(call_id, status='completed')
+            record.duration = record.ended_at - record.started_at
             
             # Save final state
-            from services.storage_service import save_call_state
-            save_call_state(call_id, active_calls[call_id])
+            from services.storage_service import get_call_state, save_call_state, finish_call_state
+            call_state = get_call_state(call_id)
+            call_state.update(status='completed', end_time=record.ended_at, duration=record.duration)
+            save_call_state(call_id, call_state)
+            finish_call_state(call_id)
+            
+            # Its audio can be evicted again
+            get_tts_service(load_model=False).release_call(call_id)
             
             logger.info(f"Call {call_id} hung up")
         
@@ -386,17 +405,13 @@ def get_call_history():
     try:
         # Convert active_calls to a list for the frontend
         calls = []
-        for call_id, call_data in active_calls.items():
-            duration = 0
-            if 'end_time' in call_data and 'start_time' in call_data:
-                duration = call_data['end_time'] - call_data['start_time']
-            
+        for record in sorted(active_calls.records(), key=lambda record: record.started_at):
             calls.append({
-                'call_id': call_id,
-                'campaign_id': call_data.get('campaign_id', 'unknown'),
-                'status': call_data.get('status', 'unknown'),
-                'duration': round(duration),
-                'last_stage': call_data.get('conversation_stage', 'unknown')
+                'call_id': record.call_id,
+                'campaign_id': record.campaign_id or 'unknown',
+                'status': record.status or 'unknown',
+                'duration': round(record.duration or 0),
+                'last_stage': record.conversation_stage or 'unknown'
             })
         
         return jsonify({'calls': calls})
@@ -412,12 +427,11 @@ def get_call_history():
 def serve_audio(filename):
     """Serve TTS audio files"""
     try:
-        from services.tts_service import get_tts_service
-        tts_service = get_tts_service()
-        file_path = tts_service.get_audio_path(filename)
+        from services.audio_server import serve_audio as serve_cached_audio
         
-        if os.path.exists(file_path):
-            return send_file(file_path, mimetype='audio/wav')
+        response = serve_cached_audio(filename)
+        if response is not None:
+            return response
         else:
             logger.error(f"Audio file not found: {filename}")
             return "File not found", 404
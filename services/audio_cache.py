@@ -0,0 +1,378 @@
+# services/audio_cache.py
+import os
+import re
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Audio files and the segment playlists that reference them
+CACHED_EXTENSIONS = ('.wav', '.m3u')
+
+# Index of the cached files, shared by every process using the directory
+INDEX_FILENAME = 'index.db'
+
+# Scratch files are written here and renamed into the cache when complete
+TEMP_DIRNAME = '.tmp'
+
+# Eviction order per policy
+EVICTION_ORDER = {
+    'lru': 'last_used',
+    'lfu': 'hits, last_used',
+}
+
+# Files removed per eviction query
+EVICTION_BATCH = 32
+
+# Pin owner prefix for audio handed to an in-progress call
+CALL_OWNER_PREFIX = 'call:'
+
+class AudioCache:
+    """
+    Content-addressed cache for synthesized audio.
+
+    Each prompt is stored as <sha256>.wav, where the hash covers everything
+    that changes the rendered audio (model, speaker, text and sample rate).
+    Identical prompts therefore resolve to the same file across calls and
+    restarts.
+
+    Files are tracked in a SQLite index next to them, so lookups, the byte
+    budget and eviction never scan the directory. The index keeps a running
+    byte and file count, updated by triggers as entries come and go, so
+    checking the budget on every add is one row read rather than a sum over
+    all entries; it is reconciled with the entries when the cache opens.
+
+    Eviction removes the least recently (lru) or least frequently (lfu) used
+    files a batch at a time, and skips pinned files: prompts of active
+    campaigns and audio handed to a call that hasn't ended yet.
+    """
+
+    def __init__(self, cache_dir, max_bytes, policy='lru'):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir (str): Directory holding the audio files
+            max_bytes (int): Size budget for the directory in bytes
+            policy (str): Eviction policy, 'lru' or 'lfu'
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if policy not in EVICTION_ORDER:
+            logger.warning(f"Unknown audio cache policy '{policy}', using lru")
+            policy = 'lru'
+        self.policy = policy
+
+        self.temp_dir = os.path.join(cache_dir, TEMP_DIRNAME)
+        self.index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(self.temp_dir, exist_ok=True)
+        new_index = not os.path.exists(self.index_path)
+        self._db = self._connect()
+        self._clear_temp()
+        if new_index:
+            self._import_existing()
+        self._reconcile_totals()
+        self.evict()
+
+    @staticmethod
+    def make_key(model_type, speaker, text, sample_rate, variant=None, output_profile=None):
+        """
+        Build the cache key for a prompt
+
+        Args:
+            model_type (str): Loaded TTS model
+            speaker (str): Speaker name
+            text (str): Processed prompt text
+            sample_rate (int): Output sample rate
+            variant (str, optional): Marks audio produced differently from a plain
+                synthesis of the same text, such as spliced template segments
+            output_profile (str, optional): Output format the audio is encoded to,
+                omitted for the model's native output
+        """
+        normalized = normalize_text(text)
+        parts = [str(model_type), str(speaker), normalized, str(sample_rate)]
+        if variant:
+            parts.append(variant)
+        if output_profile and output_profile != 'native':
+            parts.append(f"profile={output_profile}")
+        payload = "\x1f".join(parts)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def filename_for(key, ext='wav'):
+        """Get the filename for a cache key"""
+        return f"{key}.{ext}"
+
+    def temp_path(self, key):
+        """Get a unique scratch path to synthesize into before publishing"""
+        return os.path.join(self.temp_dir, f"{key}.{uuid.uuid4().hex[:8]}.tmp")
+
+    def lookup(self, key, ext='wav'):
+        """
+        Look up a cached prompt
+
+        Args:
+            key (str): Cache key from make_key
+            ext (str): File extension, 'wav' for audio or 'm3u' for segment playlists
+
+        Returns:
+            str: Filename of the cached audio, or None on a miss
+        """
+        filename = self.filename_for(key, ext)
+        file_path = os.path.join(self.cache_dir, filename)
+
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM entries WHERE filename = ?", (filename,)).fetchone() is None:
+                return None
+
+            if not os.path.exists(file_path):
+                # Removed behind our back, forget about it
+                self._db.execute("DELETE FROM entries WHERE filename = ?", (filename,))
+                return None
+
+            self._db.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE filename = ?",
+                             (time.time(), filename))
+
+        return filename
+
+    def add(self, key, temp_path, ext='wav'):
+        """
+        Publish a freshly synthesized file into the cache
+
+        Args:
+            key (str): Cache key from make_key
+            temp_path (str): Path the audio was written to
+            ext (str): File extension to publish under
+
+        Returns:
+            str: Filename of the cached audio
+        """
+        filename = self.filename_for(key, ext)
+        file_path = os.path.join(self.cache_dir, filename)
+
+        # Atomic rename so readers never see a partially written file
+        os.replace(temp_path, file_path)
+        size = os.path.getsize(file_path)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO entries (filename, size, last_used, hits) VALUES (?, ?, ?, 0) "
+                "ON CONFLICT(filename) DO UPDATE SET size = excluded.size, last_used = excluded.last_used",
+                (filename, size, time.time())
+            )
+
+        # Never evict the new entry, it is about to be served
+        self.evict(keep=filename)
+        return filename
+
+    def pin(self, filenames, owner):
+        """
+        Protect files from eviction until their owner releases them
+
+        Args:
+            filenames (list): Cached filenames, may include files not written yet
+            owner (str): Who holds the files, e.g. 'campaign:<id>' or 'call:<id>'
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO pins (filename, owner, pinned_at) VALUES (?, ?, ?)",
+                [(filename, owner, now) for filename in filenames if filename]
+            )
+
+    def release(self, owner, keep=()):
+        """
+        Drop the pins held by owner
+
+        Args:
+            owner (str): Owner passed to pin
+            keep (iterable): Filenames that stay pinned
+
+        Returns:
+            int: Number of pins released
+        """
+        keep = list(keep)
+        with self._lock:
+            if keep:
+                placeholders = ", ".join("?" * len(keep))
+                cursor = self._db.execute(
+                    f"DELETE FROM pins WHERE owner = ? AND filename NOT IN ({placeholders})", [owner] + keep
+                )
+            else:
+                cursor = self._db.execute("DELETE FROM pins WHERE owner = ?", (owner,))
+            return cursor.rowcount
+
+    def expire_call_pins(self, max_age):
+        """
+        Release call pins older than max_age seconds, for calls whose hangup never arrived
+
+        Returns:
+            int: Number of pins released
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM pins WHERE owner LIKE ? AND pinned_at < ?",
+                (CALL_OWNER_PREFIX + '%', time.time() - max_age)
+            )
+        if cursor.rowcount:
+            logger.warning(f"Released {cursor.rowcount} audio pins of calls that never hung up")
+        return cursor.rowcount
+
+    def evict(self, keep=None):
+        """
+        Remove unpinned files, least valuable first, until the cache fits its budget
+
+        Args:
+            keep (str, optional): Filename that must not be evicted
+
+        Returns:
+            int: Number of files removed
+        """
+        order = EVICTION_ORDER[self.policy]
+        removed = []
+
+        with self._lock:
+            total = self._db.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+            while total > self.max_bytes:
+                candidates = self._db.execute(
+                    "SELECT filename, size FROM entries "
+                    "WHERE filename != ? AND filename NOT IN (SELECT filename FROM pins) "
+                    f"ORDER BY {order} LIMIT ?",
+                    (keep or '', EVICTION_BATCH)
+                ).fetchall()
+                if not candidates:
+                    logger.warning(f"Audio cache is over budget ({total} bytes) with only pinned files left")
+                    break
+
+                batch = []
+                for filename, size in candidates:
+                    if total <= self.max_bytes:
+                        break
+                    batch.append(filename)
+                    total -= size
+                self._db.executemany("DELETE FROM entries WHERE filename = ?", [(f,) for f in batch])
+                removed.extend(batch)
+
+        for filename in removed:
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove cached audio {filename}: {e}")
+
+        if removed:
+            logger.info(f"Evicted {len(removed)} audio files from cache")
+
+        return len(removed)
+
+    def stats(self):
+        """Get cache size statistics"""
+        with self._lock:
+            files, total = self._db.execute("SELECT files, bytes FROM totals WHERE id = 0").fetchone()
+            pinned = self._db.execute("SELECT COUNT(DISTINCT filename) FROM pins").fetchone()[0]
+        return {
+            'files': files,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'pinned': pinned,
+            'policy': self.policy
+        }
+
+    def after_fork(self):
+        """Reconnect in a worker forked from the process that opened the index"""
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def _connect(self):
+        # One connection per process, shared by its threads under self._lock
+        db = sqlite3.connect(self.index_path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                filename TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE INDEX IF NOT EXISTS entries_hits ON entries (hits, last_used);
+            CREATE TABLE IF NOT EXISTS pins (
+                filename TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                pinned_at REAL NOT NULL,
+                PRIMARY KEY (filename, owner)
+            );
+            CREATE INDEX IF NOT EXISTS pins_owner ON pins (owner);
+            CREATE TABLE IF NOT EXISTS totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                files INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO totals (id, files, bytes) VALUES (0, 0, 0);
+            CREATE TRIGGER IF NOT EXISTS entries_added AFTER INSERT ON entries BEGIN
+                UPDATE totals SET files = files + 1, bytes = bytes + NEW.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_removed AFTER DELETE ON entries BEGIN
+                UPDATE totals SET files = files - 1, bytes = bytes - OLD.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_resized AFTER UPDATE OF size ON entries BEGIN
+                UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+            END;
+        """)
+        return db
+
+    def _reconcile_totals(self):
+        """Recount the running totals from the entries, e.g. for an index written before they existed"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE totals SET files = (SELECT COUNT(*) FROM entries), "
+                "bytes = (SELECT COALESCE(SUM(size), 0) FROM entries) WHERE id = 0"
+            )
+
+    def _clear_temp(self):
+        """Remove scratch files of syntheses interrupted by a previous run"""
+        for entry in os.scandir(self.temp_dir):
+            # Another process may be writing it right now
+            if entry.is_file() and entry.stat().st_mtime < time.time() - 3600:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _import_existing(self):
+        """Index files left over from a run before the index existed, once"""
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+
+            if entry.name.endswith('.tmp'):
+                # Interrupted synthesis from a previous run
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+
+            if entry.name.endswith(CACHED_EXTENSIONS):
+                stat = entry.stat()
+                found.append((entry.name, stat.st_size, stat.st_mtime))
+
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO entries (filename, size, last_used, hits) VALUES (?, ?, ?, 0)", found
+            )
+
+        logger.info(f"Audio cache indexed {len(found)} existing files from {self.cache_dir}")
+
+def normalize_text(text):
+    """Normalize prompt text so trivially different strings share a cache entry"""
+    return re.sub(r'\s+', ' ', text or '').strip()
@@ -0,0 +1,289 @@
+# services/audio_server.py
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import Response, request, send_file
+from werkzeug.datastructures import ContentRange
+
+from config.settings import AUDIO_HOT_TIER_MB, AUDIO_HOT_PROMOTE_AFTER, AUDIO_CACHE_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+# Bytes of a ranged response from memory handed to the server at a time
+RANGE_CHUNK_BYTES = 64 * 1024
+
+def content_etag(data):
+    """Get the ETag of clip bytes, a hash of the content rather than of the prompt"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class HotAudioTier:
+    """
+    In-memory tier in front of the TTS audio cache.
+
+    Cache filenames are derived from the prompt, so a clip kept in memory
+    stays a valid rendering of it even if the disk cache evicts the file and
+    synthesizes it again; synthesis isn't deterministic, so each clip is
+    kept with the content hash of its own bytes as its ETag. Clips are
+    promoted after a few plays (or preloaded, for greetings) and the least
+    recently played ones are dropped once the tier is over its byte budget.
+    """
+
+    def __init__(self, max_bytes, promote_after=2):
+        """
+        Initialize the tier
+
+        Args:
+            max_bytes (int): Memory budget for clip bytes
+            promote_after (int): Plays from disk before a clip is kept in memory
+        """
+        self.max_bytes = max_bytes
+        self.promote_after = promote_after
+
+        # filename -> (bytes, etag), least recently played first
+        self._clips = OrderedDict()
+        self._total_bytes = 0
+        # filename -> plays served from disk, for clips not in memory yet
+        self._plays = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename):
+        """Get the bytes of a clip held in memory, None if it isn't"""
+        clip = self.lookup(filename)
+        return clip[0] if clip is not None else None
+
+    def lookup(self, filename):
+        """Get the bytes and ETag of a clip held in memory, None if it isn't"""
+        with self._lock:
+            clip = self._clips.get(filename)
+            if clip is None:
+                self.misses += 1
+                return None
+            self._clips.move_to_end(filename)
+            self.hits += 1
+            return clip
+
+    def record_play(self, filename, file_path):
+        """Count a play served from disk, promoting the clip once it is hot"""
+        with self._lock:
+            plays = self._plays.get(filename, 0) + 1
+            if plays < self.promote_after:
+                # Forget counts of one-off clips rather than growing without bound
+                if len(self._plays) >= 10000:
+                    self._plays.clear()
+                self._plays[filename] = plays
+                return
+            self._plays.pop(filename, None)
+
+        self.preload(filename, file_path)
+
+    def preload(self, filename, file_path):
+        """
+        Load a clip into memory now
+
+        Args:
+            filename (str): Cached audio filename
+            file_path (str): Path of the file in the disk cache
+
+        Returns:
+            bool: Whether the clip is now held in memory
+        """
+        with self._lock:
+            if filename in self._clips:
+                self._clips.move_to_end(filename)
+                return True
+
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.warning(f"Could not load {filename} into the hot audio tier: {e}")
+            return False
+
+        if len(data) > self.max_bytes:
+            return False
+        etag = content_etag(data)
+
+        with self._lock:
+            if filename not in self._clips:
+                self._clips[filename] = (data, etag)
+                self._total_bytes += len(data)
+
+            while self._total_bytes > self.max_bytes:
+                _, (evicted, _) = self._clips.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+        return True
+
+    def stats(self):
+        """Get tier size and hit statistics"""
+        with self._lock:
+            return {
+                'clips': len(self._clips),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+def clip_response(data, etag, mimetype, req):
+    """
+    Build the response for a clip held in memory
+
+    A full response sends the clip's bytes object as is. A single Range
+    is answered with a 206 of memoryview slices of the clip, copied into
+    bytes one chunk at a time as the WSGI server writes them, instead of
+    slicing out the whole range.
+
+    Args:
+        data (bytes): The clip
+        etag (str): Its content hash
+        mimetype (str): Audio MIME type
+        req (Request): The request being answered
+
+    Returns:
+        Response: 200, 206, 304, 412 or 416 response
+    """
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.accept_ranges = 'bytes'
+    _set_cache_headers(response)
+
+    # Validators first: a matching If-None-Match gets a 304, a failed If-Match a 412
+    response.make_conditional(req)
+    byte_range = req.range
+    if (response.status_code != 200 or req.method not in ('GET', 'HEAD') or byte_range is None
+            or len(byte_range.ranges) != 1):
+        return response
+
+    if_range = req.if_range
+    if (if_range.etag is not None or if_range.date is not None) and if_range.etag != etag:
+        # The client holds another version of the clip, it gets the whole new one
+        return response
+
+    span = byte_range.range_for_length(len(data))
+    if span is None:
+        response = Response(status=416)
+        response.content_range = ContentRange('bytes', None, None, len(data))
+        return response
+
+    start, stop = span
+    response.status_code = 206
+    response.response = _iter_range(memoryview(data), start, stop)
+    response.content_length = stop - start
+    response.content_range = ContentRange('bytes', start, stop, len(data))
+    return response
+
+def _iter_range(view, start, stop):
+    for offset in range(start, stop, RANGE_CHUNK_BYTES):
+        yield view[offset:min(offset + RANGE_CHUNK_BYTES, stop)].tobytes()
+
+# file path -> (mtime, size, etag) of disk files already hashed
+_file_etags = {}
+_file_etags_lock = threading.Lock()
+
+def _file_etag(file_path):
+    """Get the content hash ETag of a file, hashing it again only when it was rewritten"""
+    stat = os.stat(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _file_etags_lock:
+        cached = _file_etags.get(file_path)
+    if cached is not None and cached[:2] == version:
+        return cached[2]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(RANGE_CHUNK_BYTES), b''):
+            digest.update(block)
+    etag = digest.hexdigest()
+
+    with _file_etags_lock:
+        if len(_file_etags) >= 10000:
+            _file_etags.clear()
+        _file_etags[file_path] = version + (etag,)
+    return etag
+
+def serve_audio(filename):
+    """
+    Build the response for a cached audio file
+
+    Hot clips are served from memory, everything else from the disk cache
+    with send_file so the WSGI server can use sendfile. The ETag is a hash
+    of the bytes served, so a clip synthesized again after eviction gets a
+    new one. Responses support Range and conditional requests.
+
+    Args:
+        filename (str): Cached audio filename
+
+    Returns:
+        Response: The audio response, or None if the file does not exist
+    """
+    from services.tts_service import get_tts_service, get_audio_mimetype
+
+    # Only bare cache filenames are served
+    if not filename or os.path.basename(filename) != filename:
+        return None
+
+    mimetype = get_audio_mimetype(filename)
+    hot_tier = get_hot_audio_tier()
+
+    clip = hot_tier.lookup(filename)
+    if clip is not None:
+        data, etag = clip
+        return clip_response(data, etag, mimetype, request)
+
+    tts_service = get_tts_service(load_model=False)
+    file_path = tts_service.get_audio_path(filename)
+
+    # Stream segments may still be synthesizing, wait for them
+    if not (os.path.exists(file_path) or tts_service.wait_for_audio(filename)):
+        return None
+
+    response = send_file(file_path, mimetype=mimetype, conditional=True, etag=_file_etag(file_path),
+                         max_age=AUDIO_CACHE_MAX_AGE)
+    _set_cache_headers(response)
+    hot_tier.record_play(filename, file_path)
+    return response
+
+def preload_audio(filename):
+    """Keep a clip that is about to be played, such as a greeting, in memory"""
+    if not filename:
+        return False
+
+    from services.tts_service import get_tts_service
+    tts_service = get_tts_service(load_model=False)
+    hot_tier = get_hot_audio_tier()
+
+    file_path = tts_service.get_audio_path(filename)
+    if not hot_tier.preload(filename, file_path):
+        return False
+
+    if filename.endswith('.m3u'):
+        # Segments of a streamed message that are already synthesized
+        with open(file_path, 'r') as f:
+            for line in f:
+                segment = line.strip()
+                if segment and not segment.startswith('#') and os.path.exists(tts_service.get_audio_path(segment)):
+                    hot_tier.preload(segment, tts_service.get_audio_path(segment))
+
+    return True
+
+def _set_cache_headers(response):
+    # Not immutable: a filename gets different bytes if it is evicted and synthesized again
+    response.cache_control.public = True
+    response.cache_control.max_age = AUDIO_CACHE_MAX_AGE
+
+# Singleton instance
+_hot_tier = None
+
+def get_hot_audio_tier():
+    """Get the hot audio tier singleton"""
+    global _hot_tier
+    if _hot_tier is None:
+        _hot_tier = HotAudioTier(AUDIO_HOT_TIER_MB * 1024 * 1024, promote_after=AUDIO_HOT_PROMOTE_AFTER)
+    return _hot_tier
@@ -0,0 +1,213 @@
+# services/audio_utils.py
+import wave
+import struct
+import logging
+from math import gcd
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # numpy ships with the TTS package, but keep the service importable without it
+    np = None
+
+# Output profiles: (sample rate, encoding), None keeps the model's native output
+OUTPUT_PROFILES = {
+    'native': None,
+    'pcm16k': (16000, 'pcm16'),
+    'ulaw8k': (8000, 'mulaw'),
+}
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_MULAW = 7
+
+# G.711 mu-law constants
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32635
+
+def read_wav(file_path):
+    """
+    Read a 16-bit PCM or G.711 mu-law WAV file
+
+    Args:
+        file_path (str): Path to the WAV file
+
+    Returns:
+        tuple: (mono float32 samples in [-1, 1], sample rate)
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(22)
+    if len(header) == 22 and header[:4] == b'RIFF' and struct.unpack('<H', header[20:22])[0] == WAVE_FORMAT_MULAW:
+        return _read_mulaw_wav(file_path)
+
+    with wave.open(file_path, 'rb') as wav_file:
+        sample_rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        frames = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width != 2:
+        raise ValueError(f"Unsupported sample width {sample_width} in {file_path}")
+
+    samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    return samples, sample_rate
+
+def write_wav(file_path, samples, sample_rate, encoding='pcm16'):
+    """
+    Write mono float samples as a WAV file
+
+    Args:
+        file_path (str): Path to write
+        samples (numpy.ndarray): Float samples in [-1, 1]
+        sample_rate (int): Sample rate of the samples
+        encoding (str): 'pcm16' or 'mulaw' (G.711, 8 bits per sample)
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype('<i2')
+
+    if encoding == 'mulaw':
+        _write_mulaw_wav(file_path, mulaw_encode(pcm), sample_rate)
+        return
+
+    with wave.open(file_path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+def resample(samples, source_rate, target_rate):
+    """Resample float samples to another rate with band-limiting"""
+    if source_rate == target_rate or not len(samples):
+        return samples
+
+    try:
+        # scipy ships with TTS, imported here as it is slow to import
+        from scipy.signal import resample_poly
+    except ImportError:
+        resample_poly = None
+
+    if resample_poly is not None:
+        divisor = gcd(int(source_rate), int(target_rate))
+        return resample_poly(samples, target_rate // divisor, source_rate // divisor).astype(np.float32)
+
+    # FFT resampling, fine for prompt-length clips
+    target_length = int(round(len(samples) * target_rate / source_rate))
+    spectrum = np.fft.rfft(samples)
+    spectrum = spectrum[:target_length // 2 + 1]
+    return (np.fft.irfft(spectrum, target_length) * (target_length / len(samples))).astype(np.float32)
+
+def convert_wav(file_path, sample_rate, encoding):
+    """
+    Rewrite a WAV file in place at another sample rate and encoding
+
+    Args:
+        file_path (str): WAV file to convert
+        sample_rate (int): Target sample rate
+        encoding (str): Target encoding, see write_wav
+    """
+    samples, source_rate = read_wav(file_path)
+    write_wav(file_path, resample(samples, source_rate, sample_rate), sample_rate, encoding)
+
+def mulaw_encode(pcm):
+    """Encode 16-bit PCM samples as G.711 mu-law bytes"""
+    pcm = pcm.astype(np.int32)
+    sign = np.where(pcm < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(pcm), MULAW_CLIP) + MULAW_BIAS
+
+    exponent = np.clip(np.floor(np.log2(magnitude)).astype(np.int32) - 7, 0, 7)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+def mulaw_decode(data):
+    """Decode G.711 mu-law bytes to 16-bit PCM samples"""
+    data = ~data.astype(np.int32) & 0xFF
+    exponent = (data >> 4) & 0x07
+    mantissa = data & 0x0F
+    magnitude = (((mantissa << 3) + MULAW_BIAS) << exponent) - MULAW_BIAS
+    return np.where(data & 0x80, -magnitude, magnitude).astype(np.int16)
+
+def _write_mulaw_wav(file_path, data, sample_rate):
+    """Write mu-law bytes with a WAVE_FORMAT_MULAW header, which the wave module can't"""
+    fmt = struct.pack('<HHIIHHH', WAVE_FORMAT_MULAW, 1, sample_rate, sample_rate, 1, 8, 0)
+    fact = struct.pack('<I', len(data))
+    padding = b'\0' * (len(data) % 2)
+    riff_size = 4 + (8 + len(fmt)) + (8 + len(fact)) + (8 + len(data) + len(padding))
+
+    with open(file_path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', riff_size) + b'WAVE')
+        f.write(b'fmt ' + struct.pack('<I', len(fmt)) + fmt)
+        f.write(b'fact' + struct.pack('<I', len(fact)) + fact)
+        f.write(b'data' + struct.pack('<I', len(data)) + data.tobytes() + padding)
+
+def _read_mulaw_wav(file_path):
+    """Read a mono or multi-channel WAVE_FORMAT_MULAW file"""
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    channels = sample_rate = data = None
+    position = 12
+    while position + 8 <= len(content):
+        chunk_id = content[position:position + 4]
+        chunk_size = struct.unpack('<I', content[position + 4:position + 8])[0]
+        body = content[position + 8:position + 8 + chunk_size]
+        if chunk_id == b'fmt ':
+            _, channels, sample_rate = struct.unpack('<HHI', body[:8])
+        elif chunk_id == b'data':
+            data = body
+        position += 8 + chunk_size + (chunk_size % 2)
+
+    if data is None or sample_rate is None:
+        raise ValueError(f"Malformed mu-law WAV file {file_path}")
+
+    samples = mulaw_decode(np.frombuffer(data, dtype=np.uint8)).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+
+    return samples, sample_rate
+
+def trim_silence(samples, sample_rate, threshold=0.01, padding_ms=40):
+    """Trim leading and trailing silence, keeping a little padding"""
+    voiced = np.flatnonzero(np.abs(samples) > threshold)
+    if voiced.size == 0:
+        return samples
+
+    padding = int(sample_rate * padding_ms / 1000)
+    start = max(0, voiced[0] - padding)
+    end = min(len(samples), voiced[-1] + padding + 1)
+    return samples[start:end]
+
+def crossfade_concat(chunks, sample_rate, crossfade_ms=15):
+    """
+    Join audio chunks end to end with a short linear crossfade at each seam
+
+    Args:
+        chunks (list): Float sample arrays at the same sample rate
+        sample_rate (int): Sample rate of the chunks
+        crossfade_ms (int): Length of each crossfade
+
+    Returns:
+        numpy.ndarray: The joined samples
+    """
+    chunks = [chunk for chunk in chunks if len(chunk)]
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+
+    fade = int(sample_rate * crossfade_ms / 1000)
+    total = sum(len(chunk) for chunk in chunks)
+    output = np.zeros(total, dtype=np.float32)
+
+    position = 0
+    for index, chunk in enumerate(chunks):
+        overlap = min(fade, position, len(chunk)) if index else 0
+        if overlap:
+            ramp = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+            start = position - overlap
+            output[start:position] = output[start:position] * (1.0 - ramp) + chunk[:overlap] * ramp
+
+        output[position:position + len(chunk) - overlap] = chunk[overlap:]
+        position += len(chunk) - overlap
+
+    return output[:position]
@@ -5,6 +5,9 @@ import requests
 import json
 from urllib.parse import urljoin
 import time
+from config.settings import TTS_SPEAKER, TTS_STREAMING, SIP_SERVICE_URL
+from services.audio_server import preload_audio
+from services.sip_client import get_sip_client
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +30,8 @@ class CallBridgeService:
             conversation_manager: Conversation manager instance
             storage_service: Storage service for call state
         """
-        self.sip_service_url = "http://localhost:5002"
+        self.sip_service_url = sip_service_url or SIP_SERVICE_URL
+        self.sip_client = get_sip_client()
         self.tts_service = tts_service
         self.conversation_manager = conversation_manager
         self.storage_service = storage_service
@@ -64,11 +68,7 @@ class CallBridgeService:
             endpoint = urljoin(self.sip_service_url, "/make-call")
             logger.info(f"Calling endpoint: {endpoint}")
             
-            response = requests.post(
-                endpoint,
-                json=call_request,
-                timeout=10
-            )
+            response = self.sip_client.post(endpoint, call_request)
             
             logger.info(f"Response status: {response.status_code}")
             logger.info(f"Response content: {response.text[:200]}")  # Log first 200 chars
@@ -149,7 +149,7 @@ class CallBridgeService:
                 call_state['status'] = 'in_progress'
                 
                 # Get campaign script
-                from templates.script_templates import get_script
+                from templates.script_templates import get_script, get_campaign_engine_mode
                 campaign_id = call_state.get('campaign_id', 'campaign_001')
                 script = get_script(campaign_id)
                 
@@ -169,12 +169,19 @@ class CallBridgeService:
                 audio_url = None
                 if self.tts_service:
                     # Generate greeting audio
-                    greeting_filename = self.tts_service.generate_audio(greeting, speaker="p273")
+                    greeting_filename = self.tts_service.generate_audio(
+                        greeting,
+                        speaker=TTS_SPEAKER,
+                        stream=TTS_STREAMING,
+                        engine_mode=get_campaign_engine_mode(campaign_id),
+                        call_id=call_control_id
+                    )
                     if greeting_filename:
                         # We'd need the full URL to the audio file
                         # In a real environment, this should be a publicly accessible URL
                         # For now we'll use a placeholder that the SIP service would understand
                         audio_url = f"/audio/{greeting_filename}"
+                        preload_audio(greeting_filename)
                 
                 # Save updated state
                 if self.storage_service:
@@ -212,6 +219,11 @@ class CallBridgeService:
                 
                 if self.storage_service:
                     self.storage_service.save_call_state(call_control_id, call_state)
+                    self.storage_service.finish_call(call_control_id)
+                
+                # Its audio can be evicted again
+                if self.tts_service:
+                    self.tts_service.release_call(call_control_id)
                 
                 logger.info(f"Call {call_control_id} has ended, duration: {call_state.get('duration', 0):.2f} seconds")
                 
@@ -229,7 +241,7 @@ class CallBridgeService:
                 
                 # Process the user input with conversation manager
                 if self.conversation_manager:
-                    from templates.script_templates import get_script
+                    from templates.script_templates import get_script, get_campaign_engine_mode
                     campaign_id = call_state.get('campaign_id', 'campaign_001')
                     script = get_script(campaign_id)
                     
@@ -239,7 +251,15 @@ class CallBridgeService:
                     # Generate audio for response
                     audio_url = None
                     if self.tts_service and result.get('message'):
-                        response_filename = self.tts_service.generate_audio(result['message'], speaker="p273")
+                        response_filename = self.tts_service.generate_audio(
+                            result['message'],
+                            speaker=TTS_SPEAKER,
+                            stream=TTS_STREAMING,
+                            template=result.get('message_template'),
+                            variables=result.get('message_variables'),
+                            engine_mode=get_campaign_engine_mode(campaign_id),
+                            call_id=call_control_id
+                        )
                         if response_filename:
                             audio_url = f"/audio/{response_filename}"
                     
@@ -303,11 +323,7 @@ class CallBridgeService:
             if audio_url:
                 speak_data["audio_url"] = audio_url
             
-            response = requests.post(
-                urljoin(self.sip_service_url, "/speak"),
-                json=speak_data,
-                timeout=10
-            )
+            response = self.sip_client.post(urljoin(self.sip_service_url, "/speak"), speak_data)
             
             response.raise_for_status()
             result = response.json()
@@ -334,10 +350,11 @@ class CallBridgeService:
             bool: Success or failure
         """
         try:
-            response = requests.post(
+            # Hanging up twice is harmless, so it is retried even if the first attempt may have arrived
+            response = self.sip_client.post(
                 urljoin(self.sip_service_url, "/hangup"),
-                json={"call_control_id": call_control_id},
-                timeout=10
+                {"call_control_id": call_control_id},
+                idempotent=True
             )
             
             response.raise_for_status()
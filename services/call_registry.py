@@ -0,0 +1,280 @@
+# services/call_registry.py
+import time
+import heapq
+import logging
+import threading
+
+from config.settings import CALL_REGISTRY_MAX_CALLS, CALL_REGISTRY_TTL, CALL_REGISTRY_ENDED_TTL
+
+logger = logging.getLogger(__name__)
+
+# Independent locks the calls are spread over
+SHARD_COUNT = 16
+
+# The expiry heap is rebuilt when stale entries outnumber live ones this many times
+HEAP_REBUILD_FACTOR = 4
+
+class CallRecord:
+    """What the server tracks about one call"""
+    __slots__ = ('call_id', 'campaign_id', 'phone_number', 'status', 'conversation_stage',
+                 'started_at', 'ended_at', 'duration', 'state', 'expires_at')
+
+    def __init__(self, call_id):
+        self.call_id = call_id
+        self.campaign_id = None
+        self.phone_number = None
+        self.status = None
+        self.conversation_stage = None
+        self.started_at = time.time()
+        self.ended_at = None
+        self.duration = None
+        # Conversation state cached by the state store
+        self.state = None
+        self.expires_at = None
+
+    def to_dict(self):
+        """Get the record's fields, without the cached state"""
+        return {
+            'call_id': self.call_id,
+            'campaign_id': self.campaign_id,
+            'phone_number': self.phone_number,
+            'status': self.status,
+            'conversation_stage': self.conversation_stage,
+            'started_at': self.started_at,
+            'ended_at': self.ended_at,
+            'duration': self.duration
+        }
+
+class CallRegistry:
+    """
+    Thread-safe registry of the calls in progress.
+
+    Calls are spread over SHARD_COUNT dicts with a lock each, so webhooks of
+    different calls rarely contend. Every record expires: an active call
+    CALL_REGISTRY_TTL seconds after it was last updated, an ended call
+    ended_ttl seconds after its hangup. Expiry times sit in one heap that is
+    checked on every update, so expired calls are dropped without a thread
+    per call or a sweeper. Past max_calls, the calls closest to expiring are
+    dropped first.
+    """
+
+    def __init__(self, max_calls=10000, ttl=14400, ended_ttl=30):
+        """
+        Initialize the registry
+
+        Args:
+            max_calls (int): Most calls kept
+            ttl (float): Seconds an active call is kept after its last update
+            ended_ttl (float): Seconds an ended call is kept after hangup
+        """
+        self.max_calls = max_calls
+        self.ttl = ttl
+        self.ended_ttl = ended_ttl
+
+        self._shards = [({}, threading.Lock()) for _ in range(SHARD_COUNT)]
+        # (expires_at, call_id), entries are stale once the record's expiry moved
+        self._heap = []
+        self._heap_lock = threading.Lock()
+        self._count = 0
+
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, call_id):
+        return self.get(call_id) is not None
+
+    def get(self, call_id):
+        """
+        Get a call's record
+
+        Returns:
+            CallRecord: The record, or None if the call isn't tracked
+        """
+        calls, lock = self._shard(call_id)
+        with lock:
+            record = calls.get(call_id)
+        if record is not None and record.expires_at <= time.monotonic():
+            return None
+        return record
+
+    def update(self, call_id, **fields):
+        """
+        Create or update a call's record and extend its lifetime
+
+        Args:
+            call_id (str): Call ID
+            **fields: CallRecord fields to set, None values are ignored
+
+        Returns:
+            CallRecord: The record
+        """
+        calls, lock = self._shard(call_id)
+        with lock:
+            record = calls.get(call_id)
+            if record is None:
+                record = calls[call_id] = CallRecord(call_id)
+                with self._heap_lock:
+                    self._count += 1
+            for name, value in fields.items():
+                if value is not None:
+                    setattr(record, name, value)
+            if record.ended_at is None:
+                self._schedule(record, time.monotonic() + self.ttl)
+            elif record.expires_at is None:
+                self._schedule(record, time.monotonic() + self.ended_ttl)
+
+        self._expire()
+        return record
+
+    def end(self, call_id, status='ended', **fields):
+        """
+        Mark a call as ended, it is dropped ended_ttl seconds later
+
+        Args:
+            call_id (str): Call ID
+            status (str): Final status
+            **fields: Other CallRecord fields to set
+
+        Returns:
+            CallRecord: The record, None if the call wasn't tracked
+        """
+        calls, lock = self._shard(call_id)
+        with lock:
+            record = calls.get(call_id)
+            if record is None:
+                return None
+            for name, value in fields.items():
+                if value is not None:
+                    setattr(record, name, value)
+            record.status = status
+            record.ended_at = time.time()
+            self._schedule(record, time.monotonic() + self.ended_ttl)
+        return record
+
+    def remove(self, call_id):
+        """
+        Stop tracking a call
+
+        Returns:
+            CallRecord: The removed record, or None
+        """
+        calls, lock = self._shard(call_id)
+        with lock:
+            record = calls.pop(call_id, None)
+            if record is not None:
+                with self._heap_lock:
+                    self._count -= 1
+        return record
+
+    def records(self):
+        """Get a snapshot of the tracked calls"""
+        now = time.monotonic()
+        records = []
+        for calls, lock in self._shards:
+            with lock:
+                records.extend(record for record in calls.values() if record.expires_at > now)
+        return records
+
+    def expire(self):
+        """
+        Drop expired calls, and the calls closest to expiring while over max_calls
+
+        Returns:
+            int: Number of calls dropped
+        """
+        return self._expire(force=True)
+
+    def stats(self):
+        """Get call and expiry counts"""
+        with self._heap_lock:
+            heap_size = len(self._heap)
+        return {
+            'calls': self._count,
+            'max_calls': self.max_calls,
+            'heap_entries': heap_size,
+            'expired': self.expired,
+            'evicted': self.evicted
+        }
+
+    def after_fork(self):
+        """Give a forked child its own locks"""
+        self._shards = [(calls, threading.Lock()) for calls, _ in self._shards]
+        self._heap_lock = threading.Lock()
+
+    def _shard(self, call_id):
+        return self._shards[hash(call_id) % SHARD_COUNT]
+
+    def _schedule(self, record, expires_at):
+        """Set a record's expiry, called under its shard lock"""
+        record.expires_at = expires_at
+        with self._heap_lock:
+            heapq.heappush(self._heap, (expires_at, record.call_id))
+            if len(self._heap) > HEAP_REBUILD_FACTOR * max(self._count, 64):
+                self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        """Drop stale heap entries, called under the heap lock"""
+        live = []
+        for calls, _ in self._shards:
+            # Reading without the shard locks is fine, a racing update pushes a fresh entry
+            live.extend((record.expires_at, call_id) for call_id, record in list(calls.items())
+                        if record.expires_at is not None)
+        heapq.heapify(live)
+        self._heap = live
+
+    def _expire(self, force=False):
+        now = time.monotonic()
+        with self._heap_lock:
+            # Cheap check on every update: nothing due and under the cap
+            if not force and (not self._heap or self._heap[0][0] > now) and self._count <= self.max_calls:
+                return 0
+
+        removed = 0
+        while True:
+            with self._heap_lock:
+                if not self._heap:
+                    break
+                expires_at, call_id = self._heap[0]
+                over_capacity = self._count > self.max_calls
+                if expires_at > now and not over_capacity:
+                    break
+                heapq.heappop(self._heap)
+
+            calls, lock = self._shard(call_id)
+            with lock:
+                record = calls.get(call_id)
+                if record is None or record.expires_at != expires_at:
+                    # Stale entry, the call was updated or removed since
+                    continue
+                del calls[call_id]
+                with self._heap_lock:
+                    self._count -= 1
+
+            if expires_at > now:
+                self.evicted += 1
+            else:
+                self.expired += 1
+            removed += 1
+
+        if removed:
+            logger.debug(f"Dropped {removed} calls from the registry")
+        return removed
+
+_call_registry = None
+_call_registry_lock = threading.Lock()
+
+def get_call_registry():
+    """Get the call registry singleton"""
+    global _call_registry
+    if _call_registry is None:
+        with _call_registry_lock:
+            if _call_registry is None:
+                _call_registry = CallRegistry(
+                    max_calls=CALL_REGISTRY_MAX_CALLS,
+                    ttl=CALL_REGISTRY_TTL,
+                    ended_ttl=CALL_REGISTRY_ENDED_TTL
+                )
+    return _call_registry
@@ -0,0 +1,268 @@
+# services/call_state.py
+import sys
+import json
+import hashlib
+import threading
+from array import array
+from collections.abc import MutableMapping, MutableSequence, Sequence
+
+# Interned stage names and their ids, shared by every call
+_stage_names = []
+_stage_ids = {}
+_stage_lock = threading.Lock()
+
+def stage_id(name):
+    """Get the small-int id of a stage name, registering it on first use"""
+    stage = _stage_ids.get(name)
+    if stage is None:
+        with _stage_lock:
+            stage = _stage_ids.get(name)
+            if stage is None:
+                stage = len(_stage_names)
+                if stage > 0xFFFF:
+                    raise ValueError(f"Too many distinct conversation stages to register '{name}'")
+                _stage_names.append(sys.intern(name))
+                _stage_ids[_stage_names[stage]] = stage
+    return stage
+
+def stage_name(stage):
+    """Get the stage name of an id from stage_id"""
+    return _stage_names[stage]
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'))
+
+# Marks a field that isn't set
+_MISSING = object()
+
+class StageHistory(MutableSequence):
+    """
+    The previous_stages of a CallState as a list of stage names.
+
+    Reads and writes go to the state's array of stage ids, so
+    state['previous_stages'].append(stage) works like it did on a dict.
+    """
+    __slots__ = ('_state',)
+
+    def __init__(self, state):
+        self._state = state
+
+    def _ids(self):
+        return self._state.previous_stages
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_stage_names[stage] for stage in self._ids()[index]]
+        return _stage_names[self._ids()[index]]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._ids()[index] = array('H', (stage_id(stage) for stage in value))
+        else:
+            self._ids()[index] = stage_id(value)
+
+    def __delitem__(self, index):
+        del self._ids()[index]
+
+    def __len__(self):
+        return len(self._ids())
+
+    def insert(self, index, value):
+        self._ids().insert(index, stage_id(value))
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class CallState(MutableMapping):
+    """
+    Conversation state of one call.
+
+    Reads and writes like the dict it replaces, but common fields live in
+    slots instead of a per-call dict: stage, status, matched response and
+    campaign names are interned strings shared by all calls, and the stage
+    history is an array of 16-bit stage ids, read and changed in place
+    through a StageHistory. Other keys go to a small extras dict.
+
+    Backends that store deltas compare a state against a fingerprint of
+    what they last wrote, see fingerprint() and diff_state().
+    """
+    __slots__ = ('conversation_stage', 'previous_stages', 'conversation_data', 'campaign_id', 'status',
+                 'matched_response', 'start_time', 'end_time', 'duration', 'last_updated', 'messages',
+                 '_extra')
+
+    FIELDS = __slots__[:11]
+    _FIELD_SET = frozenset(FIELDS)
+    # Fields holding one of a few names
+    INTERNED = frozenset(['conversation_stage', 'status', 'matched_response', 'campaign_id'])
+
+    def __init__(self, data=None, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, _MISSING)
+        self._extra = None
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a state from a dict, such as a stored state"""
+        return data if isinstance(data, cls) else cls(data)
+
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            if key == 'previous_stages':
+                return StageHistory(self)
+            return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'previous_stages':
+            self.previous_stages = array('H', (stage_id(stage) for stage in value))
+        elif key in self._FIELD_SET:
+            if key in self.INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELD_SET:
+            if getattr(self, key) is _MISSING:
+                raise KeyError(key)
+            setattr(self, key, _MISSING)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for name in self.FIELDS:
+            if getattr(self, name) is not _MISSING:
+                yield name
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"CallState({self.to_dict()!r})"
+
+    def push_stage(self, stage):
+        """Append a stage to previous_stages"""
+        if self.previous_stages is _MISSING:
+            self.previous_stages = array('H')
+        self.previous_stages.append(stage_id(stage))
+
+    def to_dict(self):
+        """Get the state as a plain dict, previous_stages as a list"""
+        data = {key: self[key] for key in self}
+        if 'previous_stages' in data:
+            data['previous_stages'] = list(data['previous_stages'])
+        return data
+
+    def copy(self):
+        """
+        Get a copy that later changes to this state don't reach
+
+        Lists and dicts are copied at every level, other values are shared.
+        """
+        state = CallState.__new__(CallState)
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            setattr(state, name, array('H', value) if isinstance(value, array) else _copy_value(value))
+        state._extra = _copy_value(self._extra)
+        return state
+
+def _copy_value(value):
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    return value
+
+def _digest(value):
+    return hashlib.blake2b(_encode(value).encode('utf-8'), digest_size=8).digest()
+
+def _digest_items(items, prefix=None):
+    """Chained digest of list items, and the digest after the first prefix items"""
+    digest = hashlib.blake2b(digest_size=8)
+    at_prefix = digest.digest() if prefix == 0 else None
+    for count, item in enumerate(items, 1):
+        # Encoded JSON has no raw newline, so it separates items unambiguously
+        digest.update(_encode(item).encode('utf-8') + b'\n')
+        if count == prefix:
+            at_prefix = digest.digest()
+    return digest.digest(), at_prefix
+
+def fingerprint(data):
+    """
+    Summarize a written state for later diff_state calls
+
+    Args:
+        data (dict): The state as written, e.g. CallState.to_dict()
+
+    Returns:
+        dict: Key -> (digest, list length or None), a few bytes per key
+            however large the value
+    """
+    return {key: (_digest_items(value)[0], len(value)) if isinstance(value, list) else (_digest(value), None)
+            for key, value in data.items()}
+
+def diff_state(data, baseline):
+    """
+    Get the changes of a state since it had the given fingerprint
+
+    Args:
+        data (dict): The state now, e.g. CallState.to_dict()
+        baseline (dict): fingerprint() of the state last written
+
+    Returns:
+        tuple: (delta, fingerprint of data); the delta holds 'set' (changed
+            values), 'append' (new items of lists that only grew) and
+            'unset' (removed keys), only the ones that aren't empty
+    """
+    changed, appended, current = {}, {}, {}
+    for key, value in data.items():
+        old = baseline.get(key)
+        if isinstance(value, list):
+            prefix = old[1] if old is not None and old[1] is not None and old[1] <= len(value) else None
+            digest, at_prefix = _digest_items(value, prefix)
+            current[key] = (digest, len(value))
+            if old is not None and digest == old[0]:
+                continue
+            if prefix is not None and at_prefix == old[0]:
+                # A list that only grew, write the new items
+                appended[key] = value[prefix:]
+            else:
+                changed[key] = value
+        else:
+            current[key] = (_digest(value), None)
+            if old is None or current[key][0] != old[0]:
+                changed[key] = value
+
+    delta = {}
+    if changed:
+        delta['set'] = changed
+    if appended:
+        delta['append'] = appended
+    removed = sorted(key for key in baseline if key not in data)
+    if removed:
+        delta['unset'] = removed
+    return delta, current
@@ -28,9 +28,13 @@ class CampaignManager:
         """Get a rendered script for a campaign"""
         return get_script(campaign_id, default_id)
     
-    def create_campaign(self, campaign_id, name, industry, template_variables):
-        """Create a new campaign"""
-        success = create_campaign(campaign_id, name, industry, template_variables)
+    def create_campaign(self, campaign_id, name, industry, template_variables, prerender=True, tts_engine=None):
+        """Create a new campaign, queuing its prompts for pre-rendering"""
+        success = create_campaign(campaign_id, name, industry, template_variables, tts_engine=tts_engine)
+        
+        if success and prerender:
+            from services.prerender_service import get_prompt_prerenderer
+            get_prompt_prerenderer().warm_campaign(campaign_id)
         
         if success:
             # Initialize campaign statistics
@@ -1,61 +1,14 @@
 # test_conversation_simple.py
-import os
-import sys
 import json
 import uuid
 import logging
 from services.storage_service import save_call_state, get_call_state
-import re
+from services.script_engine import get_compiled_script
 import random
 from datetime import datetime
 
-# In-memory storage for testing
-_conversation_states = {}
-
 logger = logging.getLogger(__name__)
 
-def save_call_state(call_sid, state):
-    """Save conversation state for a call"""
-    # Add timestamp
-    state['last_updated'] = datetime.now().isoformat()
-    
-    # Save to memory
-    _conversation_states[call_sid] = state
-    
-    # Save to disk for persistence
-    storage_dir = os.path.join(os.getcwd(), "conversation_states")
-    os.makedirs(storage_dir, exist_ok=True)
-    
-    file_path = os.path.join(storage_dir, f"{call_sid}.json")
-    with open(file_path, 'w') as f:
-        json.dump(state, f, indent=2)
-    
-    return state
-
-def get_call_state(call_sid):
-    """Get conversation state for a call"""
-    # Try memory first
-    if call_sid in _conversation_states:
-        return _conversation_states[call_sid]
-    
-    # Try disk
-    storage_dir = os.path.join(os.getcwd(), "conversation_states")
-    file_path = os.path.join(storage_dir, f"{call_sid}.json")
-    
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            state = json.load(f)
-            _conversation_states[call_sid] = state
-            return state
-    
-    # Create new state if not found
-    state = {
-        'conversation_stage': 'greeting',
-        'conversation_data': {},
-        'previous_stages': []
-    }
-    return state
-
 class ConversationManager:
     """Manager for multi-turn conversations"""
     
@@ -125,14 +78,14 @@ class ConversationManager:
         
         # Get current stage definition
         if 'conversation_flow' in script:
-            # New format: multi-turn conversation flow
-            flow = script.get('conversation_flow', {})
-            current_stage_data = flow.get(current_stage, {})
+            # New format: multi-turn conversation flow, compiled once per script
+            compiled = get_compiled_script(script)
+            stage = compiled.stage(current_stage)
             
             # Check if this is an end stage
-            if current_stage_data.get('end_call', False):
+            if stage.end_call:
                 return {
-                    'message': current_stage_data.get('message', "Thank you for your time."),
+                    'message': stage.message if stage.message is not None else "Thank you for your time.",
                     'end_call': True,
                     'current_stage': current_stage
                 }
@@ -145,75 +98,72 @@ class ConversationManager:
             next_stage = None
             matched_response = None
             
-            responses = current_stage_data.get('responses', {})
-            for response_type, response_data in responses.items():
-                patterns = response_data.get('patterns', [])
+            response = stage.match(user_input_lower)
+            if response is None and user_input_lower:
+                response, confidence = stage.classify(user_input_lower)
+                if response:
+                    logger.info(f"Classified input as '{response.name}' (confidence {confidence:.2f})")
+            if response:
+                next_stage = response.next_stage
+                matched_response = response.name
+                logger.info(f"Matched response type '{matched_response}'")
                 
-                for pattern in patterns:
-                    if pattern.lower() in user_input_lower:
-                        next_stage = response_data.get('next_stage')
-                        matched_response = response_type
-                        logger.info(f"Matched pattern '{pattern}' for response type '{response_type}'")
-                        break
-                        
-                if next_stage:
-                    break
-            
-            # Extract information if configured
-            if matched_response and 'extract_info' in responses.get(matched_response, {}):
-                extraction_patterns = responses[matched_response]['extract_info']
-                for field, pattern in extraction_patterns.items():
-                    matches = re.search(pattern, user_input, re.IGNORECASE)
-                    if matches:
-                        conversation_data[field] = matches.group(1)
-                        logger.info(f"Extracted {field}: {matches.group(1)}")
-                        call_state['conversation_data'] = conversation_data
+                # Extract information if configured
+                extracted = response.extract(user_input or "")
+                if extracted:
+                    conversation_data.update(extracted)
+                    logger.info(f"Extracted {extracted}")
+                    call_state['conversation_data'] = conversation_data
             
             # Use fallback if no match found
-            if not next_stage and 'fallback' in responses:
-                next_stage = responses['fallback'].get('next_stage')
+            if not next_stage and stage.fallback:
+                next_stage = stage.fallback.next_stage
                 matched_response = 'fallback'
                 logger.info("Using fallback response")
             
             # If still no next stage, stay on current stage
             if not next_stage:
-                fallbacks = script.get('fallback_responses', 
-                                    ["I'm sorry, I didn't understand that. Could you please repeat?"])
                 return {
-                    'message': random.choice(fallbacks),
+                    'message': random.choice(compiled.fallback_responses),
                     'end_call': False,
                     'current_stage': current_stage,
                     'matched_response': 'fallback'
                 }
             
             # Get the next stage data
-            next_stage_data = flow.get(next_stage, {})
+            next_stage_data = compiled.stage(next_stage)
             
             # Get the response message and check if call should end
-            response_message = next_stage_data.get('message', '')
-            end_call = next_stage_data.get('end_call', False)
+            message_template = next_stage_data.message or ''
+            end_call = next_stage_data.end_call
             
             # Process variables in the message
-            for key, value in conversation_data.items():
-                placeholder = f"{{{key}}}"
-                if placeholder in response_message:
-                    response_message = response_message.replace(placeholder, str(value))
+            message_variables = {name: conversation_data[name] for name in next_stage_data.placeholders
+                                 if name in conversation_data}
+            response_message = next_stage_data.render(message_variables) if message_variables else message_template
             
             # Update call state
             call_state['conversation_stage'] = next_stage
-            call_state['previous_stages'] = call_state.get('previous_stages', []) + [current_stage]
+            call_state.push_stage(current_stage)
             call_state['matched_response'] = matched_response
             save_call_state(call_sid, call_state)
             
             logger.info(f"Moving to stage: {next_stage}, End call: {end_call}")
             
-            return {
+            result = {
                 'message': response_message,
                 'end_call': end_call,
                 'current_stage': next_stage,
                 'matched_response': matched_response
             }
             
+            if message_variables:
+                # Lets TTS reuse cached audio for the static parts of the message
+                result['message_template'] = message_template
+                result['message_variables'] = message_variables
+            
+            return result
+            
         else:
             # Legacy format: simple linear script
             # Simple fallback for older script format
@@ -418,7 +368,7 @@ def test_conversation():
     # Show final state
     final_state = get_call_state(call_sid)
     print(f"\n--- Final conversation state ---")
-    print(json.dumps(final_state, indent=2))
+    print(json.dumps(final_state.to_dict(), indent=2))
 
 
 def start_conversation(self, call_control_id, campaign_id):
@@ -518,7 +468,7 @@ def _speak_message(self, call_control_id, message):
         
         # Store the message in call state
         call_state = get_call_state(call_control_id)
-        call_state['messages'] = call_state.get('messages', []) + [{'role': 'assistant', 'content': message}]
+        call_state.setdefault('messages', []).append({'role': 'assistant', 'content': message})
         save_call_state(call_control_id, call_state)
         
     except Exception as e:
@@ -534,11 +484,11 @@ def _play_audio(self, call_control_id, audio_file):
     """
     try:
         # Call the SIP service to play the audio
-        import requests
+        from services.sip_client import get_sip_client
         
-        response = requests.post(
-            "http://localhost:5002/play-audio",
-            json={
+        response = get_sip_client().post(
+            "/play-audio",
+            {
                 "call_control_id": call_control_id,
                 "audio_file": audio_file
             }
@@ -564,7 +514,7 @@ def handle_speech_input(self, call_control_id, speech_text):
         campaign_id = call_state.get('campaign_id')
         
         # Store the user input
-        call_state['messages'] = call_state.get('messages', []) + [{'role': 'user', 'content': speech_text}]
+        call_state.setdefault('messages', []).append({'role': 'user', 'content': speech_text})
         save_call_state(call_control_id, call_state)
         
         # Process the response
@@ -589,13 +539,14 @@ def _end_call(self, call_control_id):
         call_control_id (str): The Telnyx call control ID
     """
     try:
-        import requests
+        from services.sip_client import get_sip_client
         
-        response = requests.post(
-            "http://localhost:5002/hangup",
-            json={
+        response = get_sip_client().post(
+            "/hangup",
+            {
                 "call_control_id": call_control_id
-            }
+            },
+            idempotent=True
         )
         
         if response.status_code != 200:
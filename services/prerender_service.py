@@ -0,0 +1,174 @@
+# services/prerender_service.py
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from config.settings import TTS_SPEAKER
+
+logger = logging.getLogger(__name__)
+
+class PromptPrerenderer:
+    """
+    Background warm-up of campaign prompts.
+
+    Every static message of a campaign is synthesized into the TTS audio cache
+    before a caller is waiting for it. Campaigns are processed one at a time on
+    a single worker thread, and per-campaign progress is kept so a campaign can
+    be held out of rotation until it is fully warm.
+    """
+
+    def __init__(self, speaker=TTS_SPEAKER):
+        self.speaker = speaker
+        self._progress = {}
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def warm_all(self):
+        """Queue every known campaign for pre-rendering"""
+        from services.campaign_service import get_campaign_manager
+        campaigns = get_campaign_manager().get_all_campaigns()
+
+        for campaign in campaigns:
+            self.warm_campaign(campaign['id'])
+
+        logger.info(f"Queued {len(campaigns)} campaigns for prompt pre-rendering")
+
+    def warm_campaign(self, campaign_id):
+        """
+        Queue a campaign for pre-rendering
+
+        Queuing a campaign that is already warm or warming restarts it, which
+        is what we want after its script changed.
+
+        Args:
+            campaign_id (str): Campaign identifier
+        """
+        with self._lock:
+            previous = self._progress.get(campaign_id, {})
+            self._progress[campaign_id] = {
+                'status': 'pending',
+                'total': 0,
+                'rendered': 0,
+                'failed': 0,
+                'generation': previous.get('generation', 0) + 1,
+                'queued_at': datetime.now().isoformat(),
+                'finished_at': None
+            }
+            if campaign_id not in self._queue:
+                self._queue.append(campaign_id)
+
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def get_progress(self, campaign_id=None):
+        """
+        Get pre-rendering progress
+
+        Args:
+            campaign_id (str, optional): Campaign to report on, all campaigns if omitted
+
+        Returns:
+            dict: Progress for the campaign (None if unknown) or a dict of all campaigns
+        """
+        with self._lock:
+            if campaign_id is not None:
+                progress = self._progress.get(campaign_id)
+                return dict(progress) if progress else None
+            return {cid: dict(progress) for cid, progress in self._progress.items()}
+
+    def is_ready(self, campaign_id):
+        """Check whether every prompt of a campaign has been rendered"""
+        progress = self.get_progress(campaign_id)
+        return bool(progress) and progress['status'] == 'ready'
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="prompt-prerender")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _next_campaign(self):
+        with self._lock:
+            if self._queue:
+                return self._queue.popleft()
+            self._wakeup.clear()
+            return None
+
+    def _run(self):
+        while True:
+            campaign_id = self._next_campaign()
+            if campaign_id is None:
+                self._wakeup.wait()
+                continue
+
+            # The run's generation, so a failure can't mark a newer run of the campaign failed
+            with self._lock:
+                generation = self._progress[campaign_id]['generation']
+
+            try:
+                self._render_campaign(campaign_id, generation)
+            except Exception as e:
+                logger.error(f"Error pre-rendering campaign {campaign_id}: {e}", exc_info=True)
+                self._update(campaign_id, generation, status='failed')
+
+    def _render_campaign(self, campaign_id, generation):
+        from services.tts_service import get_tts_service
+        from services.tts_engine import PRIORITY_PRERENDER
+        from templates.script_templates import get_campaign_messages, get_campaign_engine_mode
+
+        messages = get_campaign_messages(campaign_id)
+        engine_mode = get_campaign_engine_mode(campaign_id)
+        self._update(campaign_id, generation, status='warming', total=len(messages))
+        logger.info(f"Pre-rendering {len(messages)} prompts for campaign {campaign_id}")
+
+        tts_service = get_tts_service()
+        filenames = []
+        for message in messages:
+            with self._lock:
+                if self._progress[campaign_id]['generation'] != generation:
+                    # Script changed while we were rendering, the re-queued run takes over
+                    logger.info(f"Campaign {campaign_id} changed during pre-rendering, restarting")
+                    return
+
+            filename = tts_service.generate_audio(message, speaker=self.speaker, priority=PRIORITY_PRERENDER,
+                                                  engine_mode=engine_mode)
+            if filename:
+                # Pinned right away so a tight cache can't evict it before the run ends
+                tts_service.pin_campaign(campaign_id, [filename])
+                filenames.append(filename)
+                self._update(campaign_id, generation, increment='rendered')
+            else:
+                self._update(campaign_id, generation, increment='failed')
+
+        # Prompts of the previous script version are no longer needed
+        tts_service.pin_campaign(campaign_id, filenames, replace=True)
+
+        progress = self.get_progress(campaign_id)
+        status = 'ready' if progress['failed'] == 0 else 'failed'
+        self._update(campaign_id, generation, status=status, finished_at=datetime.now().isoformat())
+        logger.info(f"Pre-rendering for campaign {campaign_id} finished: {status}, "
+                    f"{progress['rendered']}/{progress['total']} prompts")
+
+    def _update(self, campaign_id, generation, increment=None, **fields):
+        """Update progress, ignoring stale updates from a superseded run"""
+        with self._lock:
+            progress = self._progress.get(campaign_id)
+            if not progress or progress['generation'] != generation:
+                return
+            if increment:
+                progress[increment] += 1
+            progress.update(fields)
+
+# Singleton instance
+_prerenderer = None
+
+def get_prompt_prerenderer():
+    """Get the prompt pre-renderer singleton"""
+    global _prerenderer
+    if _prerenderer is None:
+        _prerenderer = PromptPrerenderer()
+    return _prerenderer
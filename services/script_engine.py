@@ -0,0 +1,224 @@
+# services/script_engine.py
+import re
+import logging
+import threading
+from types import MappingProxyType
+from collections import OrderedDict
+
+from templates.script_templates import split_template
+from utils.phrase_matcher import PhraseMatcher
+from utils.intent_classifier import IntentClassifier
+from config.settings import INTENT_CLASSIFIER_ENABLED, INTENT_CLASSIFIER_THRESHOLD, INTENT_CLASSIFIER_DIMS
+
+logger = logging.getLogger(__name__)
+
+# Said when the stage has no fallback and nothing matched
+DEFAULT_FALLBACK_RESPONSES = ("I'm sorry, I didn't understand that. Could you please repeat?",)
+
+# Compiled scripts kept for reuse
+COMPILED_CACHE_SIZE = 64
+
+class CompiledResponse:
+    """A response type of a stage: where it leads and what it extracts"""
+    __slots__ = ('name', 'next_stage', 'extractors')
+
+    def __init__(self, name, next_stage, extractors):
+        self.name = name
+        self.next_stage = next_stage
+        # ((field, compiled regex), ...)
+        self.extractors = extractors
+
+    def extract(self, user_input):
+        """Get the fields the response's extraction patterns find in user_input"""
+        extracted = {}
+        for field, regex in self.extractors:
+            match = regex.search(user_input)
+            if match:
+                extracted[field] = match.group(1)
+        return extracted
+
+class CompiledStage:
+    """
+    One stage of a compiled conversation flow.
+
+    The patterns of all response types are indexed in one PhraseMatcher,
+    labeled with their response type in script order. One pass over the
+    input finds the highest priority response type with a pattern in it,
+    matched on word boundaries and ignoring negated patterns.
+
+    With a classifier, input no pattern matches is scored against the same
+    patterns by IntentClassifier before the stage falls back.
+    """
+    __slots__ = ('name', 'message', 'end_call', 'template_parts', 'placeholders',
+                 'responses', 'fallback', '_matcher', '_classifier')
+
+    def __init__(self, name, message, end_call, responses, fallback, classify=False):
+        self.name = name
+        self.message = message
+        self.end_call = end_call
+        self.template_parts = tuple(split_template(message or ''))
+        self.placeholders = frozenset(placeholder for _, placeholder in self.template_parts if placeholder)
+        # Response types with patterns, in priority order
+        self.responses = responses
+        self.fallback = fallback
+        self._matcher = self._compile_matcher(responses)
+        self._classifier = self._compile_classifier(responses) if classify else None
+
+    @staticmethod
+    def _compile_matcher(responses):
+        if not responses:
+            return None
+        return PhraseMatcher(responses)
+
+    @staticmethod
+    def _compile_classifier(responses):
+        if not responses or not IntentClassifier.is_available():
+            return None
+        return IntentClassifier(responses, dims=INTENT_CLASSIFIER_DIMS, threshold=INTENT_CLASSIFIER_THRESHOLD)
+
+    def match(self, user_input_lower):
+        """
+        Find the response type the input matches
+
+        Args:
+            user_input_lower (str): Lowercased caller input
+
+        Returns:
+            CompiledResponse: The matched response, or None
+        """
+        if self._matcher is None:
+            return None
+        return self._matcher.match(user_input_lower)
+
+    def classify(self, user_input_lower):
+        """
+        Find the response type closest to input no pattern matched
+
+        Args:
+            user_input_lower (str): Lowercased caller input
+
+        Returns:
+            tuple: (CompiledResponse or None, confidence)
+        """
+        if self._classifier is None:
+            return None, 0.0
+        return self._classifier.classify(user_input_lower)
+
+    def render(self, variables):
+        """Fill the message placeholders that have a value, like render_template"""
+        parts = []
+        for literal, name in self.template_parts:
+            parts.append(literal)
+            if name is not None:
+                parts.append(str(variables[name]) if name in variables else "{" + name + "}")
+        return "".join(parts)
+
+# Stage returned for names the flow doesn't define
+EMPTY_STAGE = CompiledStage(None, None, False, (), None)
+
+class CompiledScript:
+    """
+    An immutable, compiled conversation script.
+
+    Compiled once per script: every stage gets its matcher, extraction
+    regexes and pre-split message template, so processing a turn doesn't
+    walk or re-parse the script dict.
+    """
+    __slots__ = ('name', 'stages', 'fallback_responses')
+
+    def __init__(self, name, stages, fallback_responses):
+        self.name = name
+        self.stages = MappingProxyType(stages)
+        self.fallback_responses = fallback_responses
+
+    def stage(self, name):
+        """Get a stage by name, an empty stage if the flow doesn't define it"""
+        return self.stages.get(name, EMPTY_STAGE)
+
+def compile_script(script, classify=None):
+    """
+    Compile a script with a conversation_flow
+
+    Args:
+        script (dict): Script as returned by get_script
+        classify (bool, optional): Build fallback intent classifiers, defaults
+            to INTENT_CLASSIFIER_ENABLED
+
+    Returns:
+        CompiledScript: The compiled script
+    """
+    if classify is None:
+        classify = INTENT_CLASSIFIER_ENABLED
+
+    stages = {}
+    for stage_name, stage_data in script.get('conversation_flow', {}).items():
+        responses = []
+        fallback = None
+
+        for response_name, response_data in stage_data.get('responses', {}).items():
+            response = CompiledResponse(
+                response_name,
+                response_data.get('next_stage'),
+                tuple(_compile_extractors(stage_name, response_name, response_data.get('extract_info', {})))
+            )
+            if response_name == 'fallback':
+                fallback = response
+
+            # A match without a next stage never ended the search, leave it out
+            patterns = tuple(pattern.lower() for pattern in response_data.get('patterns', []))
+            if patterns and response.next_stage:
+                responses.append((response, patterns))
+
+        stages[stage_name] = CompiledStage(
+            stage_name,
+            stage_data.get('message'),
+            stage_data.get('end_call', False),
+            tuple(responses),
+            fallback,
+            classify
+        )
+
+    fallback_responses = tuple(script.get('fallback_responses') or DEFAULT_FALLBACK_RESPONSES)
+    return CompiledScript(script.get('name'), stages, fallback_responses)
+
+def _compile_extractors(stage_name, response_name, extract_info):
+    for field, pattern in extract_info.items():
+        try:
+            yield field, re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            logger.error(f"Invalid extraction pattern for {field} in {stage_name}/{response_name}: {e}")
+
+# Compiled scripts by id() of the source dict, the entry keeps the dict
+# alive so the id can't be reused while it is cached
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+def get_compiled_script(script):
+    """
+    Get the compiled form of a script, compiling it on first use
+
+    Scripts are looked up by identity, so a script dict must not be
+    modified after it was first compiled.
+
+    Args:
+        script (dict): Script with a conversation_flow
+
+    Returns:
+        CompiledScript: The compiled script
+    """
+    key = id(script)
+    with _compiled_lock:
+        entry = _compiled.get(key)
+        if entry is not None and entry[0] is script:
+            _compiled.move_to_end(key)
+            return entry[1]
+
+    compiled = compile_script(script)
+
+    with _compiled_lock:
+        _compiled[key] = (script, compiled)
+        _compiled.move_to_end(key)
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+
+    return compiled
@@ -0,0 +1,205 @@
+# services/sip_client.py
+import time
+import random
+import logging
+import threading
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+
+from config.settings import (SIP_SERVICE_URL, SIP_POOL_SIZE, SIP_CONNECT_TIMEOUT, SIP_READ_TIMEOUT, SIP_RETRIES,
+                             SIP_RETRY_BACKOFF)
+
+logger = logging.getLogger(__name__)
+
+# Latest round trips kept per command for the percentiles
+LATENCY_SAMPLES = 1024
+
+# Longest single retry delay in seconds
+MAX_RETRY_DELAY = 2.0
+
+# Responses worth retrying, the SIP service or a proxy in front of it was briefly unavailable
+RETRY_STATUSES = frozenset([502, 503, 504])
+
+class SipClient:
+    """
+    Shared HTTP client for commands to the SIP integration service.
+
+    All commands go through one requests Session, whose adapter keeps up to
+    pool_size keep-alive connections per host, so a speak or hangup reuses
+    an open connection instead of connecting for every command.
+
+    Failed commands are retried with full-jitter exponential backoff. A
+    command marked idempotent (hangup) is retried on any connection error,
+    timeout or 502/503/504; others (make-call, speak, play-audio) only when
+    the connection couldn't be opened, since the service may already have
+    acted on a request that reached it.
+
+    The round trip of every command, retries included, is recorded per
+    command path; stats() reports counts and latency percentiles.
+    """
+
+    def __init__(self, base_url=SIP_SERVICE_URL, pool_size=32, connect_timeout=2.0, read_timeout=10.0,
+                 retries=2, backoff=0.1):
+        """
+        Initialize the client
+
+        Args:
+            base_url (str): URL of the SIP integration service
+            pool_size (int): Keep-alive connections kept per host
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for a response
+            retries (int): Retries after the first attempt
+            backoff (float): Base of the exponential retry delay in seconds
+        """
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        self._session = self._create_session()
+        self._lock = threading.Lock()
+        # path -> recent round trips in seconds
+        self._latencies = {}
+        # path -> {'requests', 'errors', 'retries'}
+        self._counts = {}
+
+    def post(self, url, payload, idempotent=False, timeout=None):
+        """
+        POST a JSON command
+
+        Args:
+            url (str): Path on the SIP service, or a full URL
+            payload (dict): JSON body
+            idempotent (bool): Safe to send again if the service may have seen it
+            timeout (float or tuple, optional): Overrides the client's timeouts
+
+        Returns:
+            requests.Response: The response, whatever its status
+
+        Raises:
+            requests.RequestException: The command failed after all retries
+        """
+        url = urljoin(self.base_url, url)
+        path = urlsplit(url).path or '/'
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = self._session.post(url, json=payload, timeout=timeout or self.timeout)
+                except requests.RequestException as e:
+                    if not self._should_retry(attempt, idempotent, error=e):
+                        raise
+                    logger.warning(f"SIP command {path} failed ({e}), retrying")
+                else:
+                    if not (response.status_code in RETRY_STATUSES and self._should_retry(attempt, idempotent)):
+                        return response
+                    logger.warning(f"SIP command {path} returned {response.status_code}, retrying")
+                    response.close()
+
+                self._count(path, 'retries')
+                time.sleep(self._retry_delay(attempt))
+                attempt += 1
+        except requests.RequestException:
+            self._count(path, 'errors')
+            raise
+        finally:
+            self._record(path, time.perf_counter() - started)
+
+    def stats(self):
+        """Get per-command request, error and retry counts and round-trip percentiles in milliseconds"""
+        with self._lock:
+            latencies = {path: sorted(samples) for path, samples in self._latencies.items()}
+            counts = {path: dict(count) for path, count in self._counts.items()}
+
+        commands = {}
+        for path, samples in latencies.items():
+            commands[path] = dict(counts[path],
+                                  p50_ms=self._percentile(samples, 0.50),
+                                  p95_ms=self._percentile(samples, 0.95),
+                                  p99_ms=self._percentile(samples, 0.99),
+                                  max_ms=round(samples[-1] * 1000, 2))
+        return {
+            'base_url': self.base_url,
+            'pool_size': self.pool_size,
+            'commands': commands
+        }
+
+    def close(self):
+        """Close the pooled connections"""
+        self._session.close()
+
+    def after_fork(self):
+        """Give a forked child its own lock and connections, the parent's sockets aren't shared"""
+        self._lock = threading.Lock()
+        self._session = self._create_session()
+
+    def _create_session(self):
+        session = requests.Session()
+        # Retries are done in post(), so they can be jittered and counted
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _should_retry(self, attempt, idempotent, error=None):
+        if attempt >= self.retries:
+            return False
+        if idempotent:
+            return True
+        # Only a connection that was never opened is certain not to have delivered the command
+        return error is not None and self._never_connected(error)
+
+    @staticmethod
+    def _never_connected(error):
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        # requests wraps urllib3's MaxRetryError, whose reason tells a refused connection from a dropped one
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+    def _retry_delay(self, attempt):
+        # Full jitter spreads the retries of many calls hit by the same blip
+        return random.uniform(0, min(MAX_RETRY_DELAY, self.backoff * (2 ** attempt)))
+
+    def _count(self, path, name):
+        with self._lock:
+            counts = self._counts.setdefault(path, {'requests': 0, 'errors': 0, 'retries': 0})
+            counts[name] += 1
+
+    def _record(self, path, seconds):
+        with self._lock:
+            samples = self._latencies.get(path)
+            if samples is None:
+                samples = self._latencies[path] = deque(maxlen=LATENCY_SAMPLES)
+            samples.append(seconds)
+            counts = self._counts.setdefault(path, {'requests': 0, 'errors': 0, 'retries': 0})
+            counts['requests'] += 1
+
+    @staticmethod
+    def _percentile(samples, fraction):
+        return round(samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000, 2)
+
+_sip_client = None
+_sip_client_lock = threading.Lock()
+
+def get_sip_client():
+    """Get the SIP client singleton"""
+    global _sip_client
+    if _sip_client is None:
+        with _sip_client_lock:
+            if _sip_client is None:
+                _sip_client = SipClient(
+                    base_url=SIP_SERVICE_URL,
+                    pool_size=SIP_POOL_SIZE,
+                    connect_timeout=SIP_CONNECT_TIMEOUT,
+                    read_timeout=SIP_READ_TIMEOUT,
+                    retries=SIP_RETRIES,
+                    backoff=SIP_RETRY_BACKOFF
+                )
+    return _sip_client
@@ -0,0 +1,193 @@
+# services/speaker_registry.py
+import os
+import re
+import glob
+import uuid
+import hashlib
+import logging
+import threading
+import contextlib
+
+logger = logging.getLogger(__name__)
+
+# Reference audio formats accepted for custom voices
+REFERENCE_EXTENSIONS = ('.wav', '.mp3', '.flac')
+
+def _inference_mode():
+    """torch.inference_mode(), or no guard when torch isn't installed"""
+    from services.tts_engine import import_torch
+    try:
+        return import_torch().inference_mode()
+    except ImportError:
+        return contextlib.nullcontext()
+
+class SpeakerRegistry:
+    """
+    Conditioning latents for XTTS voices.
+
+    XTTS conditions every synthesis on a GPT conditioning latent and a speaker
+    embedding. Resolving them means a lookup in the model's speaker file for
+    built-in voices and running the conditioning encoder over reference audio
+    for custom ones. The registry does that once per voice, keeps the result in
+    memory and persists it to disk so restarts and other worker processes
+    reuse it.
+
+    Custom voices are reference audio in the voices directory, either
+    <voices_dir>/<name>.wav or several clips in <voices_dir>/<name>/.
+    """
+
+    def __init__(self, model, cache_dir, voices_dir=None, device="cpu"):
+        """
+        Initialize the registry
+
+        Args:
+            model: Loaded XTTS model (tts.synthesizer.tts_model)
+            cache_dir (str): Directory for persisted latents
+            voices_dir (str, optional): Directory with reference audio for custom voices
+            device (str): Device the model runs on
+        """
+        self.model = model
+        self.cache_dir = cache_dir
+        self.voices_dir = voices_dir
+        self.device = device
+
+        self._latents = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, speaker):
+        """
+        Get the conditioning latents for a voice
+
+        Args:
+            speaker (str): Built-in speaker name or custom voice name
+
+        Returns:
+            tuple: (gpt_cond_latent, speaker_embedding)
+
+        Raises:
+            KeyError: If the voice is neither built in nor has reference audio
+        """
+        latents = self._latents.get(speaker)
+        if latents is not None:
+            return latents
+
+        with self._lock:
+            latents = self._latents.get(speaker)
+            if latents is None:
+                latents = self._load_or_compute(speaker)
+                self._latents[speaker] = latents
+            return latents
+
+    def add_voice(self, name, reference_paths):
+        """
+        Register a custom voice from reference audio
+
+        Args:
+            name (str): Voice name to synthesize with
+            reference_paths (list): Reference audio files of the voice
+
+        Returns:
+            tuple: (gpt_cond_latent, speaker_embedding)
+        """
+        latents = self._compute(name, list(reference_paths))
+        self._save(self._cache_path(name, self._fingerprint(reference_paths)), latents)
+
+        with self._lock:
+            self._latents[name] = latents
+        return latents
+
+    def voices(self):
+        """Names of all voices the registry can resolve"""
+        names = set(self._builtin_speakers())
+        if self.voices_dir and os.path.isdir(self.voices_dir):
+            for entry in os.listdir(self.voices_dir):
+                name, ext = os.path.splitext(entry)
+                if ext.lower() in REFERENCE_EXTENSIONS or os.path.isdir(os.path.join(self.voices_dir, entry)):
+                    names.add(name)
+        return sorted(names)
+
+    def after_fork(self):
+        """Reset the lock in a worker forked from the loading process"""
+        self._lock = threading.Lock()
+
+    def _load_or_compute(self, speaker):
+        references = self._reference_paths(speaker)
+        cache_path = self._cache_path(speaker, self._fingerprint(references))
+
+        if os.path.exists(cache_path):
+            # Outside the try, a missing torch is an error rather than a reason to recompute
+            from services.tts_engine import import_torch
+            torch = import_torch()
+            try:
+                data = torch.load(cache_path, map_location=self.device)
+                logger.info(f"Loaded conditioning latents for voice '{speaker}' from {cache_path}")
+                return data['gpt_cond_latent'], data['speaker_embedding']
+            except Exception as e:
+                logger.warning(f"Could not load latents for voice '{speaker}', recomputing: {e}")
+
+        if references:
+            latents = self._compute(speaker, references)
+        else:
+            builtin = self._builtin_speakers().get(speaker)
+            if builtin is None:
+                raise KeyError(f"Unknown voice '{speaker}'")
+            latents = builtin['gpt_cond_latent'], builtin['speaker_embedding']
+
+        self._save(cache_path, latents)
+        return latents
+
+    def _compute(self, speaker, references):
+        logger.info(f"Computing conditioning latents for voice '{speaker}' from {len(references)} reference clips")
+        with _inference_mode():
+            return self.model.get_conditioning_latents(audio_path=references)
+
+    def _save(self, cache_path, latents):
+        gpt_cond_latent, speaker_embedding = latents
+        temp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+        from services.tts_engine import import_torch
+        torch = import_torch()
+        try:
+            torch.save({'gpt_cond_latent': gpt_cond_latent, 'speaker_embedding': speaker_embedding}, temp_path)
+            # Atomic rename, other worker processes may be loading the same voice
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Could not persist latents to {cache_path}: {e}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _builtin_speakers(self):
+        speaker_manager = getattr(self.model, 'speaker_manager', None)
+        return getattr(speaker_manager, 'speakers', None) or {}
+
+    def _reference_paths(self, speaker):
+        """Reference audio for a custom voice, empty for built-in voices"""
+        if not self.voices_dir:
+            return []
+
+        voice_dir = os.path.join(self.voices_dir, speaker)
+        if os.path.isdir(voice_dir):
+            return sorted(path for path in glob.glob(os.path.join(voice_dir, '*'))
+                          if path.lower().endswith(REFERENCE_EXTENSIONS))
+
+        for ext in REFERENCE_EXTENSIONS:
+            path = os.path.join(self.voices_dir, speaker + ext)
+            if os.path.exists(path):
+                return [path]
+
+        return []
+
+    @staticmethod
+    def _fingerprint(references):
+        """Changes whenever the reference audio of a voice changes"""
+        digest = hashlib.sha256()
+        for path in references:
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _cache_path(self, speaker, fingerprint):
+        safe_name = re.sub(r'[^\w.-]', '_', speaker)
+        return os.path.join(self.cache_dir, f"{safe_name}.{fingerprint}.pth")
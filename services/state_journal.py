@@ -0,0 +1,426 @@
+# services/state_journal.py
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where the single writer isn't enforced
+    fcntl = None
+
+from config.settings import STATE_JOURNAL_RETENTION_HOURS
+from services.call_state import CallState, fingerprint, diff_state
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'journal-'
+SEGMENT_SUFFIX = '.log'
+CHECKPOINT_FILENAME = 'journal-index.json'
+LOCK_FILENAME = 'journal.lock'
+
+# Deltas after a snapshot before the next write of the call is a snapshot again
+MAX_DELTAS = 32
+
+# Sealed segments with less live data than this fraction are compacted
+COMPACT_RATIO = 0.5
+
+# Statuses of a call that is over
+ENDED_STATUSES = frozenset(['ended', 'completed', 'failed'])
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'))
+
+def apply_record(state, record):
+    """
+    Apply a journal record to a state
+
+    Args:
+        state (dict): State rebuilt so far, None before the first snapshot
+        record (dict): Snapshot or delta record
+
+    Returns:
+        dict: The updated state
+    """
+    if record.get('t') == 'snap':
+        return record['s']
+
+    state = state if state is not None else {}
+    state.update(record.get('set', {}))
+    for key in record.get('unset', ()):
+        state.pop(key, None)
+    for key, items in record.get('append', {}).items():
+        current = state.get(key)
+        if isinstance(current, list):
+            current.extend(items)
+        else:
+            state[key] = list(items)
+    return state
+
+def _ended_at(fields):
+    """Get when a call ended from its state or a delta's set fields, None if it hasn't"""
+    if fields.get('status') not in ENDED_STATUSES and 'end_time' not in fields:
+        return None
+    end_time = fields.get('end_time')
+    if isinstance(end_time, (int, float)):
+        return float(end_time)
+    if isinstance(end_time, str):
+        try:
+            return datetime.fromisoformat(end_time).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+class JournalStateBackend:
+    """
+    Append-only journal of call states.
+
+    Writes are appended as JSON lines to the active segment file, one
+    sequential write and fsync per batch. The first write of a call is a
+    full snapshot; later ones are deltas holding only the keys that
+    changed, with lists that grew (previous stages, messages) written as
+    their new items. Changes are found by comparing the state with a
+    fingerprint of the last write, a digest and length per key, so the
+    journal keeps no copy of the states. After MAX_DELTAS deltas, or when
+    there is no fingerprint (e.g. after a restart or a failed write), the
+    call gets a new snapshot.
+
+    An in-memory index maps each call to the offsets of its latest snapshot
+    and the deltas after it, so a read replays just those records. The
+    index is checkpointed when a segment fills up and on close; opening the
+    journal loads the checkpoint and replays the records written after it,
+    dropping a torn last line left by a crash.
+
+    Full segments are compacted: when less than COMPACT_RATIO of a sealed
+    segment is still referenced, its calls are rewritten as snapshots into
+    the active segment and the old file is removed. Compaction also drops
+    calls that ended (status ended, completed or failed, or an end_time)
+    more than the retention period ago, so the index and checkpoints only
+    hold recent calls; reads of a dropped call return None.
+
+    The journal has a single writer: opening it takes an exclusive lock on
+    the directory, and a second process opening the same directory fails.
+    Use it with one server process.
+    """
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, retention=STATE_JOURNAL_RETENTION_HOURS * 3600):
+        """
+        Open the journal, recovering the index
+
+        Args:
+            directory (str): Directory holding the segments
+            segment_bytes (int): Size at which the active segment is sealed
+            retention (float): Seconds an ended call is kept before compaction drops it
+
+        Raises:
+            RuntimeError: Another process has the journal open
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_directory()
+
+        self._lock = threading.RLock()
+        # call_sid -> [(segment, offset, length), ...], latest snapshot first
+        self._index = {}
+        # segment -> bytes referenced by the index
+        self._live = {}
+        # call_sid -> fingerprint of the last state written in this process
+        self._baselines = {}
+        # call_sid -> epoch seconds the call ended, for calls that did
+        self._ended = {}
+
+        self._recover()
+
+    def read(self, call_sid):
+        """
+        Rebuild a call's state from its snapshot and deltas
+
+        Returns:
+            dict: The state, or None if the journal has no record of the call
+        """
+        with self._lock:
+            locations = list(self._index.get(call_sid, ()))
+            if not locations:
+                return None
+            self._active_file.flush()
+
+            state = None
+            for segment, offset, length in locations:
+                with open(self._segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    state = apply_record(state, json.loads(f.read(length)))
+            return state
+
+    def write_batch(self, states):
+        """
+        Append the states of several calls
+
+        Args:
+            states (dict): Call SID -> state
+        """
+        with self._lock:
+            records, baselines = [], {}
+            for call_sid, state in states.items():
+                record, baselines[call_sid] = self._record_for(call_sid, state)
+                records.append((call_sid, record))
+            try:
+                self._append(records)
+            except Exception:
+                # What was written is unknown, the next write of these calls is a snapshot
+                for call_sid in baselines:
+                    self._baselines.pop(call_sid, None)
+                raise
+            self._baselines.update(baselines)
+
+            if self._active_file.tell() >= self.segment_bytes:
+                self._rotate()
+
+    def stats(self):
+        """Get segment and index sizes"""
+        with self._lock:
+            return {
+                'calls': len(self._index),
+                'ended_calls': len(self._ended),
+                'segments': len(self._live),
+                'active_segment': self._active,
+                'active_bytes': self._active_file.tell()
+            }
+
+    def close(self):
+        """Checkpoint the index and close the active segment"""
+        with self._lock:
+            self._active_file.flush()
+            self._write_checkpoint()
+            self._active_file.close()
+            if self._lock_file is not None:
+                # Closing the file releases the lock
+                self._lock_file.close()
+                self._lock_file = None
+
+    def after_fork(self):
+        """Give a forked child its own lock and handle on the active segment"""
+        self._lock = threading.RLock()
+        self._active_file = open(self._segment_path(self._active), 'ab')
+
+    def compact(self):
+        """
+        Drop calls that ended before the retention period, then rewrite the
+        live calls of mostly dead sealed segments and remove them
+
+        Returns:
+            int: Number of segments removed
+        """
+        with self._lock:
+            expired = self._expire()
+            removed = 0
+            for segment in sorted(self._live):
+                if segment == self._active:
+                    continue
+
+                size = os.path.getsize(self._segment_path(segment))
+                if size and self._live[segment] / size >= COMPACT_RATIO:
+                    continue
+
+                # Calls with records in the segment get a fresh snapshot
+                calls = [call_sid for call_sid, locations in self._index.items()
+                         if any(location[0] == segment for location in locations)]
+                self._append([(call_sid, {'t': 'snap', 's': self.read(call_sid)}) for call_sid in calls])
+
+                os.remove(self._segment_path(segment))
+                del self._live[segment]
+                removed += 1
+
+            if removed or expired:
+                self._write_checkpoint()
+                logger.info(f"Compacted {removed} journal segments, dropped {expired} ended calls")
+            return removed
+
+    def _expire(self):
+        """Remove calls that ended before the retention period from the index, returning how many"""
+        cutoff = time.time() - self.retention
+        expired = [call_sid for call_sid, ended_at in self._ended.items() if ended_at <= cutoff]
+        for call_sid in expired:
+            for segment, _, length in self._index.pop(call_sid, ()):
+                if segment in self._live:
+                    self._live[segment] -= length
+            self._baselines.pop(call_sid, None)
+            del self._ended[call_sid]
+        return len(expired)
+
+    def _track_end(self, call_sid, record):
+        """Note whether a record leaves its call ended"""
+        fields = record.get('s' if record['t'] == 'snap' else 'set') or {}
+        if record['t'] == 'snap' or 'status' in fields or 'end_time' in fields:
+            ended_at = _ended_at(fields)
+            if ended_at is None:
+                self._ended.pop(call_sid, None)
+            else:
+                self._ended[call_sid] = ended_at
+
+    def _record_for(self, call_sid, state):
+        """Build the delta of a state against what was last written, or a snapshot, and its fingerprint"""
+        data = CallState.from_dict(state).to_dict()
+        baseline = self._baselines.get(call_sid)
+        if baseline is not None and 0 < len(self._index.get(call_sid, ())) <= MAX_DELTAS:
+            delta, baseline = diff_state(data, baseline)
+            delta['t'] = 'delta'
+            return delta, baseline
+        return {'t': 'snap', 's': data}, fingerprint(data)
+
+    def _append(self, records):
+        if not records:
+            return
+
+        offset = self._active_file.tell()
+        lines = []
+        for call_sid, record in records:
+            record['c'] = call_sid
+            line = (_encode(record) + '\n').encode('utf-8')
+            lines.append(line)
+            self._index_record(call_sid, record['t'], (self._active, offset, len(line)))
+            self._track_end(call_sid, record)
+            offset += len(line)
+
+        # One sequential write and sync for the whole batch
+        self._active_file.write(b''.join(lines))
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+
+    def _index_record(self, call_sid, record_type, location):
+        locations = self._index.get(call_sid)
+        if record_type == 'snap' and locations:
+            # Everything before the new snapshot is dead
+            for segment, _, length in locations:
+                if segment in self._live:
+                    self._live[segment] -= length
+            locations = None
+        if locations is None:
+            locations = self._index[call_sid] = []
+        locations.append(location)
+        self._live[location[0]] = self._live.get(location[0], 0) + location[2]
+
+    def _rotate(self):
+        """Seal the active segment, start the next one and compact"""
+        self._active_file.close()
+        self._open_segment(self._active + 1)
+        self._write_checkpoint()
+        self.compact()
+
+    def _acquire_directory(self):
+        """Lock the journal directory for this process, the lock is held until close"""
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.directory, LOCK_FILENAME), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"State journal in {self.directory} is already open in another process; "
+                               f"the journal backend supports a single server process")
+        return lock_file
+
+    def _open_segment(self, segment):
+        self._active = segment
+        self._active_file = open(self._segment_path(segment), 'ab')
+        self._live.setdefault(segment, 0)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}")
+
+    def _segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def _write_checkpoint(self):
+        checkpoint = {
+            'segment': self._active,
+            'offset': self._active_file.tell(),
+            'calls': self._index,
+            'ended': self._ended
+        }
+        path = os.path.join(self.directory, CHECKPOINT_FILENAME)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(_encode(checkpoint))
+        os.replace(temp_path, path)
+
+    def _load_checkpoint(self, segments):
+        """Load the index checkpoint, None if it is missing or refers to removed segments"""
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT_FILENAME), 'r') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable journal checkpoint: {e}")
+            return None
+
+        index = {call_sid: [tuple(location) for location in locations]
+                 for call_sid, locations in checkpoint['calls'].items()}
+        if any(location[0] not in segments for locations in index.values() for location in locations):
+            logger.warning("Journal checkpoint refers to missing segments, replaying all segments")
+            return None
+        ended = {call_sid: ended_at for call_sid, ended_at in checkpoint.get('ended', {}).items() if call_sid in index}
+        return checkpoint['segment'], checkpoint['offset'], index, ended
+
+    def _recover(self):
+        """Rebuild the index from the checkpoint plus the records written after it"""
+        segments = self._segments()
+        start_segment, start_offset = (segments[0] if segments else 1), 0
+
+        checkpoint = self._load_checkpoint(set(segments))
+        if checkpoint is not None:
+            start_segment, start_offset, self._index, self._ended = checkpoint
+            for locations in self._index.values():
+                for segment, _, length in locations:
+                    self._live[segment] = self._live.get(segment, 0) + length
+
+        replayed = 0
+        for segment in segments:
+            self._live.setdefault(segment, 0)
+            if segment < start_segment:
+                continue
+            replayed += self._replay(segment, start_offset if segment == start_segment else 0,
+                                     last=segment == segments[-1])
+
+        self._open_segment(segments[-1] if segments else start_segment)
+        logger.info(f"Opened state journal in {self.directory}: {len(self._index)} calls, "
+                    f"{len(segments)} segments, {replayed} records replayed")
+
+    def _replay(self, segment, offset, last):
+        """Index the records of a segment from offset on, truncating a torn tail"""
+        path = self._segment_path(segment)
+        replayed = 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                    call_sid, record_type = record['c'], record['t']
+                except (ValueError, KeyError) as e:
+                    if last:
+                        logger.warning(f"Truncating journal segment {segment} at offset {offset}: {e}")
+                        f.close()
+                        os.truncate(path, offset)
+                        break
+                    logger.warning(f"Skipping damaged record in journal segment {segment} at offset {offset}: {e}")
+                    offset += len(line)
+                    continue
+
+                self._index_record(call_sid, record_type, (segment, offset, len(line)))
+                self._track_end(call_sid, record)
+                offset += len(line)
+                replayed += 1
+        return replayed
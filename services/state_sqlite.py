@@ -0,0 +1,159 @@
+# services/state_sqlite.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from utils.serialization import get_codec, decode
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILENAME = 'call_states.db'
+
+# Statements are constant strings so sqlite3 prepares each once per connection
+UPSERT_SQL = (
+    "INSERT INTO call_states (call_sid, campaign_id, status, conversation_stage, updated_at, state) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(call_sid) DO UPDATE SET campaign_id = excluded.campaign_id, status = excluded.status, "
+    "conversation_stage = excluded.conversation_stage, updated_at = excluded.updated_at, state = excluded.state"
+)
+SELECT_SQL = "SELECT state FROM call_states WHERE call_sid = ?"
+
+# Filter columns of query(), all indexed
+QUERY_COLUMNS = ('campaign_id', 'status', 'conversation_stage')
+
+class SqliteStateBackend:
+    """
+    Call states in a SQLite database in WAL mode.
+
+    The full state is stored encoded (JSON unless another codec is given,
+    rows in other formats still decode) next to the columns dashboards and
+    reports filter on, campaign_id, status and conversation_stage, which
+    are indexed. A flush batch is one transaction, so persisting many calls
+    costs one commit. WAL lets every server process read while one writes.
+    """
+    # query() and count_by_stage() are available
+    SUPPORTS_QUERIES = True
+
+    def __init__(self, directory, codec=None):
+        """
+        Open the database
+
+        Args:
+            directory (str): Directory holding the database file
+            codec: Codec from utils.serialization encoding the states
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.codec = codec if codec is not None else get_codec('json')
+        self.path = os.path.join(directory, DATABASE_FILENAME)
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    def read(self, call_sid):
+        """
+        Read a call's state
+
+        Returns:
+            dict: The stored state, or None if there is none
+        """
+        with self._lock:
+            row = self._db.execute(SELECT_SQL, (call_sid,)).fetchone()
+        return decode(row[0]) if row else None
+
+    def write_batch(self, states):
+        """
+        Write the states of several calls in one transaction
+
+        Args:
+            states (dict): Call SID -> state
+        """
+        now = time.time()
+        rows = [
+            (call_sid, state.get('campaign_id'), state.get('status'), state.get('conversation_stage'), now,
+             self.codec.encode(state))
+            for call_sid, state in states.items()
+        ]
+        with self._lock:
+            with self._db:
+                self._db.executemany(UPSERT_SQL, rows)
+
+    def query(self, limit=100, **filters):
+        """
+        Find call states by indexed columns
+
+        Args:
+            limit (int): Most states returned, most recently updated first
+            **filters: Values of campaign_id, status and conversation_stage
+
+        Returns:
+            list: (call_sid, state) pairs
+        """
+        where, params = self._where(filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT call_sid, state FROM call_states{where} ORDER BY updated_at DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [(call_sid, decode(state)) for call_sid, state in rows]
+
+    def count_by_stage(self, **filters):
+        """
+        Count call states per conversation stage
+
+        Args:
+            **filters: Values of campaign_id, status and conversation_stage
+
+        Returns:
+            dict: Stage -> number of calls
+        """
+        where, params = self._where(filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT conversation_stage, COUNT(*) FROM call_states{where} GROUP BY conversation_stage", params
+            ).fetchall()
+        return {stage: count for stage, count in rows}
+
+    def close(self):
+        """Close the connection"""
+        with self._lock:
+            self._db.close()
+
+    def after_fork(self):
+        """Reconnect in a worker forked from the process that opened the database"""
+        self._lock = threading.Lock()
+        self._db = self._connect()
+
+    @staticmethod
+    def _where(filters):
+        unknown = set(filters) - set(QUERY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Can't filter call states by {', '.join(sorted(unknown))}")
+
+        conditions, params = [], []
+        for column in QUERY_COLUMNS:
+            if filters.get(column) is not None:
+                conditions.append(f"{column} = ?")
+                params.append(filters[column])
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def _connect(self):
+        # One connection per process, shared by its threads under self._lock
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=64)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS call_states (
+                call_sid TEXT PRIMARY KEY,
+                campaign_id TEXT,
+                status TEXT,
+                conversation_stage TEXT,
+                updated_at REAL NOT NULL,
+                state TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS call_states_campaign ON call_states (campaign_id, conversation_stage);
+            CREATE INDEX IF NOT EXISTS call_states_status ON call_states (status);
+            CREATE INDEX IF NOT EXISTS call_states_stage ON call_states (conversation_stage);
+            CREATE INDEX IF NOT EXISTS call_states_updated ON call_states (updated_at);
+        """)
+        return db
@@ -0,0 +1,348 @@
+# services/state_store.py
+import os
+import uuid
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from services.call_state import CallState
+from services.call_registry import CallRegistry, get_call_registry
+from utils.serialization import get_codec, decode
+from config.settings import (STATE_DIR, STATE_FLUSH_INTERVAL, STATE_BACKEND, STATE_BACKENDS, STATE_JOURNAL_SEGMENT_MB,
+                             STATE_FORMAT)
+
+logger = logging.getLogger(__name__)
+
+class UnsupportedQueryError(Exception):
+    """The state backend can't query call states, only the sqlite one can"""
+
+class JsonFileStateBackend:
+    """
+    Stores each call's state as one file in a directory.
+
+    Files are <call_sid>.json, or <call_sid>.msgpack with the msgpack
+    codec. Reads detect the format, so files written with another codec,
+    such as existing JSON files after switching to msgpack, still load.
+    """
+
+    def __init__(self, directory, codec=None):
+        """
+        Args:
+            directory (str): Directory of the state files
+            codec: Codec from utils.serialization, compact JSON by default
+        """
+        self.directory = directory
+        self.codec = codec if codec is not None else get_codec('json')
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, call_sid, extension=None):
+        """Get the file path of a call's state"""
+        return os.path.join(self.directory, f"{call_sid}{extension or self.codec.extension}")
+
+    def read(self, call_sid):
+        """
+        Read a call's state
+
+        Returns:
+            dict: The stored state, or None if there is none
+        """
+        # The current codec's file first, then one left by another codec
+        for extension in dict.fromkeys([self.codec.extension, '.json', '.msgpack']):
+            try:
+                with open(self.path_for(call_sid, extension), 'rb') as f:
+                    return decode(f.read())
+            except FileNotFoundError:
+                continue
+        return None
+
+    def write_batch(self, states):
+        """
+        Write the states of several calls
+
+        Args:
+            states (dict): Call SID -> state
+        """
+        for call_sid, state in states.items():
+            data = self.codec.encode(state)
+            path = self.path_for(call_sid)
+
+            # Atomic rename so a crash mid-write never leaves a truncated file
+            temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+    def close(self):
+        """Nothing to release, files are closed after every write"""
+
+    def after_fork(self):
+        """Nothing to reset, every write opens its own file"""
+
+class StateStore:
+    """
+    Write-behind store for per-call conversation state.
+
+    Saves update memory and mark the call dirty; the request thread never
+    touches the disk. A background thread persists dirty calls in one batch
+    per flush interval, so several saves of a call within an interval cost
+    one write of its latest state. Hangup flushes the call synchronously
+    (finish_call), and everything still dirty is flushed at exit.
+
+    States are cached on the call's CallRegistry record, so they expire
+    with the call. A save queues a copy of the state for the flush, so the
+    write sees the state as it was saved even while request threads go on
+    changing the cached one. Dirty states are held until written, whether
+    or not the record is still there.
+    """
+
+    def __init__(self, backend, flush_interval=1.0, registry=None):
+        """
+        Initialize the store
+
+        Args:
+            backend: Persists states, see create_backend
+            flush_interval (float): Seconds between background flushes
+            registry (CallRegistry, optional): Registry caching the states,
+                a private one by default
+        """
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.registry = registry if registry is not None else CallRegistry()
+
+        # call_sid -> state saved since the last flush
+        self._dirty = {}
+        self._lock = threading.Lock()
+        # Serializes flushes, so a call's writes reach the backend in order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+        self.flushes = 0
+        self.writes = 0
+
+    def get_call_state(self, call_sid):
+        """
+        Get a call's state, from memory or the backend
+
+        Returns:
+            CallState: The state, or None if the call has none
+        """
+        record = self.registry.get(call_sid)
+        if record is not None and record.state is not None:
+            return record.state
+
+        with self._lock:
+            state = self._dirty.get(call_sid)
+            if state is not None:
+                # The queued copy must stay as saved
+                state = state.copy()
+        if state is None:
+            state = self.backend.read(call_sid)
+            if state is not None:
+                state = CallState.from_dict(state)
+        if state is not None:
+            record = self.registry.update(call_sid)
+            if record.state is None:
+                record.state = state
+            # Another thread may have saved a newer state meanwhile
+            state = record.state
+        return state
+
+    def save_call_state(self, call_sid, state):
+        """
+        Save a call's state, persisted by the next flush
+
+        Args:
+            call_sid (str): Call SID
+            state (dict): State to save, a dict is converted to a CallState
+
+        Returns:
+            CallState: The saved state
+        """
+        state = CallState.from_dict(state)
+        state['last_updated'] = datetime.now().isoformat()
+        self.registry.update(call_sid, state=state)
+        # Copied before the lock, the state is the caller's to change again once this returns
+        saved = state.copy()
+        with self._lock:
+            self._dirty[call_sid] = saved
+        self._ensure_thread()
+        return state
+
+    def finish_call(self, call_sid):
+        """
+        Persist a call's state now and drop it from memory, for hangup
+
+        Returns:
+            bool: True if the state was written or had nothing to write
+        """
+        written = self.flush([call_sid])
+        record = self.registry.end(call_sid)
+        if record is not None and written:
+            record.state = None
+        return written
+
+    def flush(self, call_sids=None):
+        """
+        Persist dirty states
+
+        Args:
+            call_sids (iterable, optional): Only flush these calls
+
+        Returns:
+            bool: True if every selected state was written
+        """
+        with self._flush_lock:
+            with self._lock:
+                if call_sids is None:
+                    batch = self._dirty
+                    self._dirty = {}
+                else:
+                    batch = {call_sid: self._dirty.pop(call_sid) for call_sid in call_sids if call_sid in self._dirty}
+
+            if not batch:
+                return True
+
+            try:
+                self.backend.write_batch(batch)
+            except Exception as e:
+                # Keep them dirty so the next flush retries
+                logger.error(f"Failed to persist state of {len(batch)} calls: {e}")
+                with self._lock:
+                    # Saves made meanwhile are newer
+                    for call_sid, state in batch.items():
+                        self._dirty.setdefault(call_sid, state)
+                return False
+
+        self.flushes += 1
+        self.writes += len(batch)
+        logger.debug(f"Persisted state of {len(batch)} calls")
+        return True
+
+    def query(self, limit=100, **filters):
+        """
+        Find persisted call states by campaign_id, status and conversation_stage
+
+        Pending saves are flushed first so the result includes them.
+
+        Returns:
+            list: (call_sid, state) pairs, most recently updated first
+
+        Raises:
+            UnsupportedQueryError: The backend can't be queried
+            ValueError: limit isn't positive, SQLite would read a negative one as no limit
+        """
+        self._check_queries()
+        if limit < 1:
+            raise ValueError(f"Query limit must be positive, got {limit}")
+        self.flush()
+        return self.backend.query(limit=limit, **filters)
+
+    def count_by_stage(self, **filters):
+        """
+        Count persisted call states per conversation stage
+
+        Returns:
+            dict: Stage -> number of calls
+
+        Raises:
+            UnsupportedQueryError: The backend can't be queried
+        """
+        self._check_queries()
+        self.flush()
+        return self.backend.count_by_stage(**filters)
+
+    def supports_queries(self):
+        """Check whether the backend can query call states"""
+        return getattr(self.backend, 'SUPPORTS_QUERIES', False)
+
+    def stats(self):
+        """Get counts of cached and dirty states and of writes so far"""
+        cached = sum(1 for record in self.registry.records() if record.state is not None)
+        with self._lock:
+            dirty = len(self._dirty)
+        return {
+            'backend': type(self.backend).__name__,
+            'cached': cached,
+            'dirty': dirty,
+            'flushes': self.flushes,
+            'writes': self.writes
+        }
+
+    def close(self):
+        """Flush everything and stop the background thread"""
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        self.backend.close()
+
+    def after_fork(self):
+        """Reset locks and the flush thread in a forked child"""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.backend.after_fork()
+
+    def _check_queries(self):
+        if not self.supports_queries():
+            raise UnsupportedQueryError(f"{type(self.backend).__name__} doesn't support queries")
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._loop, name="state-flusher")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"State flush failed: {e}")
+
+def create_backend(name=STATE_BACKEND, directory=STATE_DIR, state_format=STATE_FORMAT):
+    """
+    Create a state backend
+
+    Args:
+        name (str): One of STATE_BACKENDS
+        directory (str): Directory the backend stores its files in
+        state_format (str): Encoding of the json and sqlite backends, one of
+            utils.serialization.FORMATS; the journal is always JSON lines
+
+    Returns:
+        The backend
+    """
+    if name not in STATE_BACKENDS:
+        logger.warning(f"Unknown state backend '{name}', using json")
+        name = 'json'
+
+    if name == 'journal':
+        from services.state_journal import JournalStateBackend
+        return JournalStateBackend(directory, segment_bytes=STATE_JOURNAL_SEGMENT_MB * 1024 * 1024)
+    if name == 'sqlite':
+        from services.state_sqlite import SqliteStateBackend
+        return SqliteStateBackend(directory, codec=get_codec(state_format))
+    return JsonFileStateBackend(directory, codec=get_codec(state_format))
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+def get_state_store():
+    """Get the state store singleton, flushed at interpreter exit"""
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                store = StateStore(create_backend(), flush_interval=STATE_FLUSH_INTERVAL,
+                                   registry=get_call_registry())
+                atexit.register(store.close)
+                _state_store = store
+    return _state_store
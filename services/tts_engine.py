@@ -0,0 +1,776 @@
+# lead_finder/services/tts_engine.py
+import os
+import copy
+import time
+import queue
+import tempfile
+import itertools
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future
+
+from services.audio_utils import np, read_wav, write_wav
+from utils.micro_batcher import MicroBatcher
+from config.settings import (
+    TTS_LANGUAGE, TTS_VOICES_DIR, TTS_SPEAKER_CACHE_DIR, TTS_ONNX_DIR,
+    TTS_SPEAKER, TTS_ENGINE_MODE, TTS_ENGINE_MODES, TTS_REPORT_RTF,
+    TTS_BATCH_WINDOW_MS, TTS_BATCH_MAX_SIZE, TTS_QUEUE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# torch and TTS take seconds and hundreds of MB to import, so they are only
+# imported by the process that actually loads a model
+_torch = None
+_torch_lock = threading.Lock()
+
+def import_torch():
+    """Import torch and register the safe globals XTTS checkpoints need, once"""
+    global _torch
+    if _torch is None:
+        with _torch_lock:
+            if _torch is None:
+                import torch
+                _register_safe_globals(torch)
+                _torch = torch
+    return _torch
+
+def _register_safe_globals(torch):
+    # --- BEGIN PYTORCH SAFE GLOBALS FIX ---
+    try:
+        # Import all specific config classes that XTTS might store in its checkpoint
+        from TTS.tts.configs.xtts_config import XttsConfig
+        from TTS.tts.models.xtts import XttsAudioConfig # You had this
+        from TTS.config.shared_configs import BaseDatasetConfig # <<< ADD THIS ONE AS PER ERROR
+        from TTS.tts.utils.languages import LanguageManager # Often needed by multilingual models
+
+        # Add all potentially problematic classes to safe globals
+        # It's better to be specific if you know them, but a broader list from TTS configs can help
+        torch.serialization.add_safe_globals([
+            XttsConfig,
+            XttsAudioConfig,
+            BaseDatasetConfig,  # <<< ESSENTIAL
+            LanguageManager,    # <<< GOOD TO HAVE
+            # You might need to add more if other "Unsupported global" errors appear
+            # for other TTS.something classes.
+        ])
+        logger.info("Successfully added necessary TTS configs/classes to PyTorch safe globals.")
+    except ImportError as e:
+        logger.error(f"Could not import TTS classes for PyTorch safe globals fix: {e}. XTTS might fail to load.")
+    except Exception as e:
+        logger.error(f"Error during PyTorch safe globals setup: {e}")
+    # --- END PYTORCH SAFE GLOBALS FIX ---
+
+# Lower numbers are served first
+PRIORITY_LIVE = 0
+PRIORITY_PRERENDER = 10
+
+class TTSOverloadedError(RuntimeError):
+    """The worker pool's queue stayed full, the request was not queued"""
+
+class TTSUnavailableError(RuntimeError):
+    """No TTS worker is running to take the request"""
+
+# Inference modes, from most accurate to fastest on CPU
+ENGINE_MODES = TTS_ENGINE_MODES
+
+# Sentence synthesized at startup to report the real-time factor
+BENCHMARK_TEXT = "Hello, thanks for taking our call. Do you have a minute to talk about your home?"
+
+# Zero samples the synthesizer puts after every sentence, matched by batched synthesis
+SENTENCE_SILENCE_SAMPLES = 10000
+
+def load_tts_model(device):
+    """
+    Load the TTS model, preferring XTTS v2 and falling back to VITS
+
+    Args:
+        device (str): Torch device to load the model on
+
+    Returns:
+        tuple: (TTS instance, model type)
+    """
+    import_torch()
+    from TTS.api import TTS
+    
+    try:
+        # First, try to load the XTTS v2 model
+        logger.info(f"Attempting to load XTTS v2 model on {device}")
+        tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
+        logger.info(f"XTTS v2 model loaded successfully on {device}")
+        return tts, "xtts_v2"
+    except Exception as e:
+        logger.warning(f"Could not load XTTS v2 model: {e}, trying fallback model")
+        try:
+            # Fall back to VITS model
+            logger.info(f"Attempting to load VITS model on {device}")
+            tts = TTS("tts_models/en/vctk/vits").to(device)
+            logger.info(f"VITS model loaded successfully on {device}")
+            return tts, "vits"
+        except Exception as e2:
+            logger.error(f"Error loading fallback TTS model: {e2}")
+            raise
+
+def get_sample_rate(tts):
+    """Get the output sample rate of a loaded TTS model"""
+    return getattr(getattr(tts, 'synthesizer', None), 'output_sample_rate', None)
+
+def create_speaker_registry(tts, model_type, device):
+    """Create the conditioning latent registry for XTTS, None for other models"""
+    if model_type != "xtts_v2":
+        return None
+    from services.speaker_registry import SpeakerRegistry
+    return SpeakerRegistry(tts.synthesizer.tts_model, TTS_SPEAKER_CACHE_DIR, voices_dir=TTS_VOICES_DIR, device=device)
+
+def synthesize_to_file(tts, model_type, text, speaker, file_path, speakers=None):
+    """
+    Run the TTS model and write the result to file_path
+    
+    Args:
+        tts: Loaded TTS instance
+        model_type (str): Model type from load_tts_model
+        text (str): Cleaned text to synthesize
+        speaker (str): Speaker name
+        file_path (str): Where to write the audio
+        speakers (SpeakerRegistry, optional): Cached XTTS conditioning latents
+    """
+    if speakers is not None:
+        torch = import_torch()
+        try:
+            gpt_cond_latent, speaker_embedding = speakers.get(speaker)
+        except KeyError as e:
+            logger.warning(f"{e}, letting the model resolve the speaker")
+        else:
+            # Condition on the cached latents instead of resolving the voice per call
+            with torch.inference_mode():
+                output = tts.synthesizer.tts_model.inference(text, TTS_LANGUAGE, gpt_cond_latent, speaker_embedding)
+            wav = output['wav']
+            if torch.is_tensor(wav):
+                wav = wav.cpu().numpy()
+            write_wav(file_path, wav, get_sample_rate(tts))
+            return
+    
+    # Generate speech with proper parameters based on model type
+    if model_type == "xtts_v2":
+        # For XTTS v2
+        tts.tts_to_file(
+            text=text,
+            file_path=file_path,
+            speaker_name=speaker  # XTTS v2 uses speaker_name
+        )
+    else:
+        # For VITS model
+        tts.tts_to_file(
+            text=text,
+            file_path=file_path,
+            speaker=speaker  # VITS uses speaker
+        )
+
+def synthesize_batch_vits(tts, texts, speakers):
+    """
+    Run one padded forward pass of a VITS model over several texts
+
+    Texts are split into sentences and each sentence is followed by silence
+    as in tts_to_file, so a batched request gives the same audio as an
+    unbatched one for the shared cache key.
+
+    Args:
+        tts: Loaded TTS instance with a VITS model
+        texts (list): Cleaned texts to synthesize
+        speakers (list): Speaker name for each text
+
+    Returns:
+        list: Float waveform for each text, peak-normalized like tts_to_file
+    """
+    torch = import_torch()
+    synthesizer = tts.synthesizer
+    model = synthesizer.tts_model
+
+    # (text index, sentence) for every sentence of every text, all run in the same pass
+    sentences = [(i, sentence) for i, text in enumerate(texts) for sentence in synthesizer.split_into_sentences(text)]
+    speakers = [speakers[i] for i, _ in sentences]
+    token_ids = [model.tokenizer.text_to_ids(sentence) for _, sentence in sentences]
+    lengths = torch.tensor([len(ids) for ids in token_ids], dtype=torch.long)
+    # Padding positions are masked out by x_lengths
+    tokens = torch.zeros((len(token_ids), int(lengths.max())), dtype=torch.long)
+    for i, ids in enumerate(token_ids):
+        tokens[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+
+    speaker_ids = None
+    speaker_manager = getattr(model, 'speaker_manager', None)
+    if speaker_manager is not None and speaker_manager.name_to_id:
+        speaker_ids = torch.tensor([speaker_manager.name_to_id[speaker] for speaker in speakers], dtype=torch.long)
+
+    device = next(model.parameters()).device
+    if speaker_ids is not None:
+        speaker_ids = speaker_ids.to(device)
+    with torch.inference_mode():
+        outputs = model.inference(
+            tokens.to(device),
+            aux_input={'x_lengths': lengths.to(device), 'speaker_ids': speaker_ids, 'd_vectors': None, 'language_ids': None}
+        )
+
+    # Each item's audio ends where its frame mask does
+    hop_length = model.config.audio.hop_length
+    frames = outputs['y_mask'].sum(dim=(1, 2)).long().tolist()
+    waveforms = outputs['model_outputs'].squeeze(1).cpu().numpy()
+
+    trim = getattr(model.config.audio, 'do_trim_silence', False)
+    if trim:
+        from TTS.tts.utils.synthesis import trim_silence
+
+    pieces = [[] for _ in texts]
+    for (i, _), waveform, frame_count in zip(sentences, waveforms, frames):
+        wav = waveform[:frame_count * hop_length]
+        if trim:
+            wav = trim_silence(wav, model.ap)
+        pieces[i].extend([wav, np.zeros(SENTENCE_SILENCE_SAMPLES, dtype=wav.dtype)])
+
+    results = []
+    for text_pieces in pieces:
+        wav = np.concatenate(text_pieces) if text_pieces else np.zeros(0, dtype=np.float32)
+        peak = float(np.max(np.abs(wav))) if len(wav) else 0.0
+        results.append(wav / max(0.01, peak))
+    return results
+
+def resolve_engine_mode(mode, model_type, device):
+    """
+    Get the inference mode a request will actually run with
+
+    Args:
+        mode (str): Requested mode, see ENGINE_MODES
+        model_type (str): Loaded model
+        device (str): Torch device the model runs on
+
+    Returns:
+        str: The supported mode closest to the request
+    """
+    if mode not in ENGINE_MODES:
+        return 'standard'
+    if mode != 'standard' and device != 'cpu':
+        # The optimized variants target CPU-only nodes
+        return 'standard'
+    if mode == 'onnx' and model_type != 'vits':
+        return 'quantized'
+    return mode
+
+class ModelVariants:
+    """
+    A loaded model and its CPU-optimized variants.
+
+    The standard model is always available. The int8 dynamically quantized
+    copy and the ONNX Runtime session are built the first time a request
+    asks for them, so a process only pays for the modes it actually uses.
+    ONNX export is only supported for VITS, XTTS falls back to quantized.
+
+    Concurrent VITS requests in standard and quantized mode are micro-batched:
+    requests arriving within TTS_BATCH_WINDOW_MS of each other run as one
+    padded forward pass instead of one pass each.
+    """
+
+    def __init__(self, tts, model_type, device="cpu", speakers=None):
+        self.tts = tts
+        self.model_type = model_type
+        self.device = device
+        self.speakers = speakers
+        self._quantized = None
+        self._onnx_ready = False
+        self._lock = threading.Lock()
+        # The model runs one forward pass at a time
+        self._inference_lock = threading.Lock()
+
+        self._batcher = None
+        if model_type == "vits" and TTS_BATCH_WINDOW_MS > 0 and np is not None:
+            self._batcher = MicroBatcher(self._run_batch, window_ms=TTS_BATCH_WINDOW_MS,
+                                         max_batch_size=TTS_BATCH_MAX_SIZE, name="tts-batch")
+
+    def resolve_mode(self, mode):
+        """Get the mode a request for mode will actually run with"""
+        return resolve_engine_mode(mode, self.model_type, self.device)
+
+    def synthesize(self, text, speaker, file_path, mode='standard'):
+        """Synthesize text to file_path with the given inference mode"""
+        mode = self.resolve_mode(mode)
+
+        if mode == 'onnx':
+            try:
+                self._ensure_onnx()
+            except Exception as e:
+                logger.error(f"ONNX inference unavailable, using quantized model: {e}")
+                mode = 'quantized'
+            else:
+                with self._inference_lock:
+                    self._synthesize_onnx(text, speaker, file_path)
+                return
+
+        if self._batcher is not None:
+            self._batcher.run((text, speaker, file_path, mode))
+            return
+
+        tts = self._tts_for_mode(mode)
+        with self._inference_lock:
+            synthesize_to_file(tts, self.model_type, text, speaker, file_path, speakers=self.speakers)
+
+    def batch_stats(self):
+        """Get micro-batching statistics, None if batching is off"""
+        return self._batcher.stats() if self._batcher is not None else None
+
+    def real_time_factor(self, speaker, mode='standard'):
+        """
+        Time one synthesis of BENCHMARK_TEXT
+
+        Returns:
+            float: Synthesis time divided by audio duration, below 1 is faster than real time
+        """
+        handle, file_path = tempfile.mkstemp(suffix='.wav')
+        os.close(handle)
+        try:
+            started = time.perf_counter()
+            self.synthesize(BENCHMARK_TEXT, speaker, file_path, mode=mode)
+            elapsed = time.perf_counter() - started
+
+            samples, sample_rate = read_wav(file_path)
+            return elapsed / max(len(samples) / sample_rate, 1e-6)
+        finally:
+            os.remove(file_path)
+
+    def share_memory(self, mode='standard'):
+        """
+        Prepare the model to be inherited by forked worker processes
+
+        Builds the variant for mode up front so workers don't each build their
+        own, then freezes the weights and moves them to shared memory. Forked
+        workers map the same pages instead of copying them on first touch.
+        ONNX Runtime sessions are not fork-safe and are still created per worker.
+
+        Args:
+            mode (str): Inference mode the workers will run with
+        """
+        mode = self.resolve_mode(mode)
+        models = [self.tts.synthesizer.tts_model]
+        if mode != 'standard':
+            try:
+                models.append(self._quantized_tts().synthesizer.tts_model)
+            except Exception as e:
+                logger.error(f"Quantized inference unavailable, using standard model: {e}")
+                self._quantized = self.tts
+
+        for model in models:
+            model.eval()
+            # Inference never writes to the weights, nothing needs gradients
+            for parameter in model.parameters():
+                parameter.requires_grad_(False)
+            try:
+                model.share_memory()
+            except Exception as e:
+                # Packed quantized weights can't always be moved, they are still copy-on-write
+                logger.warning(f"Could not move {type(model).__name__} weights to shared memory: {e}")
+
+        logger.info(f"Shared {self.model_type} model weights for forked workers")
+
+    def after_fork(self, torch_threads=1):
+        """Reset per-process state in a worker forked from the loading process"""
+        self._lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+        if self._batcher is not None:
+            self._batcher.after_fork()
+        if self.speakers is not None:
+            self.speakers.after_fork()
+        if self.device == "cpu":
+            import_torch().set_num_threads(torch_threads)
+
+    def _tts_for_mode(self, mode):
+        if mode != 'quantized':
+            return self.tts
+        try:
+            return self._quantized_tts()
+        except Exception as e:
+            logger.error(f"Quantized inference unavailable, using standard model: {e}")
+            # Don't retry the quantization on every request
+            self._quantized = self.tts
+            return self.tts
+
+    def _run_batch(self, requests):
+        """Synthesize a micro-batch of (text, speaker, file_path, mode) requests"""
+        results = [None] * len(requests)
+        by_mode = {}
+        for index, request in enumerate(requests):
+            by_mode.setdefault(request[3], []).append(index)
+
+        for mode, indexes in by_mode.items():
+            tts = self._tts_for_mode(mode)
+            with self._inference_lock:
+                waveforms = None
+                if len(indexes) > 1:
+                    try:
+                        waveforms = synthesize_batch_vits(tts, [requests[i][0] for i in indexes],
+                                                          [requests[i][1] for i in indexes])
+                    except Exception as e:
+                        logger.warning(f"Batched synthesis failed, running {len(indexes)} requests one by one: {e}")
+
+                for position, index in enumerate(indexes):
+                    text, speaker, file_path, _ = requests[index]
+                    try:
+                        if waveforms is not None:
+                            write_wav(file_path, waveforms[position], get_sample_rate(tts))
+                        else:
+                            synthesize_to_file(tts, self.model_type, text, speaker, file_path)
+                    except Exception as e:
+                        results[index] = e
+
+        return results
+
+    def _quantized_tts(self):
+        with self._lock:
+            if self._quantized is None:
+                logger.info(f"Quantizing {self.model_type} model to int8")
+                torch = import_torch()
+                model = torch.quantization.quantize_dynamic(
+                    self.tts.synthesizer.tts_model,
+                    {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU},
+                    dtype=torch.qint8
+                )
+                # Shallow copies sharing everything but the model
+                quantized = copy.copy(self.tts)
+                quantized.synthesizer = copy.copy(self.tts.synthesizer)
+                quantized.synthesizer.tts_model = model
+                self._quantized = quantized
+            return self._quantized
+
+    def _ensure_onnx(self):
+        with self._lock:
+            if self._onnx_ready:
+                return
+
+            model = self.tts.synthesizer.tts_model
+            os.makedirs(TTS_ONNX_DIR, exist_ok=True)
+            onnx_path = os.path.join(TTS_ONNX_DIR, f"{self.model_type}.onnx")
+
+            if not os.path.exists(onnx_path):
+                logger.info(f"Exporting {self.model_type} model to {onnx_path}")
+                temp_path = f"{onnx_path}.{os.getpid()}.tmp"
+                model.export_onnx(output_path=temp_path, verbose=False)
+                os.replace(temp_path, onnx_path)
+
+            model.load_onnx(onnx_path, cuda=False)
+            self._onnx_ready = True
+
+    def _synthesize_onnx(self, text, speaker, file_path):
+        model = self.tts.synthesizer.tts_model
+        token_ids = np.asarray([model.tokenizer.text_to_ids(text)], dtype=np.int64)
+
+        speaker_id = None
+        speaker_manager = getattr(model, 'speaker_manager', None)
+        if speaker_manager is not None and speaker_manager.name_to_id:
+            speaker_id = speaker_manager.name_to_id[speaker]
+
+        wav = model.inference_onnx(token_ids, speaker_id=speaker_id)
+        write_wav(file_path, np.squeeze(wav), get_sample_rate(self.tts))
+
+def load_model_variants(device, speaker=None, mode='standard'):
+    """
+    Load the TTS model with its speaker registry and optimized variants
+
+    Args:
+        device (str): Torch device to load the model on
+        speaker (str, optional): Speaker to report the real-time factor for
+        mode (str): Inference mode to warm up and benchmark
+
+    Returns:
+        ModelVariants: The loaded model
+    """
+    torch = import_torch()
+    tts, model_type = load_tts_model(device)
+    variants = ModelVariants(tts, model_type, device, speakers=create_speaker_registry(tts, model_type, device))
+
+    if speaker:
+        mode = variants.resolve_mode(mode)
+        try:
+            rtf = variants.real_time_factor(speaker, mode=mode)
+            logger.info(f"TTS {model_type} in {mode} mode: real-time factor {rtf:.2f} "
+                        f"with {torch.get_num_threads()} threads")
+        except Exception as e:
+            logger.warning(f"Could not measure TTS real-time factor: {e}")
+
+    return variants
+
+def _worker_main(worker_id, device, torch_threads, task_queue, result_queue):
+    """Entry point of a TTS worker process"""
+    logging.basicConfig(level=logging.INFO)
+    import_torch().set_num_threads(torch_threads)
+
+    try:
+        # One benchmark per pool is enough, the workers are identical
+        benchmark_speaker = TTS_SPEAKER if TTS_REPORT_RTF and worker_id == 0 else None
+        variants = load_model_variants(device, speaker=benchmark_speaker, mode=TTS_ENGINE_MODE)
+    except Exception as e:
+        result_queue.put(('failed', None, str(e)))
+        return
+
+    result_queue.put(('ready', None, (variants.model_type, get_sample_rate(variants.tts))))
+    logger.info(f"TTS worker {worker_id} ready (pid {os.getpid()}, {torch_threads} torch threads)")
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        task_id, text, speaker, file_path, mode = task
+        try:
+            variants.synthesize(text, speaker, file_path, mode=mode)
+            result_queue.put(('done', task_id, None))
+        except Exception as e:
+            result_queue.put(('error', task_id, str(e)))
+
+class _Worker:
+    """Parent-side handle for one worker process"""
+
+    def __init__(self, worker_id, context, device, torch_threads):
+        self.worker_id = worker_id
+        self.context = context
+        self.device = device
+        self.torch_threads = torch_threads
+        self.process = None
+        self.task_queue = None
+        self.result_queue = None
+
+    def start(self):
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(self.worker_id, self.device, self.torch_threads, self.task_queue, self.result_queue),
+            name=f"tts-worker-{self.worker_id}"
+        )
+        self.process.daemon = True
+        self.process.start()
+
+    def receive(self):
+        """Wait for the next message from the worker, None if it died"""
+        while True:
+            try:
+                return self.result_queue.get(timeout=1)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    return None
+
+class TTSWorkerPool:
+    """
+    Pool of TTS worker processes fed by a bounded priority queue.
+
+    Each worker process loads its own copy of the model with a fixed torch
+    thread count, so synthesis runs on separate cores without contending for
+    the web process' GIL. Requests are queued by priority (live call prompts
+    before background pre-rendering) and handed to whichever worker frees up
+    first by one dispatcher thread per worker.
+
+    When no room frees up in the queue within queue_timeout, submit raises
+    TTSOverloadedError instead of blocking the caller. If every worker
+    fails to start or restart, queued requests fail and new ones are
+    rejected with TTSUnavailableError rather than waiting forever.
+    """
+
+    def __init__(self, num_workers, device="cpu", torch_threads=1, queue_size=256, queue_timeout=TTS_QUEUE_TIMEOUT):
+        self.num_workers = num_workers
+        self.queue_timeout = queue_timeout
+        self.device = device
+        self.torch_threads = torch_threads
+        self.model_type = None
+        self.sample_rate = None
+
+        self._pending = queue.PriorityQueue(maxsize=queue_size)
+        self._sequence = itertools.count()
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._ready = threading.Event()
+        self._failed = []
+        self._stopped = False
+        # Dispatcher threads still feeding a worker, the error once none are left
+        self._dispatchers = 0
+        self._dispatchers_lock = threading.Lock()
+        self._dispatcher_threads = []
+        self._unavailable = None
+
+    def start(self):
+        """Start the worker processes and their dispatcher threads"""
+        logger.info(f"Starting {self.num_workers} TTS workers on {self.device} "
+                    f"with {self.torch_threads} torch threads each")
+
+        for worker_id in range(self.num_workers):
+            worker = _Worker(worker_id, self._context, self.device, self.torch_threads)
+            self._workers.append(worker)
+            with self._dispatchers_lock:
+                self._dispatchers += 1
+
+            dispatcher = threading.Thread(target=self._dispatch, args=(worker,), name=f"tts-dispatch-{worker_id}")
+            dispatcher.daemon = True
+            dispatcher.start()
+            self._dispatcher_threads.append(dispatcher)
+
+        return self
+
+    def wait_ready(self, timeout=None):
+        """
+        Wait until at least one worker has loaded its model
+
+        Returns:
+            tuple: (model type, sample rate) reported by the worker
+        """
+        if not self._ready.wait(timeout):
+            raise TimeoutError("No TTS worker became ready in time")
+
+        if self.model_type is None:
+            raise RuntimeError(f"TTS workers failed to load a model: {self._failed}")
+        if self._unavailable is not None:
+            raise TTSUnavailableError(self._unavailable)
+
+        return self.model_type, self.sample_rate
+
+    def submit(self, text, speaker, file_path, priority=PRIORITY_LIVE, timeout=None, mode='standard'):
+        """
+        Queue a synthesis request
+
+        Args:
+            text (str): Cleaned text to synthesize
+            speaker (str): Speaker name
+            file_path (str): Where the worker should write the audio
+            priority (int): Lower runs first
+            timeout (float, optional): How long to wait for room in the queue,
+                queue_timeout by default
+            mode (str): Inference mode, see ENGINE_MODES
+
+        Returns:
+            Future: Resolves to file_path once the audio is written
+
+        Raises:
+            TTSOverloadedError: If the queue stays full for longer than timeout
+            TTSUnavailableError: If no worker is left to take the request
+        """
+        if self._unavailable is not None:
+            raise TTSUnavailableError(self._unavailable)
+
+        future = Future()
+        try:
+            self._pending.put((priority, next(self._sequence), (text, speaker, file_path, mode), future),
+                              timeout=self.queue_timeout if timeout is None else timeout)
+        except queue.Full:
+            raise TTSOverloadedError(f"TTS queue is full ({self._pending.maxsize} requests waiting)")
+
+        # The last dispatcher may have exited while this was being queued
+        if self._unavailable is not None:
+            self._fail_pending()
+        return future
+
+    def synthesize(self, text, speaker, file_path, priority=PRIORITY_LIVE, timeout=None, mode='standard'):
+        """
+        Queue a synthesis request and wait for it to finish
+
+        Args:
+            timeout (float, optional): Seconds to wait for the audio once queued
+
+        Raises:
+            TTSOverloadedError: If the queue stays full for longer than queue_timeout
+            TTSUnavailableError: If no worker is left to take the request
+            concurrent.futures.TimeoutError: If the audio isn't ready within timeout
+        """
+        return self.submit(text, speaker, file_path, priority=priority, mode=mode).result(timeout)
+
+    def queue_depth(self):
+        """Number of requests waiting for a worker"""
+        return self._pending.qsize()
+
+    def shutdown(self, timeout=5):
+        """
+        Stop the dispatchers, then the workers
+
+        Queued requests fail with TTSUnavailableError. A request already
+        handed to a worker gets to finish within timeout.
+        """
+        self._stopped = True
+        self._unavailable = "TTS worker pool was shut down"
+        self._fail_pending()
+
+        # One stop marker per dispatcher, ahead of any request queued meanwhile
+        for _ in self._dispatcher_threads:
+            try:
+                self._pending.put((float('-inf'), next(self._sequence), None, None), timeout=timeout)
+            except queue.Full:
+                logger.warning("TTS queue is full, a dispatcher may not stop")
+        for dispatcher in self._dispatcher_threads:
+            dispatcher.join(timeout=timeout)
+
+        for worker in self._workers:
+            if worker.process and worker.process.is_alive():
+                worker.task_queue.put(None)
+        for worker in self._workers:
+            if worker.process:
+                worker.process.join(timeout=timeout)
+
+    def _dispatch(self, worker):
+        """Feed one worker from the shared queue, restarting it if it dies"""
+        try:
+            self._feed(worker)
+        finally:
+            self._dispatcher_exited()
+
+    def _dispatcher_exited(self):
+        with self._dispatchers_lock:
+            self._dispatchers -= 1
+            if self._dispatchers > 0 or self._stopped:
+                return
+            self._unavailable = f"All TTS workers failed: {self._failed[-1] if self._failed else 'stopped'}"
+        logger.error(self._unavailable)
+        self._ready.set()
+        self._fail_pending()
+
+    def _fail_pending(self):
+        """Fail every queued request, nobody is left to take them"""
+        while True:
+            try:
+                _, _, _, future = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(TTSUnavailableError(self._unavailable))
+
+    def _feed(self, worker):
+        task_ids = itertools.count()
+
+        while not self._stopped:
+            worker.start()
+            message = worker.receive()
+
+            if message is None or message[0] == 'failed':
+                error = message[2] if message else "worker exited during startup"
+                logger.error(f"TTS worker {worker.worker_id} failed to start: {error}")
+                self._failed.append(error)
+                if len(self._failed) >= self.num_workers and self.model_type is None:
+                    self._ready.set()
+                return
+
+            self.model_type, self.sample_rate = message[2]
+            self._ready.set()
+
+            while not self._stopped:
+                priority, _, request, future = self._pending.get()
+                if future is None:
+                    # Stop marker from shutdown
+                    return
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                task_id = next(task_ids)
+                worker.task_queue.put((task_id,) + request)
+                message = worker.receive()
+
+                if message is None:
+                    future.set_exception(RuntimeError(f"TTS worker {worker.worker_id} died during synthesis"))
+                    logger.error(f"TTS worker {worker.worker_id} died, restarting")
+                    break
+
+                status, _, error = message
+                if status == 'done':
+                    future.set_result(request[2])
+                else:
+                    future.set_exception(RuntimeError(error))
@@ -1,41 +1,212 @@
 # lead_finder/services/tts_service.py
 import os
-import torch
+import re
+import json
+import time
+import shutil
 import logging
-import uuid
-from TTS.api import TTS
-from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.audio_cache import AudioCache, CALL_OWNER_PREFIX
+from services.audio_utils import (
+    np, OUTPUT_PROFILES, read_wav, write_wav, convert_wav, trim_silence, crossfade_concat
+)
+from services.tts_engine import get_sample_rate, resolve_engine_mode, PRIORITY_LIVE
+from utils.single_flight import SingleFlight
+from templates.script_templates import split_template, render_template
+from config.settings import (
+    TTS_CACHE_DIR, TTS_CACHE_MAX_MB, TTS_CACHE_POLICY, TTS_CALL_PIN_HOURS,
+    TTS_WORKERS, TTS_TORCH_THREADS, TTS_QUEUE_SIZE, TTS_SYNTHESIS_TIMEOUT,
+    TTS_STREAM_THREADS, TTS_SEGMENT_WAIT_SECONDS, TTS_OUTPUT_PROFILE, TTS_VOICES_DIR,
+    TTS_ENGINE_MODE, TTS_REPORT_RTF, TTS_SPEAKER, TTS_READY_TIMEOUT
+)
 
 logger = logging.getLogger(__name__)
 # os.environ["PHONEMIZER_ESPEAK_LIBRARY"] = "C:\\Program Files\\eSpeak NG\\espeak-ng.exe" # This is for Windows, not needed in Linux Docker container
+# PyTorch safe globals for XTTS checkpoints are registered in services.tts_engine
 
-# --- BEGIN PYTORCH SAFE GLOBALS FIX ---
-try:
-    # Import all specific config classes that XTTS might store in its checkpoint
-    from TTS.tts.configs.xtts_config import XttsConfig
-    from TTS.tts.models.xtts import XttsAudioConfig # You had this
-    from TTS.config.shared_configs import BaseDatasetConfig # <<< ADD THIS ONE AS PER ERROR
-    from TTS.tts.utils.languages import LanguageManager # Often needed by multilingual models
+BREAK_TAG_RE = re.compile(r'''<break\s+time=["'](\d+(?:\.\d+)?)(ms|s)["']\s*/>''')
+EMPHASIS_TAG_RE = re.compile(r"</?emphasis[^>]*>")
+SEGMENT_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+")
+# A break right after a sentence end would otherwise leave ". ," behind
+REDUNDANT_PUNCTUATION_RE = re.compile(r"(?<!\.)([.!?])\s*(?:,|\.(?!\.))\s*")
 
-    # Add all potentially problematic classes to safe globals
-    # It's better to be specific if you know them, but a broader list from TTS configs can help
-    torch.serialization.add_safe_globals([
-        XttsConfig,
-        XttsAudioConfig,
-        BaseDatasetConfig,  # <<< ESSENTIAL
-        LanguageManager,    # <<< GOOD TO HAVE
-        # You might need to add more if other "Unsupported global" errors appear
-        # for other TTS.something classes.
-    ])
-    logger.info("Successfully added necessary TTS configs/classes to PyTorch safe globals.")
-except ImportError as e:
-    logger.error(f"Could not import TTS classes for PyTorch safe globals fix: {e}. XTTS might fail to load.")
-except Exception as e:
-    logger.error(f"Error during PyTorch safe globals setup: {e}")
-# --- END PYTORCH SAFE GLOBALS FIX ---
+# Model info of the last load, kept next to the audio it produced
+ENGINE_INFO_FILENAME = 'engine.json'
+
+AUDIO_MIMETYPES = {
+    'wav': 'audio/wav',
+    'm3u': 'audio/x-mpegurl'
+}
+
+def _break_replacement(match):
+    """Replace an SSML break with punctuation of a similar pause length"""
+    duration_ms = float(match.group(1)) * (1000 if match.group(2) == 's' else 1)
+    if duration_ms <= 300:
+        return ', '
+    if duration_ms < 1000:
+        return '. '
+    return '... '
+
+def split_segments(cleaned_text):
+    """Split processed text into sentence segments for streaming synthesis"""
+    return [segment.strip() for segment in SEGMENT_BOUNDARY_RE.split(cleaned_text) if re.search(r"\w", segment)]
+
+def get_audio_mimetype(filename):
+    """Get the mimetype to serve an audio cache file with"""
+    return AUDIO_MIMETYPES.get(filename.rsplit('.', 1)[-1], 'application/octet-stream')
 
 class TTSService:
+    """
+    Cached text-to-speech.
+
+    Constructing the service is cheap: torch, TTS and the model are loaded by
+    start() on a background thread, and synthesis waits for them. Cache keys
+    use the model info persisted by the last load, so cached prompts can be
+    served before the model is ready.
+    """
+    
     def __init__(self):
+        # Audio cache directory
+        self.cache_dir = TTS_CACHE_DIR
+        self.audio_cache = AudioCache(self.cache_dir, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024, policy=TTS_CACHE_POLICY)
+        
+        # Format the cached audio is encoded in, ideally what the media leg plays as-is
+        self.output_profile = TTS_OUTPUT_PROFILE
+        if self.output_profile not in OUTPUT_PROFILES:
+            logger.warning(f"Unknown TTS output profile '{self.output_profile}', using native output")
+            self.output_profile = 'native'
+        elif OUTPUT_PROFILES[self.output_profile] and np is None:
+            logger.warning(f"numpy is not available, can't encode {self.output_profile}, using native output")
+            self.output_profile = 'native'
+        
+        # Concurrent requests for the same prompt share one synthesis
+        self._in_flight = SingleFlight()
+        
+        # Background synthesis of streaming segments after the first one
+        self._segment_executor = ThreadPoolExecutor(max_workers=TTS_STREAM_THREADS, thread_name_prefix="tts-segment")
+        self._pending_segments = {}
+        self._segment_lock = threading.Lock()
+        
+        # Filled in by the background load
+        self.tts = None
+        self.speakers = None
+        self.engine = None
+        self.worker_pool = None
+        
+        # Model info from the previous load, good enough for cache keys until the model is up
+        self.model_type, self.sample_rate, self.device = self._read_engine_info()
+        
+        self._state = 'not_started'
+        self._error = None
+        self._load_seconds = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+    
+    def start(self):
+        """Start loading the model in the background, if it isn't already"""
+        with self._start_lock:
+            if self._state != 'not_started':
+                return self
+            self._state = 'loading'
+        
+        loader = threading.Thread(target=self._load, name="tts-load")
+        loader.daemon = True
+        loader.start()
+        return self
+    
+    def load_for_fork(self):
+        """
+        Load the model in this process, before a prefork server forks its workers
+        
+        The model is loaded synchronously and in-process (no worker pool), the
+        default voice is conditioned and the weights are moved to shared memory,
+        so every forked worker serves from the one copy. Workers must call
+        after_fork() once they are forked.
+        """
+        with self._start_lock:
+            if self._state != 'not_started':
+                return self
+            self._state = 'loading'
+        
+        self._load(for_fork=True)
+        return self
+    
+    def after_fork(self, torch_threads=TTS_TORCH_THREADS):
+        """
+        Reset per-process state in a worker forked from the loading process
+        
+        Locks, executors and in-flight requests belong to the parent, the
+        worker starts over with its own.
+        
+        Args:
+            torch_threads (int): Intra-op threads for this worker's inference
+        """
+        self._in_flight = SingleFlight()
+        self._segment_executor = ThreadPoolExecutor(max_workers=TTS_STREAM_THREADS, thread_name_prefix="tts-segment")
+        self._pending_segments = {}
+        self._segment_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.audio_cache.after_fork()
+        
+        if self.engine is not None:
+            self.engine.after_fork(torch_threads)
+    
+    def wait_ready(self, timeout=TTS_READY_TIMEOUT):
+        """
+        Wait for the model to finish loading, starting the load if needed
+        
+        Raises:
+            TimeoutError: If the model isn't loaded within timeout seconds
+            RuntimeError: If the model failed to load
+        """
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"TTS model not ready after {timeout} seconds")
+        if self._state == 'failed':
+            raise RuntimeError(f"TTS model failed to load: {self._error}")
+    
+    def is_ready(self):
+        """Check whether the model is loaded"""
+        return self._state == 'ready'
+    
+    def get_status(self):
+        """Get the loading state of the service"""
+        return {
+            'state': self._state,
+            'error': self._error,
+            'load_seconds': self._load_seconds,
+            'model_type': self.model_type,
+            'sample_rate': self.sample_rate,
+            'device': self.device,
+            'cache': self.audio_cache.stats(),
+            'batching': self.engine.batch_stats() if self.engine is not None else None
+        }
+    
+    def _load(self, for_fork=False):
+        started = time.perf_counter()
+        try:
+            self._initialize_tts(for_fork=for_fork)
+            self._load_seconds = round(time.perf_counter() - started, 2)
+            self._state = 'ready'
+            self._write_engine_info()
+        except Exception as e:
+            logger.error(f"Error loading TTS model: {e}", exc_info=True)
+            self._error = str(e)
+            self._state = 'failed'
+        finally:
+            self._ready.set()
+    
+    def _initialize_tts(self, for_fork=False):
+        """
+        Initialize TTS model with GPU acceleration if available
+        
+        Args:
+            for_fork (bool): Load in-process and share the weights with processes forked afterwards
+        """
+        from services.tts_engine import import_torch, load_model_variants, TTSWorkerPool
+        torch = import_torch()
+        
         # Check TTS and PyTorch versions
         try:
             import importlib.metadata
@@ -48,130 +219,441 @@ class TTSService:
         # Check if CUDA is available
         self.cuda_available = torch.cuda.is_available()
         if self.cuda_available:
-            self.device = "cuda" 
+            device = "cuda" 
             logger.info(f"CUDA is available. GPU: {torch.cuda.get_device_name()}")
         else:
-            self.device = "cpu"
+            device = "cpu"
             logger.info("CUDA is not available, using CPU")
         
-        # Audio cache directory
-        self.cache_dir = os.path.join(os.getcwd(), "temp_audio")
-        os.makedirs(self.cache_dir, exist_ok=True)
+        if for_fork:
+            if TTS_WORKERS > 0:
+                logger.warning("TTS_WORKERS is ignored when the model is shared with forked workers")
+            # A single thread keeps the OpenMP pool from starting before the
+            # fork, forked children can deadlock on an inherited pool
+            torch.set_num_threads(1)
+            self.engine = load_model_variants(device, mode=TTS_ENGINE_MODE)
+            self.tts, model_type = self.engine.tts, self.engine.model_type
+            sample_rate = get_sample_rate(self.tts)
+            self.speakers = self.engine.speakers
+            if self.speakers is not None:
+                try:
+                    self.speakers.get(TTS_SPEAKER)
+                except KeyError as e:
+                    logger.warning(f"Could not condition default voice: {e}")
+            self.engine.share_memory(TTS_ENGINE_MODE)
+        elif TTS_WORKERS > 0:
+            # Synthesis runs in dedicated worker processes, each with its own model
+            self.worker_pool = TTSWorkerPool(
+                num_workers=TTS_WORKERS,
+                device=device,
+                torch_threads=TTS_TORCH_THREADS,
+                queue_size=TTS_QUEUE_SIZE
+            ).start()
+            model_type, sample_rate = self.worker_pool.wait_ready()
+        else:
+            if device == "cpu":
+                torch.set_num_threads(TTS_TORCH_THREADS)
+            self.engine = load_model_variants(
+                device,
+                speaker=TTS_SPEAKER if TTS_REPORT_RTF else None,
+                mode=TTS_ENGINE_MODE
+            )
+            self.tts, model_type = self.engine.tts, self.engine.model_type
+            sample_rate = get_sample_rate(self.tts)
+            # XTTS voices are conditioned once and reused for every prompt
+            self.speakers = self.engine.speakers
+        
+        if self.model_type and (self.model_type, self.sample_rate) != (model_type, sample_rate):
+            logger.warning(f"TTS model changed from {self.model_type} to {model_type}, "
+                           f"cached prompts will be re-rendered")
+        self.model_type, self.sample_rate, self.device = model_type, sample_rate, device
         
-        # Initialize TTS
-        self._initialize_tts()
+        self.engine_mode = self._resolve_engine_mode(TTS_ENGINE_MODE)
+        logger.info(f"TTS ready: model {self.model_type}, sample rate {self.sample_rate}, "
+                    f"output profile {self.output_profile}, engine mode {self.engine_mode}")
     
-    def _initialize_tts(self):
-        """Initialize TTS model with GPU acceleration if available"""
+    def _engine_info_path(self):
+        return os.path.join(self.cache_dir, ENGINE_INFO_FILENAME)
+    
+    def _read_engine_info(self):
+        """Model type, sample rate and device recorded by the last successful load"""
         try:
-            # First, try to load the XTTS v2 model
-            logger.info(f"Attempting to load XTTS v2 model on {self.device}")
-            
-            # Modify this to use weights_only=False for XTTS
-            self.tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(self.device)
-            logger.info(f"XTTS v2 model loaded successfully on {self.device}")
-            self.model_type = "xtts_v2"
-        except Exception as e:
-            logger.warning(f"Could not load XTTS v2 model: {e}, trying fallback model")
-            try:
-                # Fall back to VITS model
-                logger.info(f"Attempting to load VITS model on {self.device}")
-                self.tts = TTS("tts_models/en/vctk/vits").to(self.device)
-                logger.info(f"VITS model loaded successfully on {self.device}")
-                self.model_type = "vits"
-            except Exception as e2:
-                logger.error(f"Error loading fallback TTS model: {e2}")
-                raise
-    
-    def generate_audio(self, text, speaker="p236", save_to_file=True):
-        """Generate audio from text"""
+            with open(self._engine_info_path(), 'r') as f:
+                info = json.load(f)
+            return info['model_type'], info['sample_rate'], info['device']
+        except (OSError, ValueError, KeyError):
+            return None, None, None
+    
+    def _write_engine_info(self):
+        try:
+            with open(self._engine_info_path(), 'w') as f:
+                json.dump({'model_type': self.model_type, 'sample_rate': self.sample_rate, 'device': self.device}, f)
+        except OSError as e:
+            logger.warning(f"Could not record TTS engine info: {e}")
+    
+    def generate_audio(self, text, speaker="p236", save_to_file=True, priority=PRIORITY_LIVE, stream=False,
+                       template=None, variables=None, engine_mode=None, call_id=None):
+        """
+        Generate audio from text, reusing the cached file for a repeated prompt
+        
+        Args:
+            text (str): Text to speak, may contain simple SSML tags
+            speaker (str): Speaker name
+            save_to_file (bool): Return the cached filename instead of the audio bytes
+            priority (int): Queue priority when synthesis runs in worker processes
+            stream (bool): Return a playlist of sentence segments for long messages,
+                see generate_audio_stream
+            template (str, optional): Message template text was rendered from
+            variables (dict, optional): Values substituted into template, see
+                generate_templated_audio
+            engine_mode (str, optional): Inference mode trading accuracy for speed,
+                see tts_engine.ENGINE_MODES, defaults to TTS_ENGINE_MODE
+            call_id (str, optional): Call the audio is played to, the file is kept
+                in the cache until release_call is called for it
+        """
+        if template and variables and save_to_file:
+            filename = self.generate_templated_audio(template, variables, speaker=speaker, priority=priority,
+                                                     engine_mode=engine_mode)
+            return self._hold_for_call(call_id, filename)
+        
+        if stream and save_to_file:
+            filename = self.generate_audio_stream(text, speaker=speaker, priority=priority, engine_mode=engine_mode)
+            return self._hold_for_call(call_id, filename)
+        
         try:
-            # Generate a unique filename
-            filename = f"{uuid.uuid4()}.wav"
-            file_path = os.path.join(self.cache_dir, filename)
-            
             # Clean text
             cleaned_text = self._process_text(text)
-            
-            # Generate speech with proper parameters based on model type
-            if self.model_type == "xtts_v2":
-                # For XTTS v2
-                self.tts.tts_to_file(
-                    text=cleaned_text,
-                    file_path=file_path,
-                    speaker_name=speaker  # XTTS v2 uses speaker_name
-                )
-            else:
-                # For VITS model
-                self.tts.tts_to_file(
-                    text=cleaned_text,
-                    file_path=file_path,
-                    speaker=speaker  # VITS uses speaker
-                )
+            filename = self._generate_cleaned(cleaned_text, speaker, priority, engine_mode)
             
             if save_to_file:
-                return filename
+                return self._hold_for_call(call_id, filename)
             else:
-                # Read file and return bytes
-                with open(file_path, 'rb') as f:
-                    audio_data = f.read()
-                    
-                # Delete the file
-                os.remove(file_path)
-                return audio_data
+                # Read file and return bytes, the file stays in the cache
+                with open(self.get_audio_path(filename), 'rb') as f:
+                    return f.read()
                 
         except Exception as e:
             logger.error(f"Error generating audio: {e}", exc_info=True)
             return None
+    
+    def generate_audio_stream(self, text, speaker="p236", priority=PRIORITY_LIVE, engine_mode=None):
+        """
+        Generate audio for a long message as a playlist of sentence segments
+        
+        The message is split at sentence and break boundaries. The first segment
+        is synthesized before returning so playback can start right away, and the
+        rest are queued in order. Segment requests that arrive before their audio
+        is ready wait for it in the /audio route (see wait_for_audio).
+        
+        Args:
+            text (str): Text to speak, may contain simple SSML tags
+            speaker (str): Speaker name
+            priority (int): Queue priority when synthesis runs in worker processes
+            engine_mode (str, optional): Inference mode, see generate_audio
+            
+        Returns:
+            str: The whole-message audio file if it is already cached or the message
+                 is a single segment, otherwise a .m3u playlist of segment files
+        """
+        try:
+            cleaned_text = self._process_text(text)
+            key = self._prompt_key(cleaned_text, speaker, engine_mode=engine_mode)
+            
+            # A pre-rendered whole message beats any streaming
+            filename = self.audio_cache.lookup(key)
+            if filename:
+                return filename
+            
+            segments = split_segments(cleaned_text)
+            if len(segments) <= 1:
+                return self._generate_cleaned(cleaned_text, speaker, priority, engine_mode)
+            
+            segment_files = [self.audio_cache.filename_for(self._prompt_key(segment, speaker, engine_mode=engine_mode))
+                             for segment in segments]
+            
+            # First segment now, the rest in the background
+            self._generate_cleaned(segments[0], speaker, priority, engine_mode)
+            for segment, segment_file in zip(segments[1:], segment_files[1:]):
+                self._queue_segment(segment, segment_file, speaker, priority, engine_mode)
+            
+            playlist = self.audio_cache.lookup(key, ext='m3u')
+            if not playlist:
+                temp_path = self.audio_cache.temp_path(key)
+                with open(temp_path, 'w') as f:
+                    # Entries are relative, so they resolve against the playlist's /audio URL
+                    f.write("#EXTM3U\n" + "\n".join(segment_files) + "\n")
+                playlist = self.audio_cache.add(key, temp_path, ext='m3u')
+            
+            return playlist
+            
+        except Exception as e:
+            logger.error(f"Error generating audio stream: {e}", exc_info=True)
+            return None
+    
+    def generate_templated_audio(self, template, variables, speaker="p236", priority=PRIORITY_LIVE, engine_mode=None):
+        """
+        Generate audio for a message template with per-call variables
+        
+        The template is split at its {placeholders}. Static segments are
+        synthesized once and cached like any prompt, only the substituted values
+        are synthesized per call, and the pieces are joined at the sample level
+        with short crossfades.
+        
+        Args:
+            template (str): Message with {name} placeholders
+            variables (dict): Values for the placeholders
+            speaker (str): Speaker name
+            priority (int): Queue priority when synthesis runs in worker processes
+            engine_mode (str, optional): Inference mode, see generate_audio
+            
+        Returns:
+            str: Filename of the joined audio
+        """
+        rendered = render_template(template, variables)
+        
+        if np is None:
+            logger.warning("numpy is not available, synthesizing templated message in one piece")
+            return self.generate_audio(rendered, speaker=speaker, priority=priority, engine_mode=engine_mode)
+        
+        try:
+            cleaned_text = self._process_text(rendered)
+            key = self._prompt_key(cleaned_text, speaker, variant='spliced', engine_mode=engine_mode)
+            filename = self.audio_cache.lookup(key)
+            if filename:
+                return filename
+            
+            fragments = []
+            for literal, field in split_template(template):
+                fragments.append(literal)
+                if field is not None:
+                    fragments.append(str(variables.get(field, f"{{{field}}}")))
+            
+            spoken = [i for i, fragment in enumerate(fragments) if re.search(r"\w", fragment)]
+            chunks = []
+            for i in spoken:
+                # Punctuation left over from the previous segment is not spoken,
+                # and only the end of the message gets closing punctuation added
+                fragment = fragments[i].strip().lstrip(',.;:!?').strip()
+                fragment = self._process_text(fragment, terminate=(i == spoken[-1]))
+                fragment_file = self._generate_cleaned(fragment, speaker, priority, engine_mode)
+                if not fragment_file:
+                    raise RuntimeError(f"No audio for segment '{fragment}'")
+                samples, sample_rate = read_wav(self.get_audio_path(fragment_file))
+                chunks.append(trim_silence(samples, sample_rate))
+            
+            if not chunks:
+                return self.generate_audio(rendered, speaker=speaker, priority=priority, engine_mode=engine_mode)
+            
+            temp_path = self.audio_cache.temp_path(key)
+            try:
+                output_format = OUTPUT_PROFILES[self.output_profile]
+                encoding = output_format[1] if output_format else 'pcm16'
+                write_wav(temp_path, crossfade_concat(chunks, sample_rate), sample_rate, encoding)
+                return self.audio_cache.add(key, temp_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            
+        except Exception as e:
+            logger.error(f"Error generating templated audio, synthesizing in one piece: {e}", exc_info=True)
+            return self.generate_audio(rendered, speaker=speaker, priority=priority, engine_mode=engine_mode)
+    
+    def wait_for_audio(self, filename, timeout=TTS_SEGMENT_WAIT_SECONDS):
+        """
+        Wait for a queued stream segment to be synthesized
         
-    def _process_text(self, text):
+        Args:
+            filename (str): Audio filename requested from the /audio route
+            timeout (float): Seconds to wait
+            
+        Returns:
+            bool: True if the file exists now
+        """
+        future = self._pending_segments.get(filename)
+        if future:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                logger.warning(f"Segment {filename} not ready: {e}")
+        
+        return os.path.exists(self.get_audio_path(filename))
+    
+    def _resolve_engine_mode(self, engine_mode):
+        """The inference mode a request runs with on the loaded model"""
+        return resolve_engine_mode(engine_mode or TTS_ENGINE_MODE, self.model_type, self.device)
+    
+    def _prompt_key(self, cleaned_text, speaker, variant=None, engine_mode=None):
+        """Cache key for a cleaned prompt with the loaded model"""
+        if self.model_type is None:
+            # First run, nothing to go on until the model is loaded
+            self.wait_ready()
+        engine_mode = self._resolve_engine_mode(engine_mode)
+        if engine_mode != 'standard':
+            # Optimized variants sound slightly different, keep their audio apart
+            variant = f"{variant}+{engine_mode}" if variant else engine_mode
+        return self.audio_cache.make_key(self.model_type, speaker, cleaned_text, self.sample_rate,
+                                         variant=variant, output_profile=self.output_profile)
+    
+    def _generate_cleaned(self, cleaned_text, speaker, priority, engine_mode=None):
+        """Get the cached file for cleaned text, synthesizing it on a miss"""
+        # Identical prompts share one file in the cache
+        key = self._prompt_key(cleaned_text, speaker, engine_mode=engine_mode)
+        filename = self.audio_cache.lookup(key)
+        
+        if filename:
+            logger.debug(f"Audio cache hit for {filename}")
+            return filename
+        
+        return self._in_flight.do(key, self._render_to_cache, key, cleaned_text, speaker, priority, engine_mode)
+    
+    def _queue_segment(self, segment, segment_file, speaker, priority, engine_mode=None):
+        """Synthesize a stream segment in the background unless cached or queued"""
+        if os.path.exists(self.get_audio_path(segment_file)):
+            return
+        
+        with self._segment_lock:
+            if segment_file in self._pending_segments:
+                return
+            future = self._segment_executor.submit(self._generate_cleaned, segment, speaker, priority, engine_mode)
+            self._pending_segments[segment_file] = future
+        
+        future.add_done_callback(lambda _: self._pending_segments.pop(segment_file, None))
+    
+    def _render_to_cache(self, key, cleaned_text, speaker, priority, engine_mode=None):
+        """Synthesize a prompt into the cache unless another caller just did"""
+        filename = self.audio_cache.lookup(key)
+        if filename:
+            return filename
+        
+        temp_path = self.audio_cache.temp_path(key)
+        try:
+            self._synthesize(cleaned_text, speaker, temp_path, priority, engine_mode)
+            self._encode_output(temp_path)
+            return self.audio_cache.add(key, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def _synthesize(self, cleaned_text, speaker, file_path, priority=PRIORITY_LIVE, engine_mode=None):
+        """Run the TTS model and write the result to file_path"""
+        self.wait_ready()
+        engine_mode = self._resolve_engine_mode(engine_mode)
+        if self.worker_pool:
+            self.worker_pool.synthesize(cleaned_text, speaker, file_path, priority=priority, mode=engine_mode,
+                                        timeout=TTS_SYNTHESIS_TIMEOUT)
+        else:
+            # The engine serializes forward passes, batching concurrent VITS requests
+            self.engine.synthesize(cleaned_text, speaker, file_path, mode=engine_mode)
+        
+    def _encode_output(self, file_path):
+        """Resample and encode freshly synthesized audio to the output profile"""
+        output_format = OUTPUT_PROFILES[self.output_profile]
+        if output_format:
+            sample_rate, encoding = output_format
+            convert_wav(file_path, sample_rate, encoding)
+    
+    def _process_text(self, text, terminate=True):
         """Process text with SSML tags and clean it for TTS"""
         if not text:
-            return "Hello."
+            return "Hello." if terminate else ""
         
         # Ensure text ends with punctuation
-        if text and not text[-1] in ['.', '!', '?', ',', ';', ':']:
+        if terminate and not text[-1] in ['.', '!', '?', ',', ';', ':']:
             text += '.'
         
         # Process SSML tags if present
         # This is a simplified implementation
-        # Handle breaks
-        text = text.replace('<break time="300ms"/>', ', ')
-        text = text.replace('<break time="500ms"/>', '. ')
-        text = text.replace('<break time="1s"/>', '... ')
+        # Handle breaks: short pauses become commas, longer ones end the sentence
+        text = BREAK_TAG_RE.sub(_break_replacement, text)
+        text = REDUNDANT_PUNCTUATION_RE.sub(r'\1 ', text)
         
         # Handle emphasis
-        text = text.replace('<emphasis level="moderate">', '')
-        text = text.replace('</emphasis>', '')
+        text = EMPHASIS_TAG_RE.sub('', text)
         
         return text
     
+    def add_voice(self, name, reference_paths):
+        """
+        Add a custom XTTS voice from reference audio
+        
+        The clips are copied to the voices directory, where worker processes
+        pick them up, and the conditioning latents are computed right away
+        when the model runs in this process.
+        
+        Args:
+            name (str): Voice name to pass as speaker
+            reference_paths (list): Reference audio files of the voice
+        """
+        voice_dir = os.path.join(TTS_VOICES_DIR, name)
+        os.makedirs(voice_dir, exist_ok=True)
+        copied = []
+        for path in reference_paths:
+            target = os.path.join(voice_dir, os.path.basename(path))
+            shutil.copyfile(path, target)
+            copied.append(target)
+        
+        self.wait_ready()
+        if self.speakers is not None:
+            self.speakers.add_voice(name, copied)
+        
+        logger.info(f"Added voice '{name}' with {len(copied)} reference clips")
+    
+    def release_call(self, call_id):
+        """Let the cache evict the audio held for a call that has ended"""
+        try:
+            self.audio_cache.release(CALL_OWNER_PREFIX + str(call_id))
+        except Exception as e:
+            logger.error(f"Error releasing audio of call {call_id}: {e}")
+    
+    def pin_campaign(self, campaign_id, filenames, replace=False):
+        """
+        Keep the prompts of a campaign in the cache
+        
+        Args:
+            campaign_id (str): Campaign identifier
+            filenames (list): Cached filenames of the campaign's prompts
+            replace (bool): Release the campaign's other prompts, e.g. after its script changed
+        """
+        owner = f"campaign:{campaign_id}"
+        self.audio_cache.pin(filenames, owner)
+        if replace:
+            self.audio_cache.release(owner, keep=filenames)
+    
+    def _hold_for_call(self, call_id, filename):
+        """Pin audio handed to a call, with the segments of a playlist"""
+        if not (call_id and filename):
+            return filename
+        
+        filenames = [filename]
+        if filename.endswith('.m3u'):
+            with open(self.get_audio_path(filename), 'r') as f:
+                filenames.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+        
+        try:
+            self.audio_cache.pin(filenames, CALL_OWNER_PREFIX + str(call_id))
+        except Exception as e:
+            logger.error(f"Error pinning audio for call {call_id}: {e}")
+        return filename
+    
     def get_audio_path(self, filename):
         """Get full path to an audio file"""
         return os.path.join(self.cache_dir, filename)
     
-    def clear_old_files(self, max_age_hours=6):
-        """Clear audio files older than given hours"""
+    def clear_old_files(self):
+        """Evict unpinned audio until the cache fits its size budget"""
         try:
-            import time
-            current_time = time.time()
-            max_age_seconds = max_age_hours * 3600
-            
-            count = 0
-            for file in Path(self.cache_dir).glob("*.wav"):
-                file_age = current_time - os.path.getmtime(file)
-                if file_age > max_age_seconds:
-                    os.remove(file)
-                    count += 1
-            
-            if count > 0:
-                logger.info(f"Cleared {count} old audio files")
+            self.audio_cache.expire_call_pins(TTS_CALL_PIN_HOURS * 3600)
+            self.audio_cache.evict()
         except Exception as e:
             logger.error(f"Error clearing old files: {e}")
 
     def download_voice_models(self):
         """Download voice models if needed"""
         try:
+            from services.tts_engine import import_torch
+            import_torch()
+            from TTS.api import TTS
+            
             # This will trigger model downloads if they don't exist locally
             logger.info("Checking/downloading voice models")
             
@@ -199,10 +681,21 @@ class TTSService:
 
 # Singleton instance
 _tts_service = None
+_tts_service_lock = threading.Lock()
 
-def get_tts_service():
-    """Get the TTS service singleton"""
+def get_tts_service(load_model=True):
+    """
+    Get the TTS service singleton
+    
+    Args:
+        load_model (bool): Start loading the model in the background. Callers
+            that only touch the audio cache pass False to keep torch out of the process
+    """
     global _tts_service
     if _tts_service is None:
-        _tts_service = TTSService()
+        with _tts_service_lock:
+            if _tts_service is None:
+                _tts_service = TTSService()
+    if load_model:
+        _tts_service.start()
     return _tts_service
\ No newline at end of file
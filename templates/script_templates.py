@@ -3,9 +3,13 @@ Script templates for voice calls.
 Contains all the campaign scripts that can be used in calls.
 Uses a template-based system that can be easily adapted for any industry.
 """
+import re
 import json
 import logging
 import copy
+import threading
+
+from utils.readonly import freeze
 
 logger = logging.getLogger(__name__)
 
@@ -695,40 +699,91 @@ def render_script(template, variables):
         logger.error(f"Error rendering template: {e}")
         return template
 
+# {name} placeholders filled from conversation data during a call
+PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+def split_template(template):
+    """
+    Split a message template at its placeholders
+    
+    Args:
+        template (str): Message with {name} placeholders
+        
+    Returns:
+        list: (literal text, placeholder name) pairs, the last name is None
+    """
+    parts = []
+    position = 0
+    for match in PLACEHOLDER_RE.finditer(template):
+        parts.append((template[position:match.start()], match.group(1)))
+        position = match.end()
+    parts.append((template[position:], None))
+    return parts
+
+def render_template(template, variables):
+    """Fill the placeholders that have a value, leaving the rest as they are"""
+    return PLACEHOLDER_RE.sub(
+        lambda match: str(variables[match.group(1)]) if match.group(1) in variables else match.group(0),
+        template
+    )
+
+# Rendered scripts by campaign id: (version, script)
+_rendered_scripts = {}
+# Bumped whenever a campaign's definition changes
+_script_versions = {}
+_rendered_lock = threading.Lock()
+
 def get_script(campaign_id, default_id='advanced_real_estate'):
     """
     Get a script by campaign ID
     
+    The script is rendered once per campaign version and shared by every
+    caller, so it is read-only: lists are tuples and dicts refuse changes.
+    Use copy.deepcopy() on it for a private, mutable copy.
+    
     Args:
         campaign_id: The campaign identifier
         default_id: Default campaign to use if requested one doesn't exist
         
     Returns:
-        dict: The script for the specified campaign
+        ReadOnlyDict: The script for the specified campaign
     """
     # Check if we have this campaign in our advanced campaigns
     if campaign_id in ADVANCED_CAMPAIGNS:
-        # Create a deep copy of the script to avoid modifying the original
-        script = copy.deepcopy(ADVANCED_CAMPAIGNS[campaign_id])
-        
-        # Process the template variables in all messages
-        variables = script['context_variables']
-        for stage_key, stage_data in script['conversation_flow'].items():
-            if 'message' in stage_data:
-                # Apply template variables to each message
-                message = stage_data['message']
-                for var_name, var_value in variables.items():
-                    placeholder = f"{{{var_name}}}"
-                    if placeholder in message:
-                        message = message.replace(placeholder, str(var_value))
-                stage_data['message'] = message
-        
+        with _rendered_lock:
+            version = _script_versions.get(campaign_id, 0)
+            cached = _rendered_scripts.get(campaign_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        script = _render_advanced_script(ADVANCED_CAMPAIGNS[campaign_id])
+        with _rendered_lock:
+            # Don't overwrite a newer version rendered meanwhile
+            if _script_versions.get(campaign_id, 0) == version:
+                _rendered_scripts[campaign_id] = (version, script)
         return script
     
     # Fall back to default advanced campaign if requested one doesn't exist
     return get_script(default_id) if campaign_id != default_id else ADVANCED_CAMPAIGNS[default_id]
 
-def create_campaign(campaign_id, name, industry, template_variables):
+def invalidate_script(campaign_id):
+    """Drop the rendered script of a campaign whose definition changed"""
+    with _rendered_lock:
+        _script_versions[campaign_id] = _script_versions.get(campaign_id, 0) + 1
+        _rendered_scripts.pop(campaign_id, None)
+
+def _render_advanced_script(definition):
+    """Apply the context variables to every message, returning a read-only script"""
+    script = copy.deepcopy(definition)
+    
+    variables = script['context_variables']
+    for stage_data in script['conversation_flow'].values():
+        if 'message' in stage_data:
+            stage_data['message'] = render_template(stage_data['message'], variables)
+    
+    return freeze(script)
+
+def create_campaign(campaign_id, name, industry, template_variables, tts_engine=None):
     """
     Create a new campaign with the specified parameters
     
@@ -737,6 +792,8 @@ def create_campaign(campaign_id, name, industry, template_variables):
         name (str): Campaign name
         industry (str): Industry template to use
         template_variables (dict): Variables to populate the template
+        tts_engine (str, optional): TTS inference mode for the campaign's audio,
+            standard, quantized or onnx. Defaults to TTS_ENGINE_MODE
         
     Returns:
         bool: True if campaign was created successfully
@@ -751,6 +808,9 @@ def create_campaign(campaign_id, name, industry, template_variables):
         'industry': industry,
         'template_variables': template_variables
     }
+    if tts_engine:
+        CAMPAIGN_SCRIPTS[campaign_id]['tts_engine'] = tts_engine
+    invalidate_script(campaign_id)
     
     logger.info(f"Created campaign {campaign_id}: {name}")
     return True
@@ -782,6 +842,58 @@ def get_all_campaigns():
     
     return campaigns
 
+def get_campaign_engine_mode(campaign_id):
+    """
+    Get the TTS inference mode configured for a campaign
+    
+    Args:
+        campaign_id (str): Campaign identifier
+        
+    Returns:
+        str: The campaign's tts_engine setting, or None to use the default
+    """
+    config = ADVANCED_CAMPAIGNS.get(campaign_id) or CAMPAIGN_SCRIPTS.get(campaign_id) or {}
+    return config.get('tts_engine')
+
+def get_campaign_messages(campaign_id):
+    """
+    Get every static message a campaign can speak, with template variables applied
+    
+    Messages that still contain {placeholders} are filled from conversation
+    data during the call, so they are left out.
+    
+    Args:
+        campaign_id (str): Campaign identifier
+        
+    Returns:
+        list: Unique message strings in script order
+    """
+    messages = []
+    
+    if campaign_id in ADVANCED_CAMPAIGNS:
+        script = get_script(campaign_id)
+        for stage_data in script['conversation_flow'].values():
+            if stage_data.get('message'):
+                messages.append(stage_data['message'])
+        messages.extend(script.get('fallback_responses', []))
+    elif campaign_id in CAMPAIGN_SCRIPTS:
+        config = CAMPAIGN_SCRIPTS[campaign_id]
+        template = INDUSTRY_TEMPLATES.get(config['industry'], {})
+        for component in SCRIPT_COMPONENTS:
+            if component not in template:
+                continue
+            try:
+                messages.append(render_script(template[component], config['template_variables']))
+            except KeyError as e:
+                logger.warning(f"Skipping {component} for campaign {campaign_id}, missing variable {e}")
+    
+    unique_messages = []
+    for message in messages:
+        if message not in unique_messages and not re.search(r'\{\w+\}', message):
+            unique_messages.append(message)
+    
+    return unique_messages
+
 def get_industries():
     """
     Get a list of all available industry templates
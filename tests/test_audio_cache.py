@@ -0,0 +1,128 @@
+# test_audio_cache.py
+import os
+from services.audio_cache import AudioCache
+
+def _write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+
+def test_same_prompt_same_key():
+    """Whitespace differences should not create a second cache entry"""
+    key_a = AudioCache.make_key("vits", "p273", "Hello there.", 22050)
+    key_b = AudioCache.make_key("vits", "p273", "  Hello   there. ", 22050)
+    key_c = AudioCache.make_key("vits", "p236", "Hello there.", 22050)
+
+    assert key_a == key_b
+    assert key_a != key_c
+
+def test_lookup_after_add(tmp_path):
+    """A published file is returned on the next lookup"""
+    cache = AudioCache(str(tmp_path), max_bytes=1024)
+    key = AudioCache.make_key("vits", "p273", "Hello.", 22050)
+
+    assert cache.lookup(key) is None
+
+    temp_path = cache.temp_path(key)
+    _write(temp_path, 100)
+    filename = cache.add(key, temp_path)
+
+    assert cache.lookup(key) == filename
+    assert not os.path.exists(temp_path)
+
+def test_lru_eviction(tmp_path):
+    """The least recently used file is evicted once over budget"""
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    keys = [AudioCache.make_key("vits", "p273", f"Prompt {i}.", 22050) for i in range(3)]
+
+    for key in keys[:2]:
+        temp_path = cache.temp_path(key)
+        _write(temp_path, 100)
+        cache.add(key, temp_path)
+
+    # Touch the first prompt so the second becomes least recently used
+    assert cache.lookup(keys[0])
+
+    temp_path = cache.temp_path(keys[2])
+    _write(temp_path, 100)
+    cache.add(keys[2], temp_path)
+
+    assert cache.lookup(keys[0])
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[2])
+    assert cache.stats()['bytes'] <= 250
+
+def test_reload_existing_files(tmp_path):
+    """Files from a previous run are indexed and stale scratch files removed"""
+    key = AudioCache.make_key("vits", "p273", "Hello.", 22050)
+    _write(os.path.join(str(tmp_path), AudioCache.filename_for(key)), 100)
+    _write(os.path.join(str(tmp_path), f"{key}.abcd1234.tmp"), 100)
+
+    cache = AudioCache(str(tmp_path), max_bytes=1024)
+
+    assert cache.lookup(key) == AudioCache.filename_for(key)
+    assert not os.path.exists(os.path.join(str(tmp_path), f"{key}.abcd1234.tmp"))
+
+def _add(cache, text, size):
+    key = AudioCache.make_key("vits", "p273", text, 22050)
+    temp_path = cache.temp_path(key)
+    _write(temp_path, size)
+    return cache.add(key, temp_path)
+
+def test_pinned_files_survive_eviction(tmp_path):
+    """Audio held by a call is only evicted once the call releases it"""
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    greeting = _add(cache, "Greeting.", 100)
+    cache.pin([greeting], "call:abc")
+
+    _add(cache, "Prompt 1.", 100)
+    _add(cache, "Prompt 2.", 100)
+    assert os.path.exists(os.path.join(str(tmp_path), greeting))
+
+    cache.release("call:abc")
+    _add(cache, "Prompt 3.", 100)
+    assert not os.path.exists(os.path.join(str(tmp_path), greeting))
+    assert cache.stats()['bytes'] <= 250
+
+def test_lfu_keeps_frequently_played_files(tmp_path):
+    """Under lfu the least played file goes first, however recently it was used"""
+    cache = AudioCache(str(tmp_path), max_bytes=250, policy='lfu')
+    keys = [AudioCache.make_key("vits", "p273", f"Prompt {i}.", 22050) for i in range(3)]
+    _add(cache, "Prompt 0.", 100)
+    _add(cache, "Prompt 1.", 100)
+
+    for _ in range(3):
+        assert cache.lookup(keys[0])
+    assert cache.lookup(keys[1])
+
+    _add(cache, "Prompt 2.", 100)
+    assert cache.lookup(keys[0])
+    assert cache.lookup(keys[1]) is None
+
+def test_index_survives_restart(tmp_path):
+    """A restarted cache knows its files from the index, not a directory scan"""
+    cache = AudioCache(str(tmp_path), max_bytes=1024)
+    filename = _add(cache, "Hello.", 100)
+
+    # Not a cache file, would be picked up by a scan
+    _write(os.path.join(str(tmp_path), "stray.wav"), 100)
+
+    restarted = AudioCache(str(tmp_path), max_bytes=1024)
+    key = AudioCache.make_key("vits", "p273", "Hello.", 22050)
+    assert restarted.lookup(key) == filename
+    assert restarted.stats()['files'] == 1
+
+def test_running_totals_track_entries(tmp_path):
+    """The byte total follows adds, re-adds and evictions, and is recounted on open"""
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    _add(cache, "Hello.", 100)
+    _add(cache, "Hello.", 120)
+    _add(cache, "Goodbye.", 100)
+    assert cache.stats()['bytes'] == 220 and cache.stats()['files'] == 2
+
+    _add(cache, "Another.", 100)
+    assert cache.stats()['bytes'] <= 250
+
+    # Totals that drifted, e.g. in an index written before they existed, are recounted
+    cache._db.execute("UPDATE totals SET bytes = 0, files = 0")
+    restarted = AudioCache(str(tmp_path), max_bytes=250)
+    assert restarted.stats()['bytes'] == cache._db.execute("SELECT SUM(size) FROM entries").fetchone()[0]
@@ -0,0 +1,76 @@
+# test_audio_server.py
+import os
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from services.audio_server import HotAudioTier, content_etag, clip_response, _file_etag
+
+def _request(**headers):
+    return Request(EnvironBuilder(headers=headers).get_environ())
+
+def _write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'\1' * size)
+
+def test_promote_after_plays(tmp_path):
+    """A clip is kept in memory once it has been played enough times"""
+    path = str(tmp_path / "clip.wav")
+    _write(path, 100)
+    tier = HotAudioTier(max_bytes=1024, promote_after=2)
+
+    tier.record_play("clip.wav", path)
+    assert tier.get("clip.wav") is None
+
+    tier.record_play("clip.wav", path)
+    assert tier.get("clip.wav") == b'\1' * 100
+
+def test_budget_evicts_least_recent(tmp_path):
+    """The least recently played clip is dropped when over budget"""
+    tier = HotAudioTier(max_bytes=250)
+    for name in ("a.wav", "b.wav", "c.wav"):
+        _write(str(tmp_path / name), 100)
+
+    tier.preload("a.wav", str(tmp_path / "a.wav"))
+    tier.preload("b.wav", str(tmp_path / "b.wav"))
+    assert tier.get("a.wav")
+
+    tier.preload("c.wav", str(tmp_path / "c.wav"))
+
+    assert tier.get("a.wav")
+    assert tier.get("b.wav") is None
+    assert tier.stats()['bytes'] == 200
+
+def test_range_from_memory(tmp_path):
+    """Range requests of a hot clip get the requested bytes and its content hash ETag"""
+    data = bytes(range(256)) * 1024
+    path = str(tmp_path / "clip.wav")
+    with open(path, 'wb') as f:
+        f.write(data)
+    tier = HotAudioTier(max_bytes=1024 * 1024)
+    tier.preload("clip.wav", path)
+    clip, etag = tier.lookup("clip.wav")
+    assert etag == content_etag(data) == _file_etag(path)
+
+    response = clip_response(clip, etag, 'audio/wav', _request(Range='bytes=1000-199999'))
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 1000-199999/{len(data)}'
+    assert response.get_data() == data[1000:200000]
+
+    assert clip_response(clip, etag, 'audio/wav', _request(**{'If-None-Match': f'"{etag}"'})).status_code == 304
+    # A client holding another version gets the whole clip
+    stale = clip_response(clip, etag, 'audio/wav', _request(Range='bytes=0-99', **{'If-Range': '"old"'}))
+    assert stale.status_code == 200 and stale.get_data() == data
+    unsatisfiable = clip_response(clip, etag, 'audio/wav', _request(Range=f'bytes={len(data)}-'))
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers['Content-Range'] == f'bytes */{len(data)}'
+
+def test_file_etag_follows_content(tmp_path):
+    """A file written again with other bytes gets a new ETag"""
+    path = str(tmp_path / "clip.wav")
+    _write(path, 100)
+    first = _file_etag(path)
+    with open(path, 'wb') as f:
+        f.write(b'\2' * 101)
+    os.utime(path, ns=(1, 1))
+    assert _file_etag(path) != first
@@ -0,0 +1,65 @@
+# test_audio_utils.py
+import numpy as np
+import pytest
+from services.audio_utils import (
+    read_wav, write_wav, convert_wav, trim_silence, crossfade_concat, mulaw_encode, mulaw_decode
+)
+from templates.script_templates import split_template, render_template
+
+def test_wav_round_trip(tmp_path):
+    """Samples survive a write and read at 16-bit precision"""
+    path = str(tmp_path / "tone.wav")
+    samples = np.sin(np.linspace(0, 20, 1000)).astype(np.float32) * 0.5
+
+    write_wav(path, samples, 22050)
+    loaded, sample_rate = read_wav(path)
+
+    assert sample_rate == 22050
+    assert np.allclose(loaded, samples, atol=1e-3)
+
+def test_trim_silence_keeps_padding():
+    """Leading and trailing silence is cut down to the padding"""
+    samples = np.concatenate([np.zeros(1000), np.full(500, 0.5), np.zeros(1000)]).astype(np.float32)
+
+    trimmed = trim_silence(samples, 1000, padding_ms=100)
+
+    assert len(trimmed) == 500 + 2 * 100
+
+def test_crossfade_concat_length():
+    """Each seam overlaps the chunks by the crossfade length"""
+    chunks = [np.full(100, 0.5, dtype=np.float32) for _ in range(3)]
+
+    joined = crossfade_concat(chunks, 1000, crossfade_ms=10)
+
+    assert len(joined) == 300 - 2 * 10
+    assert np.allclose(joined, 0.5)
+
+def test_split_template():
+    """Templates split into static text and placeholder names"""
+    parts = split_template("See you {appointment_time}, {name}!")
+
+    assert parts == [("See you ", "appointment_time"), (", ", "name"), ("!", None)]
+    assert render_template("See you {appointment_time}, {name}!", {"name": "Sam"}) == "See you {appointment_time}, Sam!"
+
+def test_mulaw_round_trip():
+    """G.711 mu-law keeps 16-bit samples within its quantization error"""
+    pcm = np.array([0, 1, -1, 100, -100, 1000, -1000, 32767, -32768], dtype=np.int16)
+
+    decoded = mulaw_decode(mulaw_encode(pcm)).astype(np.int32)
+
+    assert mulaw_encode(np.array([0], dtype=np.int16))[0] == 0xFF
+    assert np.all(np.abs(decoded - pcm) <= np.maximum(8, np.abs(pcm.astype(np.int32)) // 16))
+
+def test_convert_to_ulaw8k(tmp_path):
+    """Converted files are 8 kHz mu-law, one byte per sample, and still readable"""
+    path = str(tmp_path / "prompt.wav")
+    samples = (np.sin(np.arange(22050) * 2 * np.pi * 440 / 22050) * 0.5).astype(np.float32)
+    write_wav(path, samples, 22050)
+
+    convert_wav(path, 8000, 'mulaw')
+    loaded, sample_rate = read_wav(path)
+
+    assert sample_rate == 8000
+    assert len(loaded) == 8000
+    assert (tmp_path / "prompt.wav").stat().st_size < 8000 + 100
+    assert np.abs(loaded).max() == pytest.approx(0.5, abs=0.05)
@@ -0,0 +1,7 @@
+# test_benchmark_serialization.py
+import benchmark_serialization
+
+def test_benchmark_runs(capsys):
+    """The codec benchmark runs on a current CallState"""
+    assert benchmark_serialization.main(['--number', '1', '--turns', '2']) == 0
+    assert 'json indent=2 (previous)' in capsys.readouterr().out
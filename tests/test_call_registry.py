@@ -0,0 +1,47 @@
+# test_call_registry.py
+import time
+import threading
+
+from services.call_registry import CallRegistry
+
+def test_update_end_and_expiry():
+    """Records update in place, ended calls expire after ended_ttl without a thread"""
+    registry = CallRegistry(ttl=60, ended_ttl=0.05)
+    record = registry.update('CA1', campaign_id='c1', status='initiated')
+    registry.update('CA1', status='greeting', campaign_id=None)
+
+    assert registry.get('CA1') is record
+    assert (record.campaign_id, record.status) == ('c1', 'greeting')
+    assert not hasattr(record, '__dict__')
+
+    registry.end('CA1', duration=12)
+    assert registry.get('CA1').status == 'ended'
+    time.sleep(0.06)
+    assert 'CA1' not in registry
+
+    # The next update drops it for good
+    threads = threading.active_count()
+    registry.update('CA2')
+    assert len(registry) == 1 and registry.stats()['expired'] == 1
+    assert threading.active_count() == threads
+
+def test_capacity_drops_closest_to_expiry():
+    """Over max_calls, ended calls go before active ones"""
+    registry = CallRegistry(max_calls=3, ttl=60, ended_ttl=30)
+    for call_id in ('CA1', 'CA2', 'CA3'):
+        registry.update(call_id)
+    registry.end('CA2')
+    registry.update('CA4')
+
+    assert len(registry) == 3
+    assert 'CA2' not in registry and 'CA1' in registry
+    assert registry.stats()['evicted'] == 1
+
+def test_heap_stays_bounded():
+    """Repeated updates of the same calls don't grow the expiry heap without bound"""
+    registry = CallRegistry(ttl=60)
+    for turn in range(2000):
+        registry.update(f"CA{turn % 10}", conversation_stage='greeting')
+
+    assert len(registry) == 10
+    assert registry.stats()['heap_entries'] <= 4 * 64 + 1
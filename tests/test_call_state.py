@@ -0,0 +1,50 @@
+# test_call_state.py
+import json
+import sys
+
+from services.call_state import CallState, fingerprint, diff_state
+
+def test_reads_and_writes_like_a_dict():
+    """Known fields, stage history and extra keys round-trip through the mapping API"""
+    state = CallState({'conversation_stage': 'greeting', 'previous_stages': [], 'responses': []})
+    state.push_stage('greeting')
+    state['previous_stages'].append('timeframe')
+    state['conversation_stage'] = 'timeframe'
+    state['responses'].append('yes')
+
+    assert state['previous_stages'] == ['greeting', 'timeframe']
+    assert state.get('campaign_id') is None and 'campaign_id' not in state
+    assert dict(state) == {'conversation_stage': 'timeframe', 'previous_stages': ['greeting', 'timeframe'],
+                           'responses': ['yes']}
+    assert json.loads(json.dumps(state.to_dict())) == dict(state)
+    assert state['conversation_stage'] is sys.intern('timeframe')
+    assert not hasattr(state, '__dict__')
+
+def test_diff_against_fingerprint():
+    """Deltas hold changed fields, appended history and messages, and removed keys"""
+    state = CallState(conversation_stage='greeting', conversation_data={}, status='active')
+    baseline = fingerprint(state.to_dict())
+
+    state['conversation_stage'] = 'timeframe'
+    state.push_stage('greeting')
+    state['conversation_data']['timeframe'] = 'soon'
+    state.setdefault('messages', []).append({'role': 'user', 'content': 'yes'})
+    del state['status']
+    delta, baseline = diff_state(state.to_dict(), baseline)
+    assert delta == {
+        'set': {'conversation_stage': 'timeframe', 'conversation_data': {'timeframe': 'soon'},
+                'previous_stages': ['greeting'], 'messages': [{'role': 'user', 'content': 'yes'}]},
+        'unset': ['status']
+    }
+
+    state['messages'].append({'role': 'assistant', 'content': 'great'})
+    state['previous_stages'].append('timeframe')
+    delta, baseline = diff_state(state.to_dict(), baseline)
+    assert delta == {
+        'append': {'previous_stages': ['timeframe'], 'messages': [{'role': 'assistant', 'content': 'great'}]}
+    }
+    assert diff_state(state.to_dict(), baseline)[0] == {}
+
+    # A list changed in place is written whole
+    state['messages'][0] = {'role': 'user', 'content': 'no'}
+    assert 'messages' in diff_state(state.to_dict(), baseline)[0]['set']
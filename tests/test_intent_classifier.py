@@ -0,0 +1,33 @@
+# test_intent_classifier.py
+import time
+
+from utils.intent_classifier import IntentClassifier, extract_features
+
+CLASSIFIER = IntentClassifier([
+    ('positive', ['yes', 'sure', 'thinking about it', 'maybe', 'interested']),
+    ('negative', ['no thanks', 'not interested', 'not selling', 'not now'])
+])
+
+def test_classifies_near_misses():
+    """Input close to a phrase gets its label, unrelated input gets none"""
+    assert CLASSIFIER.classify("maybe later")[0] == 'positive'
+    assert CLASSIFIER.classify("i was thinking about that")[0] == 'positive'
+    assert CLASSIFIER.classify("not selling right now thanks")[0] == 'negative'
+    label, score = CLASSIFIER.classify("purple monkey")
+    assert label is None and score < CLASSIFIER.threshold
+    assert CLASSIFIER.classify("")[0] is None
+
+def test_negation_changes_features():
+    """Words after a negator are separate features from the plain words"""
+    assert 'w:~interested' in extract_features("not really interested")
+    assert 'w:interested' in extract_features("really interested, not now")
+    assert CLASSIFIER.classify("i'm not really interested")[0] == 'negative'
+
+def test_classify_is_fast():
+    """Scoring a turn stays well under a millisecond"""
+    text = "i'm not really that interested in selling right now"
+    CLASSIFIER.classify(text)
+    start = time.perf_counter()
+    for _ in range(200):
+        CLASSIFIER.classify(text)
+    assert (time.perf_counter() - start) / 200 < 0.001
@@ -0,0 +1,42 @@
+# test_micro_batcher.py
+import threading
+from utils.micro_batcher import MicroBatcher
+
+def test_concurrent_requests_share_a_batch():
+    """Requests arriving within the window run as one batch, results in order"""
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(run_batch, window_ms=200, max_batch_size=8)
+    results = {}
+    start = threading.Barrier(4)
+
+    def caller(text):
+        start.wait()
+        results[text] = batcher.run(text, timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(text,)) for text in ("hi", "bye", "yes", "no")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"hi": "HI", "bye": "BYE", "yes": "YES", "no": "NO"}
+    assert len(batches) == 1
+    assert batcher.stats()['average_batch_size'] == 4
+
+def test_item_errors_only_fail_their_request():
+    """An exception returned for one item is raised to that caller alone"""
+    def run_batch(items):
+        return [ValueError(item) if item == "bad" else item for item in items]
+
+    batcher = MicroBatcher(run_batch, window_ms=1, max_batch_size=1)
+    assert batcher.run("good", timeout=5) == "good"
+    try:
+        batcher.run("bad", timeout=5)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
@@ -0,0 +1,48 @@
+# test_phrase_matcher.py
+from utils.phrase_matcher import PhraseMatcher, tokenize
+from utils.helpers import parse_speech_intent
+
+MATCHER = PhraseMatcher([
+    ('positive', ['yes', 'interested', 'send it', 'i am']),
+    ('negative', ['no', 'not interested', "don't send"]),
+    ('details', ['bedroom', 'square feet'])
+])
+
+def test_whole_words_only():
+    """Patterns don't match inside longer words"""
+    assert MATCHER.match("I don't know") is None
+    assert MATCHER.match("nothing to add") is None
+    assert MATCHER.match("No.") == 'negative'
+
+def test_phrases_and_plurals():
+    """Multi-word phrases match in order, plurals fold to the singular"""
+    assert MATCHER.match("about 1200 square feet") == 'details'
+    assert MATCHER.match("feet square") is None
+    assert MATCHER.match("three bedrooms") == 'details'
+    assert tokenize("Bedrooms, please") == ['bedroom', ',', 'please']
+
+def test_words_ending_in_s_stay_distinct():
+    """Only plurals lose their s, so 'news' doesn't match a 'new' phrase"""
+    matcher = PhraseMatcher([('new', ['new listing']), ('this', ['thi'])])
+    assert matcher.match("any news listing") is None
+    assert matcher.match("new listings") == 'new'
+    assert matcher.match("this") is None
+    assert tokenize("news this yes bonus addresses boxes homes") == [
+        'news', 'this', 'yes', 'bonus', 'address', 'box', 'home']
+
+def test_negation_scope():
+    """Negated positive phrases don't count, punctuation ends the negation"""
+    assert MATCHER.match("I'm not interested") == 'negative'
+    assert MATCHER.match("I'm not really interested") is None
+    assert MATCHER.match("please don't send it") == 'negative'
+    assert MATCHER.match("I am not sure") is None
+    assert MATCHER.match("not now, but yes") == 'positive'
+    # Priority still decides between two live matches
+    assert MATCHER.match("no, yes") == 'positive'
+
+def test_parse_speech_intent():
+    """The keyword intent parser no longer misreads 'know' and 'nothing'"""
+    assert parse_speech_intent("I'm not interested") == 'negative'
+    assert parse_speech_intent("I know, sounds good") == 'positive'
+    assert parse_speech_intent("hmm") == 'unclear'
+    assert parse_speech_intent("") == 'unclear'
@@ -0,0 +1,28 @@
+# test_prerender_service.py
+import threading
+
+from services.prerender_service import PromptPrerenderer
+
+class CrashingPrerenderer(PromptPrerenderer):
+    """Crashes on the first run, after the campaign was queued again"""
+
+    def __init__(self):
+        super().__init__(speaker=None)
+        self.second_run = threading.Event()
+
+    def _render_campaign(self, campaign_id, generation):
+        if generation == 1:
+            # The script changed while rendering, then the superseded run fails
+            self.warm_campaign(campaign_id)
+            raise RuntimeError("synthesis crashed")
+        self.second_run.set()
+
+def test_superseded_failure_leaves_new_run_alone():
+    """A crash in an outdated run doesn't mark the requeued run failed"""
+    prerenderer = CrashingPrerenderer()
+    prerenderer.warm_campaign('spring')
+
+    assert prerenderer.second_run.wait(5)
+    progress = prerenderer.get_progress('spring')
+    assert progress['generation'] == 2
+    assert progress['status'] == 'pending'
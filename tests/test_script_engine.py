@@ -0,0 +1,65 @@
+# test_script_engine.py
+from services.script_engine import compile_script, get_compiled_script
+
+SCRIPT = {
+    'name': 'Test',
+    'conversation_flow': {
+        'greeting': {
+            'message': 'Have you thought about selling your home?',
+            'responses': {
+                'positive': {'patterns': ['yes', 'interested'], 'next_stage': 'details'},
+                'negative': {'patterns': ['no', 'not interested'], 'next_stage': 'close'},
+                'fallback': {'next_stage': 'clarify'}
+            }
+        },
+        'details': {
+            'message': 'How many bedrooms?',
+            'responses': {
+                'info': {
+                    'patterns': ['bed'],
+                    'extract_info': {'bedrooms': r'\b(\d+)\s*bed'},
+                    'next_stage': 'confirm'
+                }
+            }
+        },
+        'confirm': {'message': 'So {bedrooms} bedrooms, thanks {name}!', 'end_call': True}
+    }
+}
+
+def test_match_keeps_script_priority():
+    """The earlier response type wins wherever its pattern occurs in the input"""
+    stage = compile_script(SCRIPT).stage('greeting')
+
+    assert stage.match("yes please").name == 'positive'
+    assert stage.match("no").name == 'negative'
+    assert stage.match("no, well, yes").name == 'positive'
+    # Negated and partial-word patterns don't count
+    assert stage.match("i'm not interested").name == 'negative'
+    assert stage.match("i don't know") is None
+    assert stage.fallback.next_stage == 'clarify'
+
+def test_extraction_and_template():
+    """Extraction regexes are precompiled and templates pre-split"""
+    compiled = compile_script(SCRIPT)
+    response = compiled.stage('details').match("it has 3 beds")
+
+    assert response.extract("It has 3 Beds") == {'bedrooms': '3'}
+    confirm = compiled.stage('confirm')
+    assert confirm.placeholders == {'bedrooms', 'name'}
+    assert confirm.render({'bedrooms': '3'}) == 'So 3 bedrooms, thanks {name}!'
+    assert compiled.stage('missing').message is None
+
+def test_compiled_once_per_script():
+    """The same script object compiles once, a different one compiles again"""
+    assert get_compiled_script(SCRIPT) is get_compiled_script(SCRIPT)
+    assert get_compiled_script(dict(SCRIPT)) is not get_compiled_script(SCRIPT)
+
+def test_classifier_tier():
+    """The classifier only runs when enabled and scores the stage's patterns"""
+    assert compile_script(SCRIPT).stage('greeting').classify("intrested")[0] is None
+
+    stage = compile_script(SCRIPT, classify=True).stage('greeting')
+    # A transcription error no pattern matches
+    assert stage.match("intrested") is None
+    response, confidence = stage.classify("intrested")
+    assert response.name == 'positive' and confidence >= 0.5
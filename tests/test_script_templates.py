@@ -0,0 +1,32 @@
+# test_script_templates.py
+import copy
+from templates.script_templates import get_script, invalidate_script, ADVANCED_CAMPAIGNS
+
+def test_get_script_is_rendered_once_and_shared():
+    """Repeated lookups return the same rendered, read-only script"""
+    campaign_id = next(iter(ADVANCED_CAMPAIGNS))
+    script = get_script(campaign_id)
+
+    assert get_script(campaign_id) is script
+    assert '{agent_name}' not in script['conversation_flow']['greeting']['message']
+
+    try:
+        script['name'] = 'changed'
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+
+    # A deep copy is an ordinary, mutable script
+    private = copy.deepcopy(script)
+    private['conversation_flow']['greeting']['message'] = 'Hi'
+    assert get_script(campaign_id)['conversation_flow']['greeting']['message'] != 'Hi'
+
+def test_invalidate_renders_again():
+    """A changed campaign is rendered again on the next lookup"""
+    campaign_id = next(iter(ADVANCED_CAMPAIGNS))
+    script = get_script(campaign_id)
+
+    invalidate_script(campaign_id)
+
+    assert get_script(campaign_id) is not script
+    assert get_script(campaign_id) == script
@@ -0,0 +1,67 @@
+# test_serialization.py
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from services.call_state import CallState
+from services.state_store import JsonFileStateBackend
+from utils.serialization import FORMATS, is_available, get_codec, detect_format, decode
+
+def test_codecs_round_trip_call_state():
+    """Every installed codec encodes a CallState and decode() detects its format"""
+    state = CallState(conversation_stage='timeframe', conversation_data={'interest': 'yes'}, status='active')
+    state.push_stage('greeting')
+    for name in FORMATS:
+        if not is_available(name):
+            continue
+        encoded = get_codec(name).encode(state)
+        assert detect_format(encoded) == ('msgpack' if name == 'msgpack' else 'json')
+        assert decode(encoded) == state.to_dict()
+
+def test_backend_reads_files_of_another_codec(tmp_path):
+    """Switching to msgpack keeps existing JSON state files readable"""
+    pytest.importorskip('msgpack')
+    with open(tmp_path / 'CA1.json', 'w') as f:
+        json.dump({'conversation_stage': 'greeting'}, f, indent=2)
+
+    backend = JsonFileStateBackend(str(tmp_path), codec=get_codec('msgpack'))
+    assert backend.read('CA1') == {'conversation_stage': 'greeting'}
+
+    backend.write_batch({'CA1': {'conversation_stage': 'closing'}})
+    assert backend.path_for('CA1').endswith('.msgpack')
+    assert backend.read('CA1') == {'conversation_stage': 'closing'}
+
+def test_fast_json_provider_matches_default():
+    """Responses have the default provider's output, or msgpack when the client asks for it"""
+    from utils.flask_json import FastJSONProvider
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route('/state')
+    def state():
+        return jsonify({'b': 1, 'a': CallState(status='active')}), 200
+
+    client = app.test_client()
+    response = client.get('/state')
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == b'{"a":{"status":"active"},"b":1}\n'
+
+    if is_available('msgpack'):
+        response = client.get('/state', headers={'Accept': 'application/msgpack'})
+        assert response.mimetype == 'application/msgpack'
+        assert decode(response.get_data()) == {'a': {'status': 'active'}, 'b': 1}
+
+def test_values_orjson_cant_encode_fall_back_to_stdlib():
+    """Integers wider than 64 bits are still encoded, by the standard library"""
+    from utils.flask_json import FastJSONProvider
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    big = 2 ** 70
+
+    with app.test_request_context():
+        assert json.loads(jsonify({'n': big}).get_data()) == {'n': big}
+    assert json.loads(app.json.dumps({'n': big})) == {'n': big}
+    assert decode(get_codec('orjson').encode({'n': big})) == {'n': big}
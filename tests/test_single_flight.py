@@ -0,0 +1,66 @@
+# test_single_flight.py
+import time
+import threading
+from utils.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    """Callers arriving during an in-flight call get its result"""
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def synthesize():
+        calls.append(1)
+        time.sleep(0.1)
+        return "greeting.wav"
+
+    def worker():
+        results.append(flight.do("greeting", synthesize))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["greeting.wav"] * 8
+    assert not flight.in_flight("greeting")
+
+def test_errors_are_shared_and_key_released():
+    """A failed call propagates to every waiter and can be retried"""
+    flight = SingleFlight()
+    calls = []
+    errors = []
+    release = threading.Event()
+
+    def fail():
+        calls.append(1)
+        release.wait(5)
+        raise RuntimeError("model not loaded")
+
+    def worker():
+        try:
+            flight.do("greeting", fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    while not flight.in_flight("greeting"):
+        time.sleep(0.001)
+    followers = [threading.Thread(target=worker) for _ in range(7)]
+    for thread in followers:
+        thread.start()
+    # Let the followers reach the wait before the leader fails
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 8
+    assert all(error is errors[0] for error in errors)
+    assert not flight.in_flight("greeting")
+
+    assert flight.do("greeting", lambda: "ok") == "ok"
@@ -0,0 +1,61 @@
+# test_sip_client.py
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from services.sip_client import SipClient
+
+class FakeSipHandler(BaseHTTPRequestHandler):
+    """Answers every command with the next queued status, recording the client's port"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.ports.append(self.client_address[1])
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = json.dumps({'success': status == 200}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def sip_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSipHandler)
+    server.ports, server.statuses = [], []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_commands_reuse_a_pooled_connection(sip_server):
+    """Consecutive commands go over one keep-alive connection and are timed"""
+    client = SipClient(base_url=f"http://127.0.0.1:{sip_server.server_port}")
+    for _ in range(3):
+        assert client.post('/speak', {'call_control_id': 'CA1', 'text': 'hi'}).json()['success']
+
+    assert len(set(sip_server.ports)) == 1
+    speak = client.stats()['commands']['/speak']
+    assert speak['requests'] == 3 and speak['errors'] == 0
+    assert 0 < speak['p50_ms'] <= speak['max_ms']
+    client.close()
+
+def test_only_idempotent_commands_retry_after_delivery(sip_server):
+    """A 503 is retried for hangup but returned as is for speak"""
+    client = SipClient(base_url=f"http://127.0.0.1:{sip_server.server_port}", retries=2, backoff=0.001)
+
+    sip_server.statuses = [503, 503]
+    assert client.post('/hangup', {'call_control_id': 'CA1'}, idempotent=True).status_code == 200
+    assert client.stats()['commands']['/hangup']['retries'] == 2
+
+    sip_server.statuses = [503]
+    assert client.post('/speak', {'call_control_id': 'CA1', 'text': 'hi'}).status_code == 503
+    assert client.stats()['commands']['/speak']['retries'] == 0
+    client.close()
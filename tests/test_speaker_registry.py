@@ -0,0 +1,62 @@
+# test_speaker_registry.py
+import pickle
+import contextlib
+
+import pytest
+
+from services.speaker_registry import SpeakerRegistry
+
+class FakeTorch:
+    """Stands in for torch, persisting latents with pickle"""
+    inference_mode = staticmethod(contextlib.nullcontext)
+
+    @staticmethod
+    def save(obj, path):
+        with open(path, 'wb') as f:
+            pickle.dump(obj, f)
+
+    @staticmethod
+    def load(path, map_location=None):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+@pytest.fixture(autouse=True)
+def fake_torch(monkeypatch):
+    monkeypatch.setattr('services.tts_engine.import_torch', lambda: FakeTorch)
+
+class FakeSpeakerManager:
+    speakers = {'Ana Florence': {'gpt_cond_latent': 'ana-latent', 'speaker_embedding': 'ana-embedding'}}
+
+class FakeXtts:
+    """Stands in for the XTTS model, counting conditioning runs"""
+    speaker_manager = FakeSpeakerManager()
+
+    def __init__(self):
+        self.computed = []
+
+    def get_conditioning_latents(self, audio_path):
+        self.computed.append(list(audio_path))
+        return 'custom-latent', 'custom-embedding'
+
+def test_builtin_voice(tmp_path):
+    """Built-in voices come from the model's speaker file"""
+    registry = SpeakerRegistry(FakeXtts(), str(tmp_path / "latents"))
+
+    assert registry.get('Ana Florence') == ('ana-latent', 'ana-embedding')
+
+def test_custom_voice_computed_once(tmp_path):
+    """Reference audio is conditioned once and reused across restarts"""
+    voices_dir = tmp_path / "voices"
+    voices_dir.mkdir()
+    (voices_dir / "agent.wav").write_bytes(b'RIFF')
+
+    model = FakeXtts()
+    registry = SpeakerRegistry(model, str(tmp_path / "latents"), voices_dir=str(voices_dir))
+    assert registry.get('agent') == ('custom-latent', 'custom-embedding')
+    assert registry.get('agent') == ('custom-latent', 'custom-embedding')
+
+    restarted = SpeakerRegistry(model, str(tmp_path / "latents"), voices_dir=str(voices_dir))
+    assert restarted.get('agent') == ('custom-latent', 'custom-embedding')
+
+    assert len(model.computed) == 1
+    assert 'agent' in restarted.voices()
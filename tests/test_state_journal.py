@@ -0,0 +1,97 @@
+# test_state_journal.py
+import os
+import json
+import time
+
+import pytest
+
+from services.call_state import CallState
+from services.state_journal import JournalStateBackend
+
+def _records(directory):
+    records = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.log'):
+            with open(os.path.join(directory, name)) as f:
+                records.extend(json.loads(line) for line in f)
+    return records
+
+def test_deltas_rebuild_the_state(tmp_path):
+    """Later writes append only what changed, reads replay them"""
+    journal = JournalStateBackend(str(tmp_path))
+    state = CallState(conversation_stage='greeting', previous_stages=[], conversation_data={})
+    journal.write_batch({'CA1': state})
+
+    state.update(conversation_stage='timeframe', previous_stages=['greeting'], status='active')
+    journal.write_batch({'CA1': state})
+    state['previous_stages'] = ['greeting', 'timeframe']
+    del state['status']
+    journal.write_batch({'CA1': state})
+
+    snapshot, first, second = _records(str(tmp_path))
+    assert snapshot['t'] == 'snap'
+    assert first['set'] == {'conversation_stage': 'timeframe', 'status': 'active'}
+    assert first['append'] == {'previous_stages': ['greeting']}
+    assert second == {'t': 'delta', 'append': {'previous_stages': ['timeframe']}, 'unset': ['status'], 'c': 'CA1'}
+    assert journal.read('CA1') == state
+    assert journal.read('CA2') is None
+
+def test_recovery_replays_tail_and_drops_torn_record(tmp_path):
+    """Records after the checkpoint are replayed, a partial last line is cut off"""
+    journal = JournalStateBackend(str(tmp_path))
+    journal.write_batch({'CA1': {'n': 1}})
+    journal.close()
+
+    journal = JournalStateBackend(str(tmp_path))
+    journal.write_batch({'CA1': {'n': 2}, 'CA2': {'n': 1}})
+    journal._active_file.write(b'{"c":"CA3","t":"sn')
+    journal._active_file.flush()
+
+    # Crash: no close, so no checkpoint of the second batch, and the kernel drops the lock
+    journal._lock_file.close()
+    recovered = JournalStateBackend(str(tmp_path))
+    assert recovered.read('CA1') == {'n': 2}
+    assert recovered.read('CA2') == {'n': 1}
+    assert recovered.read('CA3') is None
+    recovered.write_batch({'CA3': {'n': 1}})
+    recovered.close()
+    assert JournalStateBackend(str(tmp_path)).read('CA3') == {'n': 1}
+
+def test_compaction_removes_dead_segments(tmp_path):
+    """Sealed segments that are mostly superseded are rewritten and deleted"""
+    journal = JournalStateBackend(str(tmp_path), segment_bytes=512)
+    for turn in range(40):
+        journal.write_batch({'CA1': {'turn': turn, 'padding': 'x' * 100}, 'CA2': {'turn': 0}})
+
+    assert journal.stats()['segments'] <= 3
+    assert journal.read('CA1')['turn'] == 39
+    assert journal.read('CA2') == {'turn': 0}
+
+def test_compaction_drops_calls_ended_before_retention(tmp_path):
+    """Ended calls leave the index and checkpoint once older than the retention period"""
+    journal = JournalStateBackend(str(tmp_path), retention=3600)
+    journal.write_batch({'CA1': {'status': 'completed', 'end_time': time.time() - 7200},
+                         'CA2': {'status': 'ended', 'end_time': time.time()},
+                         'CA3': {'status': 'active'}})
+    journal.compact()
+
+    assert journal.read('CA1') is None
+    assert journal.read('CA2')['status'] == 'ended'
+    assert journal.read('CA3') == {'status': 'active'}
+    journal.close()
+
+    reopened = JournalStateBackend(str(tmp_path), retention=0)
+    assert reopened.read('CA1') is None
+    assert reopened.stats()['ended_calls'] == 1
+    reopened.write_batch({'CA3': {'status': 'active', 'turn': 1}})
+    reopened.compact()
+    assert reopened.read('CA2') is None
+    assert reopened.read('CA3') == {'status': 'active', 'turn': 1}
+
+def test_second_writer_is_refused(tmp_path):
+    """Only one process at a time can have a journal directory open"""
+    journal = JournalStateBackend(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        JournalStateBackend(str(tmp_path))
+    journal.close()
+    JournalStateBackend(str(tmp_path)).close()
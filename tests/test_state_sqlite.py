@@ -0,0 +1,35 @@
+# test_state_sqlite.py
+import pytest
+
+from services.state_sqlite import SqliteStateBackend
+from services.state_store import StateStore, JsonFileStateBackend, UnsupportedQueryError
+
+def test_round_trip_and_indexed_queries(tmp_path):
+    """States are stored whole and found by campaign, status and stage"""
+    backend = SqliteStateBackend(str(tmp_path))
+    backend.write_batch({
+        'CA1': {'campaign_id': 'c1', 'status': 'active', 'conversation_stage': 'greeting', 'conversation_data': {'a': 1}},
+        'CA2': {'campaign_id': 'c1', 'status': 'completed', 'conversation_stage': 'closing'},
+        'CA3': {'campaign_id': 'c2', 'status': 'active', 'conversation_stage': 'greeting'}
+    })
+
+    assert backend.read('CA1')['conversation_data'] == {'a': 1}
+    assert backend.read('CA4') is None
+    assert [sid for sid, _ in backend.query(campaign_id='c1', status='active')] == ['CA1']
+    assert backend.count_by_stage(campaign_id='c1') == {'greeting': 1, 'closing': 1}
+    assert backend.count_by_stage(status='active') == {'greeting': 2}
+    with pytest.raises(ValueError):
+        backend.query(phone='123')
+
+def test_store_query_includes_pending_saves(tmp_path):
+    """Queries flush first, backends without queries say so"""
+    store = StateStore(SqliteStateBackend(str(tmp_path)), flush_interval=3600)
+    store.save_call_state('CA1', {'campaign_id': 'c1', 'conversation_stage': 'timeframe'})
+    assert store.count_by_stage(campaign_id='c1') == {'timeframe': 1}
+    with pytest.raises(ValueError):
+        store.query(campaign_id='c1', limit=-1)
+
+    with pytest.raises(UnsupportedQueryError):
+        StateStore(JsonFileStateBackend(str(tmp_path))).query(campaign_id='c1')
+    assert store.supports_queries()
+    assert not StateStore(JsonFileStateBackend(str(tmp_path))).supports_queries()
@@ -0,0 +1,79 @@
+# test_state_store.py
+import json
+import os
+
+from services.state_store import StateStore, JsonFileStateBackend
+
+def test_saves_are_written_behind(tmp_path):
+    """Saves stay in memory until a flush, which writes each call once"""
+    backend = JsonFileStateBackend(str(tmp_path))
+    store = StateStore(backend, flush_interval=3600)
+
+    state = store.save_call_state('CA1', {'conversation_stage': 'greeting'})
+    state['conversation_stage'] = 'timeframe'
+    store.save_call_state('CA1', state)
+
+    assert not os.path.exists(backend.path_for('CA1'))
+    assert store.get_call_state('CA1') is state
+    assert store.stats()['dirty'] == 1
+
+    assert store.flush()
+    with open(backend.path_for('CA1')) as f:
+        assert json.load(f)['conversation_stage'] == 'timeframe'
+    assert store.stats()['writes'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_finish_call_persists_and_reloads(tmp_path):
+    """Hangup writes the final state and later reads come from disk"""
+    store = StateStore(JsonFileStateBackend(str(tmp_path)), flush_interval=3600)
+    store.save_call_state('CA2', {'status': 'completed'})
+    store.finish_call('CA2')
+
+    assert store.stats()['cached'] == 0
+    assert store.get_call_state('CA2')['status'] == 'completed'
+    assert StateStore(JsonFileStateBackend(str(tmp_path))).get_call_state('CA3') is None
+
+def test_failed_flush_is_retried(tmp_path):
+    """States stay dirty when the backend fails"""
+    class FailingBackend(JsonFileStateBackend):
+        fail = True
+
+        def write_batch(self, states):
+            if self.fail:
+                raise OSError("disk full")
+            super().write_batch(states)
+
+    backend = FailingBackend(str(tmp_path))
+    store = StateStore(backend, flush_interval=3600)
+    store.save_call_state('CA4', {})
+
+    assert not store.flush()
+    assert store.stats()['dirty'] == 1
+    backend.fail = False
+    assert store.flush()
+    assert os.path.exists(backend.path_for('CA4'))
+
+def test_dirty_state_outlives_its_registry_record(tmp_path):
+    """A state dropped from the call registry before its flush is still written"""
+    from services.call_registry import CallRegistry
+
+    registry = CallRegistry(max_calls=1)
+    backend = JsonFileStateBackend(str(tmp_path))
+    store = StateStore(backend, flush_interval=3600, registry=registry)
+    store.save_call_state('CA5', {'conversation_stage': 'closing'})
+    store.save_call_state('CA6', {})
+
+    assert registry.get('CA5') is None
+    assert store.get_call_state('CA5')['conversation_stage'] == 'closing'
+    assert store.flush()
+    assert os.path.exists(backend.path_for('CA5'))
+
+def test_flush_writes_the_state_as_saved(tmp_path):
+    """Changes made after a save don't leak into the pending write"""
+    backend = JsonFileStateBackend(str(tmp_path))
+    store = StateStore(backend, flush_interval=3600)
+    state = store.save_call_state('CA7', {'messages': [{'role': 'user', 'content': 'yes'}]})
+    state['messages'].append({'role': 'assistant', 'content': 'half a turn'})
+
+    assert store.flush()
+    assert backend.read('CA7')['messages'] == [{'role': 'user', 'content': 'yes'}]
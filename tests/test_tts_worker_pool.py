@@ -0,0 +1,30 @@
+# test_tts_worker_pool.py
+import pytest
+
+from services.tts_engine import TTSWorkerPool, TTSUnavailableError
+
+class FakeWorker:
+    """Stands in for a worker process that loads its model and stays idle"""
+
+    def __init__(self, worker_id, context, device, torch_threads):
+        self.worker_id = worker_id
+        self.process = None
+        self.task_queue = None
+
+    def start(self):
+        pass
+
+    def receive(self):
+        return ('ready', self.worker_id, ('vits', 22050))
+
+def test_shutdown_stops_idle_dispatchers(monkeypatch):
+    """Dispatchers waiting for requests exit on shutdown, later requests are rejected"""
+    monkeypatch.setattr('services.tts_engine._Worker', FakeWorker)
+    pool = TTSWorkerPool(num_workers=3).start()
+    assert pool.wait_ready(5) == ('vits', 22050)
+
+    pool.shutdown(timeout=5)
+
+    assert not any(dispatcher.is_alive() for dispatcher in pool._dispatcher_threads)
+    with pytest.raises(TTSUnavailableError):
+        pool.submit("hello", "speaker", "/tmp/hello.wav")
@@ -0,0 +1,78 @@
+# utils/flask_json.py
+from array import array
+from collections.abc import Mapping, Sequence
+
+from flask import request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+from utils.serialization import orjson, msgpack, MsgpackCodec
+
+def _default(obj):
+    """Flask's encoding of dates, UUIDs and dataclasses, plus CallState, its stage history and arrays"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (array, Sequence)) and not isinstance(obj, (str, bytes)):
+        return list(obj)
+    return DefaultJSONProvider.default(obj)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson when it is installed.
+
+    The output has the same structure as the default provider's: keys
+    sorted, dates as HTTP dates, compact unless in debug mode. It is not
+    byte-identical: orjson writes non-ASCII characters as UTF-8 instead of
+    \\u escapes, and may format floats differently (2.5e-7, not 2.5e-07).
+    Values orjson can't encode, such as integers wider than 64 bits, are
+    encoded by the standard library instead. Clients that send Accept:
+    application/msgpack get MessagePack responses when msgpack is
+    installed. Without orjson, encoding falls back to the standard library.
+    """
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._orjson_dumps(obj, pretty=kwargs.get('indent') is not None).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._wants_msgpack():
+            try:
+                return self._app.response_class(MsgpackCodec().encode(obj), mimetype=MsgpackCodec.content_type)
+            except (TypeError, OverflowError):
+                pass
+
+        if orjson is not None:
+            pretty = (self.compact is None and self._app.debug) or self.compact is False
+            try:
+                return self._app.response_class(self._orjson_dumps(obj, pretty) + b'\n', mimetype=self.mimetype)
+            except TypeError:
+                # e.g. integers wider than 64 bits, which the standard library encodes
+                pass
+        return super().response(*args, **kwargs)
+
+    def _orjson_dumps(self, obj, pretty):
+        # Datetimes pass through to _default, so they stay HTTP dates like with the stdlib
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    @staticmethod
+    def _wants_msgpack():
+        if msgpack is None or not has_request_context():
+            return False
+        # Only when preferred over JSON, so */* and missing Accept headers get JSON
+        accept = request.accept_mimetypes
+        return accept[MsgpackCodec.content_type] > accept['application/json']
@@ -2,6 +2,8 @@
 import logging
 import re
 
+from utils.phrase_matcher import PhraseMatcher
+
 logger = logging.getLogger(__name__)
 
 def sanitize_phone_number(phone_number):
@@ -32,51 +34,42 @@ def sanitize_phone_number(phone_number):
         logger.error(f"Invalid phone number format: {phone_number}")
         return None
 
-def parse_speech_intent(speech_result):
-    """
-    More comprehensive intent parsing based on keywords (replacement for Dialogflow)
-    
-    Args:
-        speech_result (str): The transcribed speech from the caller
-        
-    Returns:
-        str: The detected intent ('positive', 'negative', or 'unclear')
-    """
-    if not speech_result:
-        return 'unclear'
-    
-    speech_lower = speech_result.lower()
-    
-    # Check for positive responses - comprehensive list
-    positive_keywords = [
+# Intent keywords, positive checked first
+SPEECH_INTENT_MATCHER = PhraseMatcher([
+    ('positive', [
         'yes', 'yeah', 'sure', 'okay', 'ok', 'fine', 
         'interested', 'tell me more', 'send', 'please', 
         'would like', 'i want', 'i would', 'i do', 'i am', 
         'of course', 'certainly', 'absolutely', 'definitely',
         'sounds good', 'that works', 'go ahead'
-    ]
-    
-    # Check for negative responses - comprehensive list
-    negative_keywords = [
+    ]),
+    ('negative', [
         'no', 'not', 'don\'t', 'isn\'t', 'wouldn\'t', 
         'not interested', 'stop', 'bye', 'later',
         'i don\'t want', 'i don\'t need', 'not now',
         'go away', 'leave me alone', 'not right now',
         'no thanks', 'nope', 'pass', 'decline'
-    ]
+    ])
+])
+
+def parse_speech_intent(speech_result):
+    """
+    More comprehensive intent parsing based on keywords (replacement for Dialogflow)
     
-    # Check for positive intent
-    for keyword in positive_keywords:
-        if keyword in speech_lower:
-            return 'positive'
+    Keywords match whole words, and negated positive keywords ("not
+    interested", "I don't want") don't count as positive.
     
-    # Check for negative intent
-    for keyword in negative_keywords:
-        if keyword in speech_lower:
-            return 'negative'
+    Args:
+        speech_result (str): The transcribed speech from the caller
+        
+    Returns:
+        str: The detected intent ('positive', 'negative', or 'unclear')
+    """
+    if not speech_result:
+        return 'unclear'
     
     # Default to unclear if no clear intent detected
-    return 'unclear'
+    return SPEECH_INTENT_MATCHER.match(speech_result) or 'unclear'
 
 def log_call_event(call_sid, event_type, details=None):
     """
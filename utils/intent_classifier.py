@@ -0,0 +1,139 @@
+# utils/intent_classifier.py
+import zlib
+
+from utils.phrase_matcher import NEGATORS, NEGATION_SCOPE, NEGATION_BREAKS, tokenize, split_clauses
+
+try:
+    import numpy as np
+except ImportError:  # the classifier is optional, scripts still match on patterns without it
+    np = None
+
+# Weight of each feature kind: whole words and word pairs carry the meaning,
+# character trigrams absorb transcription noise ("yeah" / "yea", "intrested")
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 1.0
+CHAR_WEIGHT = 0.5
+
+# Marks words in the scope of a negator, so "not really interested" lands
+# near "not interested" and away from "interested"
+NEGATED_PREFIX = '~'
+
+def extract_features(text):
+    """
+    Get the weighted features of a text
+
+    Returns:
+        dict: Feature string -> weight
+    """
+    features = {}
+
+    def add(feature, weight):
+        features[feature] = features.get(feature, 0.0) + weight
+
+    for clause in split_clauses(tokenize(text)):
+        last_negator = -NEGATION_SCOPE - 1
+        previous = None
+        for i, token in enumerate(clause):
+            word = token
+            if token in NEGATORS:
+                last_negator = i
+            elif token in NEGATION_BREAKS:
+                last_negator = -NEGATION_SCOPE - 1
+            elif i - last_negator <= NEGATION_SCOPE:
+                word = NEGATED_PREFIX + token
+
+            add('w:' + word, WORD_WEIGHT)
+            if previous is not None:
+                add('b:' + previous + ' ' + word, BIGRAM_WEIGHT)
+            previous = word
+
+            padded = f"#{token}#"
+            for start in range(len(padded) - 2):
+                add('c:' + padded[start:start + 3], CHAR_WEIGHT)
+
+    return features
+
+class IntentClassifier:
+    """
+    Nearest-phrase intent classifier over hashed bags of n-grams.
+
+    Every phrase is embedded once into a fixed number of dimensions by
+    hashing its word, word pair and character trigram features, and the
+    unit-length vectors are stored as one dims x phrases matrix. A text is
+    scored with a single product of its own (sparse) vector against that
+    matrix, giving the cosine similarity to every phrase at once; the label
+    of the closest phrase wins if it clears the threshold.
+
+    Needs numpy, check is_available() first.
+    """
+
+    def __init__(self, labeled_phrases, dims=4096, threshold=0.5):
+        """
+        Embed the phrases
+
+        Args:
+            labeled_phrases (iterable): (label, phrases) pairs in priority order
+            dims (int): Hashed feature dimensions
+            threshold (float): Lowest cosine similarity that counts as a match
+        """
+        self.dims = dims
+        self.threshold = threshold
+        self.labels = []
+
+        phrase_labels = []
+        columns = []
+        for label_index, (label, phrases) in enumerate(labeled_phrases):
+            self.labels.append(label)
+            for phrase in phrases:
+                vector = self._embed(phrase)
+                if vector is not None:
+                    phrase_labels.append(label_index)
+                    columns.append(vector)
+
+        self._phrase_labels = np.array(phrase_labels, dtype=np.int32)
+        # Rows are features so a text's few features gather contiguous rows
+        self._matrix = np.zeros((dims, len(columns)), dtype=np.float32)
+        for column, (indexes, values) in enumerate(columns):
+            self._matrix[indexes, column] = values
+
+    @staticmethod
+    def is_available():
+        """Check whether numpy is installed"""
+        return np is not None
+
+    def classify(self, text):
+        """
+        Find the label of the phrase closest to text
+
+        Args:
+            text (str): Transcript to classify
+
+        Returns:
+            tuple: (label, score), label is None below the threshold
+        """
+        vector = self._embed(text)
+        if vector is None or not len(self._phrase_labels):
+            return None, 0.0
+
+        indexes, values = vector
+        scores = values @ self._matrix[indexes]
+        # argmax keeps the first of equal scores, i.e. the higher priority label
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            return None, score
+        return self.labels[self._phrase_labels[best]], score
+
+    def _embed(self, text):
+        """Get the unit-length hashed vector of text as (indexes, values), None if empty"""
+        buckets = {}
+        for feature, weight in extract_features(text).items():
+            bucket = zlib.crc32(feature.encode('utf-8')) % self.dims
+            buckets[bucket] = buckets.get(bucket, 0.0) + weight
+        if not buckets:
+            return None
+
+        indexes = np.fromiter(buckets.keys(), dtype=np.int64, count=len(buckets))
+        values = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets))
+        values /= np.linalg.norm(values)
+        return indexes, values
@@ -0,0 +1,119 @@
+# utils/micro_batcher.py
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Group concurrent requests into batches for one batched call.
+
+    The first request starts a collection window; requests arriving within
+    it (up to max_batch_size) are handed to run_batch together on a single
+    background thread. A request that finds nobody else waiting still only
+    waits for the window, so the added latency is bounded by window_ms.
+    """
+
+    def __init__(self, run_batch, window_ms=5, max_batch_size=8, name="batcher"):
+        """
+        Initialize the batcher
+
+        Args:
+            run_batch (callable): Takes a list of items and returns a list of
+                results in the same order
+            window_ms (float): How long to collect requests after the first one
+            max_batch_size (int): Largest batch handed to run_batch
+            name (str): Name of the batching thread
+        """
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.name = name
+
+        self._pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item):
+        """
+        Queue an item for the next batch
+
+        Returns:
+            Future: Resolves to the item's result from run_batch
+        """
+        future = Future()
+        self._pending.put((item, future))
+        self._ensure_thread()
+        return future
+
+    def run(self, item, timeout=None):
+        """Queue an item and wait for its result"""
+        return self.submit(item).result(timeout)
+
+    def stats(self):
+        """Get batch count and average batch size"""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'average_batch_size': round(self.items / self.batches, 2) if self.batches else 0
+        }
+
+    def after_fork(self):
+        """Reset state in a forked child, the parent's batching thread doesn't exist there"""
+        self._pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first item, then gather whatever arrives within the window"""
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                logger.error(f"Batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
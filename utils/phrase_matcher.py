@@ -0,0 +1,155 @@
+# utils/phrase_matcher.py
+import re
+
+# Words, keeping contractions like don't together, and clause punctuation
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)*|[.,;:!?]")
+CLAUSE_PUNCTUATION = frozenset('.,;:!?')
+
+# Words that negate the phrase right after them ("not interested", "don't want")
+NEGATORS = frozenset([
+    'not', 'never', 'nor', "don't", 'dont', "doesn't", 'doesnt', "didn't", 'didnt',
+    "isn't", 'isnt', "aren't", 'arent', "wasn't", 'wasnt', "won't", 'wont',
+    "wouldn't", 'wouldnt', "can't", 'cant', 'cannot', "shouldn't", 'shouldnt'
+])
+
+# Tokens a negation reaches ("not really that interested")
+NEGATION_SCOPE = 3
+
+# Words that end a negation without punctuation ("not now but later")
+NEGATION_BREAKS = frozenset(['but', 'though', 'although'])
+
+# Words ending in s that aren't plurals, kept as they are
+NOT_PLURALS = frozenset([
+    'news', 'this', 'yes', 'was', 'has', 'does', 'goes', 'always', 'perhaps', 'sometimes', 'towards',
+    'besides', 'unless', 'series', 'species', 'means', 'lens', 'plus', 'thus', 'ours', 'yours', 'theirs',
+    'hers', 'whereas', 'afterwards', 'physics', 'politics', 'mathematics', 'ethics', 'economics'
+])
+
+# Singulars ending in these aren't formed by adding s (address, bonus, basis, serious)
+NOT_PLURAL_ENDINGS = ('ss', 'us', 'is', 'ous')
+
+# Plurals that add es to a singular ending in s, x, ch or sh (addresses, boxes, matches, dishes)
+ES_PLURAL_ENDINGS = ('sses', 'xes', 'ches', 'shes')
+
+def normalize_token(token):
+    """
+    Fold possessive 's and regular plurals so 'bedrooms' matches 'bedroom'
+
+    Only plain -s and -es plurals are folded. Words in NOT_PLURALS and words
+    ending like a singular (address, bonus) are left alone, so 'news' stays
+    distinct from 'new'. Irregular plurals belong in the phrase lists.
+    """
+    if token.endswith("'s"):
+        return token[:-2]
+    if len(token) <= 3 or not token.endswith('s') or token in NOT_PLURALS or token.endswith(NOT_PLURAL_ENDINGS):
+        return token
+    if token.endswith(ES_PLURAL_ENDINGS):
+        return token[:-2]
+    return token[:-1]
+
+def tokenize(text):
+    """
+    Split text into normalized tokens
+
+    Returns:
+        list: Lowercase tokens, with clause punctuation as separate tokens
+    """
+    text = (text or '').lower().replace('’', "'")
+    return [normalize_token(token) for token in TOKEN_RE.findall(text)]
+
+def split_clauses(tokens):
+    """Split tokens into clauses at punctuation, dropping the punctuation"""
+    clause = []
+    for token in tokens:
+        if token in CLAUSE_PUNCTUATION:
+            if clause:
+                yield clause
+            clause = []
+        else:
+            clause.append(token)
+    if clause:
+        yield clause
+
+class PhraseMatcher:
+    """
+    Match transcripts against labeled phrase lists on word boundaries.
+
+    Every phrase is tokenized once into an n-gram key of a hash map. A
+    transcript is matched in one pass: each token position looks up the
+    n-grams starting there, up to the longest phrase. 'no' therefore
+    doesn't match inside 'know', and multi-word phrases must appear as
+    whole words in order.
+
+    Phrases inside the scope of a negator ("not interested", "don't send
+    it") or directly followed by one ("I am not") are ignored unless the
+    phrase contains a negator itself, so a negated positive phrase can't
+    win over the negative one.
+
+    Labels are given in priority order: the first label with a match
+    anywhere in the transcript wins.
+    """
+
+    def __init__(self, labeled_phrases):
+        """
+        Build the index
+
+        Args:
+            labeled_phrases (iterable): (label, phrases) pairs in priority order
+        """
+        self.labels = []
+        # n-gram -> (priority, negatable)
+        self._index = {}
+        self._max_length = 0
+
+        for priority, (label, phrases) in enumerate(labeled_phrases):
+            self.labels.append(label)
+            for phrase in phrases:
+                ngram = tuple(token for token in tokenize(phrase) if token not in CLAUSE_PUNCTUATION)
+                if not ngram:
+                    continue
+                if ngram not in self._index:
+                    negatable = not any(token in NEGATORS for token in ngram)
+                    self._index[ngram] = (priority, negatable)
+                self._max_length = max(self._max_length, len(ngram))
+
+    def match(self, text):
+        """
+        Find the highest priority label with a phrase in text
+
+        Args:
+            text (str): Transcript to match
+
+        Returns:
+            The matched label, or None
+        """
+        best = self._best_priority(tokenize(text))
+        return self.labels[best] if best is not None else None
+
+    def _best_priority(self, tokens):
+        index = self._index
+        best = None
+
+        for clause in split_clauses(tokens):
+            last_negator = -NEGATION_SCOPE - 1
+            for i, token in enumerate(clause):
+                for length in range(1, min(self._max_length, len(clause) - i) + 1):
+                    entry = index.get(tuple(clause[i:i + length]))
+                    if entry is None:
+                        continue
+                    priority, negatable = entry
+                    end = i + length
+                    # Negated from before ("not interested") or right after ("I am not")
+                    if negatable and (i - last_negator <= NEGATION_SCOPE or
+                                      (end < len(clause) and clause[end] in NEGATORS)):
+                        continue
+                    if best is None or priority < best:
+                        best = priority
+                        if best == 0:
+                            return best
+
+                if token in NEGATORS:
+                    last_negator = i
+                elif token in NEGATION_BREAKS:
+                    last_negator = -NEGATION_SCOPE - 1
+
+        return best
@@ -0,0 +1,51 @@
+# utils/readonly.py
+class ReadOnlyDict(dict):
+    """
+    A dict that refuses modification.
+
+    Used for objects shared between requests, such as rendered scripts, so
+    a caller can't change what every other caller sees. It is still a dict
+    for reading and JSON serialization; copy.deepcopy() returns a plain,
+    mutable copy for callers that need to modify one.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only, use copy.deepcopy() for a mutable copy")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+def freeze(value):
+    """
+    Get a read-only deep copy of a structure of dicts and lists
+
+    Dicts become ReadOnlyDict and lists become tuples.
+    """
+    if isinstance(value, dict):
+        return ReadOnlyDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Get a plain, mutable deep copy of a structure made by freeze"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
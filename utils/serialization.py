@@ -0,0 +1,127 @@
+# utils/serialization.py
+import json
+import logging
+from array import array
+from datetime import date
+from collections.abc import Mapping, Sequence
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib codec is used without it
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, the stdlib codec is used without it
+    msgpack = None
+
+FORMATS = ('json', 'orjson', 'msgpack')
+
+def _default(obj):
+    """Encode what the codecs don't support natively: CallState and other mappings, sequences, sets, dates"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (array, set, frozenset, Sequence)):
+        return list(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+class JsonCodec:
+    """Compact JSON through the standard library"""
+    name = 'json'
+    extension = '.json'
+    content_type = 'application/json'
+
+    def encode(self, obj):
+        return json.dumps(obj, separators=(',', ':'), default=_default).encode('utf-8')
+
+    def decode(self, data):
+        return json.loads(data)
+
+class OrjsonCodec:
+    """JSON through orjson, byte-compatible with files written by JsonCodec"""
+    name = 'orjson'
+    extension = '.json'
+    content_type = 'application/json'
+
+    def encode(self, obj):
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers wider than 64 bits, which the standard library encodes
+            return JsonCodec().encode(obj)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+class MsgpackCodec:
+    """MessagePack, smaller than JSON and faster to parse"""
+    name = 'msgpack'
+    extension = '.msgpack'
+    content_type = 'application/msgpack'
+
+    def encode(self, obj):
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+_AVAILABLE = {'json': True, 'orjson': orjson is not None, 'msgpack': msgpack is not None}
+_CODECS = {'json': JsonCodec, 'orjson': OrjsonCodec, 'msgpack': MsgpackCodec}
+
+def is_available(name):
+    """Check whether a format's library is installed"""
+    return _AVAILABLE.get(name, False)
+
+def get_codec(name='json'):
+    """
+    Get the codec of a format
+
+    Args:
+        name (str): One of FORMATS
+
+    Returns:
+        The codec, the stdlib JSON codec if the format's library isn't installed
+    """
+    if name not in _CODECS:
+        logger.warning(f"Unknown serialization format '{name}', using json")
+        name = 'json'
+    elif not is_available(name):
+        logger.warning(f"{name} is not installed, using json")
+        name = 'json'
+    return _CODECS[name]()
+
+def json_codec():
+    """Get the fastest installed JSON codec"""
+    return OrjsonCodec() if orjson is not None else JsonCodec()
+
+def detect_format(data):
+    """
+    Tell whether encoded data is JSON or MessagePack
+
+    JSON documents start with '{', '[' or whitespace; a MessagePack map or
+    array starts with a byte of 0x80 and above.
+
+    Returns:
+        str: 'json' or 'msgpack'
+    """
+    first = data.lstrip()[:1] if isinstance(data, (bytes, bytearray)) else data.lstrip()[:1].encode('utf-8')
+    if not first or first in b'{["' or first.isdigit() or first in b'-tfn':
+        return 'json'
+    return 'msgpack'
+
+def decode(data):
+    """
+    Decode JSON or MessagePack, whichever the data is
+
+    Raises:
+        ValueError: MessagePack data but msgpack isn't installed
+    """
+    if detect_format(data) == 'json':
+        return json_codec().decode(data)
+    if msgpack is None:
+        raise ValueError("Data is MessagePack but msgpack is not installed")
+    return MsgpackCodec().decode(data)
@@ -0,0 +1,85 @@
+# utils/single_flight.py
+import threading
+
+class _Call:
+    """An in-flight call that followers wait on"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running block until it finishes and receive the same result (or the
+    same exception). Once the call completes the key is forgotten, so later
+    callers run the function again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Hashable key identifying the work
+            fn (callable): Function to run if no call for key is in flight
+
+        Returns:
+            The result of fn
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def wait(self, key, timeout=None):
+        """
+        Wait for an in-flight call without starting one
+
+        Args:
+            key: Key of the call to wait for
+            timeout (float, optional): Seconds to wait
+
+        Returns:
+            bool: True if a call was in flight and finished within timeout
+        """
+        with self._lock:
+            call = self._calls.get(key)
+
+        if call is None:
+            return False
+
+        return call.done.wait(timeout)
+
+    def in_flight(self, key):
+        """Check whether a call for key is currently running"""
+        with self._lock:
+            return key in self._calls